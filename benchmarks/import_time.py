@@ -0,0 +1,79 @@
+"""Measure how long a cold import of the integration takes.
+
+Every run imports the integration in a fresh interpreter with
+``python -X importtime`` and reports the median of the total import time
+and the slowest top level packages it pulled in.
+
+    python benchmarks/import_time.py [--runs 10] [--top 10]
+"""
+
+from __future__ import annotations
+
+import argparse
+from collections import defaultdict
+from pathlib import Path
+import statistics
+import subprocess
+import sys
+
+ROOT = Path(__file__).parent.parent
+MODULE = "custom_components.lamarzocco"
+# modules only needed by entries using Bluetooth or the local API
+TRANSPORT_MODULES = (
+    "bleak",
+    "bleak_retry_connector",
+    "homeassistant.components.bluetooth",
+    "pylamarzocco.clients.local",
+    f"{MODULE}.bluetooth_index",
+    f"{MODULE}.bluetooth_session",
+    f"{MODULE}.local_client",
+)
+
+
+def import_times() -> dict[str, int]:
+    """Import the integration cold and return the cumulative time per module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {MODULE}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    totals: list[int] = []
+    packages: dict[str, list[int]] = defaultdict(list)
+    for _ in range(args.runs):
+        times = import_times()
+        totals.append(times[MODULE])
+        for name, cumulative in times.items():
+            if "." not in name:
+                packages[name].append(cumulative)
+
+    print(f"import {MODULE}: {statistics.median(totals) / 1000:.1f} ms (median)")
+    slowest = sorted(
+        packages.items(), key=lambda item: statistics.median(item[1]), reverse=True
+    )
+    for name, cumulative in slowest[: args.top]:
+        print(f"  {name:<40} {statistics.median(cumulative) / 1000:8.1f} ms")
+    if imported := [name for name in TRANSPORT_MODULES if name in times]:
+        print(f"Transport modules imported: {', '.join(imported)}")
+
+
+if __name__ == "__main__":
+    main()
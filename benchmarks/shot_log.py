@@ -0,0 +1,114 @@
+"""Measure how appending to and querying the shot log scale with its size.
+
+The log is filled with a shot every few minutes up to the largest size. At
+every size the median time of appending the shots of one statistics update
+and of reading the shots of a day, of all keys and of one key, is reported.
+Both should stay flat while the log grows, only loading it takes longer.
+
+    python benchmarks/shot_log.py [--sizes 1000 10000 100000 200000] [--runs 200]
+"""
+
+from __future__ import annotations
+
+import argparse
+from collections.abc import Callable
+from pathlib import Path
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from pylamarzocco.const import PhysicalKey
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from custom_components.lamarzocco.shot_log import RECORD, ShotLogFile  # noqa: E402
+from custom_components.lamarzocco.shots import TRACE_SIZE, Shot  # noqa: E402
+
+# the shots of the log are this far apart
+SHOT_INTERVAL = 300
+# shots appended at once, as after one update of the statistics
+APPEND_BATCH = 3
+DAY = 86400
+
+
+def make_shots(first: int, count: int) -> list[Shot]:
+    """Return count shots following the shot at position first."""
+    return [
+        Shot(
+            start=1_700_000_000.0 + index * SHOT_INTERVAL,
+            end=1_700_000_000.0 + index * SHOT_INTERVAL + 28,
+            duration=27.5,
+            key=random.choice(list(PhysicalKey)),
+            coffee_temperature=93.5,
+            coffee_temperature_min=91.8,
+            coffee_temperature_max=94.1,
+            steam_temperature=123.8,
+            coffee_temperature_trace=tuple(
+                93.5 - point % 7 / 10 for point in range(TRACE_SIZE)
+            ),
+        )
+        for index in range(first, first + count)
+    ]
+
+
+def median_time(runs: int, function: Callable[[], object]) -> float:
+    """Return the median time of calls of a function in microseconds."""
+    times: list[float] = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times) * 1_000_000
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 200000]
+    )
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "shots"
+        log = ShotLogFile(path)
+        results: list[tuple[int, float, float, float, float]] = []
+        for size in sorted(args.sizes):
+            # the appends of the previous size are part of the next
+            log.append(make_shots(len(log), max(size - len(log), 0)))
+
+            def append() -> None:
+                log.append(make_shots(len(log), APPEND_BATCH))
+
+            def query(key: PhysicalKey | None = None) -> list[Shot]:
+                start = log.starts[random.randrange(len(log))]
+                first = log.bisect(start)
+                last = log.bisect(start + DAY)
+                shots = log.read(first, last)
+                if key is not None:
+                    shots = [shot for shot in shots if shot.key is key]
+                return shots
+
+            append_time = median_time(args.runs, append)
+            query_time = median_time(args.runs, query)
+            key_query_time = median_time(args.runs, lambda: query(PhysicalKey.A))
+            load_time = median_time(3, lambda: ShotLogFile(path).load())
+            results.append((size, append_time, query_time, key_query_time, load_time))
+
+        print(f"{RECORD.size} bytes per shot")
+        print(f"{'shots':>8} {'append':>10} {'day':>10} {'day, key':>10} {'load':>10}")
+        for size, *times in results:
+            print(f"{size:>8}" + "".join(f" {value:>7.0f} µs" for value in times))
+        first, last = results[0], results[-1]
+        print(
+            f"{last[0] / first[0]:.0f}x the shots: append {last[1] / first[1]:.2f}x, "
+            f"day {last[2] / first[2]:.2f}x, day of a key {last[3] / first[3]:.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,15 @@
 """The La Marzocco integration."""
 
+from __future__ import annotations
+
 import logging
+from typing import TYPE_CHECKING
 
 from packaging import version
-from pylamarzocco.clients.bluetooth import LaMarzoccoBluetoothClient
 from pylamarzocco.clients.cloud import LaMarzoccoCloudClient
-from pylamarzocco.clients.local import LaMarzoccoLocalClient
-from pylamarzocco.const import BT_MODEL_PREFIXES, FirmwareType
-from pylamarzocco.devices.machine import LaMarzoccoMachine
+from pylamarzocco.const import FirmwareType
 from pylamarzocco.exceptions import AuthFail, RequestNotSuccessful
 
-from homeassistant.components.bluetooth import async_discovered_service_info
 from homeassistant.const import (
     CONF_HOST,
     CONF_MAC,
@@ -21,18 +20,44 @@ from homeassistant.const import (
     CONF_USERNAME,
     Platform,
 )
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers import issue_registry as ir
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import (
+    config_validation as cv,
+    device_registry as dr,
+    issue_registry as ir,
+)
 from homeassistant.helpers.aiohttp_client import async_create_clientsession
-
-from .const import CONF_USE_BLUETOOTH, DOMAIN
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.typing import ConfigType
+from homeassistant.util import dt as dt_util
+
+from .account import (
+    async_get_account,
+    async_get_account_owner,
+    async_release_account,
+)
+from .cache import LaMarzoccoStateCache, restore_firmware, restore_machine
+from .capabilities import machine_capabilities, required_platforms
+from .command_queue import LaMarzoccoCommandQueue
+from .const import (
+    CONF_BLUETOOTH_IDLE_TIMEOUT,
+    CONF_USE_BLUETOOTH,
+    DEFAULT_BLUETOOTH_IDLE_TIMEOUT,
+    DOMAIN,
+)
 from .coordinator import (
     LaMarzoccoConfigEntry,
     LaMarzoccoConfigUpdateCoordinator,
     LaMarzoccoFirmwareUpdateCoordinator,
     LaMarzoccoRuntimeData,
     LaMarzoccoStatisticsUpdateCoordinator,
+    LaMarzoccoUpdateCoordinator,
 )
+from .services import async_setup_services
+from .shot_log import COMPACT_INTERVAL, LaMarzoccoShotLog
+from .transport import LaMarzoccoTransportRouter
+
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
 
 PLATFORMS = [
     Platform.BINARY_SENSOR,
@@ -45,21 +70,47 @@ PLATFORMS = [
     Platform.UPDATE,
 ]
 
+if TYPE_CHECKING:
+    from pylamarzocco.devices.machine import LaMarzoccoMachine
+
+    from homeassistant.components.bluetooth import BluetoothServiceInfoBleak
+
+    from .bluetooth_session import LaMarzoccoBluetoothSession
+    from .local_client import LaMarzoccoRoutedLocalClient
+
 _LOGGER = logging.getLogger(__name__)
 
 
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up the La Marzocco services."""
+    async_setup_services(hass)
+    return True
+
+
 async def async_setup_entry(hass: HomeAssistant, entry: LaMarzoccoConfigEntry) -> bool:
     """Set up La Marzocco as config entry."""
 
     assert entry.unique_id
     serial = entry.unique_id
 
-    client = async_create_clientsession(hass)
-    cloud_client = LaMarzoccoCloudClient(
-        username=entry.data[CONF_USERNAME],
-        password=entry.data[CONF_PASSWORD],
-        client=client,
-    )
+    # machines on the same account share the cloud client, its access token
+    # and the connections to the cloud
+    account = async_get_account(hass, entry.entry_id, entry.data)
+    entry.async_on_unload(lambda: async_release_account(hass, account, entry.entry_id))
+    cloud_client = account.cloud_client
+
+    # API does not like concurrent requests, so all requests to the machine
+    # are sent one at a time through this queue
+    command_queue = LaMarzoccoCommandQueue()
+
+    # start from the last known state if there is one and refresh in the background
+    cache = LaMarzoccoStateCache(hass, entry.entry_id)
+    cached_state = await cache.async_load()
+
+    # the machine imports the local and Bluetooth clients of the library, so
+    # it is only imported once an entry is set up
+    # pylint: disable-next=import-outside-toplevel
+    from pylamarzocco.devices.machine import LaMarzoccoMachine
 
     # initialize the firmware update coordinator early to check the firmware version
     firmware_device = LaMarzoccoMachine(
@@ -70,77 +121,88 @@ async def async_setup_entry(hass: HomeAssistant, entry: LaMarzoccoConfigEntry) -
     )
 
     firmware_coordinator = LaMarzoccoFirmwareUpdateCoordinator(
-        hass, entry, firmware_device
-    )
-    await firmware_coordinator.async_config_entry_first_refresh()
-    gateway_version = version.parse(
-        firmware_device.firmware[FirmwareType.GATEWAY].current_version
+        hass, entry, firmware_device, account, command_queue
     )
+    if cached_state is not None:
+        restore_firmware(firmware_device, cached_state)
 
-    if gateway_version >= version.parse("v5.0.9"):
-        # remove host from config entry, it is not supported anymore
-        data = {k: v for k, v in entry.data.items() if k != CONF_HOST}
-        hass.config_entries.async_update_entry(
-            entry,
-            data=data,
-        )
-
-    elif gateway_version < version.parse("v3.4-rc5"):
-        # incompatible gateway firmware, create an issue
-        ir.async_create_issue(
-            hass,
-            DOMAIN,
-            "unsupported_gateway_firmware",
-            is_fixable=False,
-            severity=ir.IssueSeverity.ERROR,
-            translation_key="unsupported_gateway_firmware",
-            translation_placeholders={"gateway_version": str(gateway_version)},
-        )
+    # measure the transports and send commands over the fastest healthy one
+    transport_router = LaMarzoccoTransportRouter()
+    entry.async_on_unload(cloud_client.async_add_router(serial, transport_router))
 
     # initialize local API
-    local_client: LaMarzoccoLocalClient | None = None
+    local_client: LaMarzoccoRoutedLocalClient | None = None
     if (host := entry.data.get(CONF_HOST)) is not None:
+        # the local API stack is only imported for entries using it
+        # pylint: disable-next=import-outside-toplevel
+        from .local_client import LaMarzoccoRoutedLocalClient
+
         _LOGGER.debug("Initializing local API")
-        local_client = LaMarzoccoLocalClient(
+        local_client = LaMarzoccoRoutedLocalClient(
+            transport_router,
             host=host,
             local_bearer=entry.data[CONF_TOKEN],
-            client=client,
+            # local requests don't share the connections to the cloud
+            client=async_create_clientsession(hass),
         )
 
     # initialize Bluetooth
-    bluetooth_client: LaMarzoccoBluetoothClient | None = None
+    bluetooth_client: LaMarzoccoBluetoothSession | None = None
     if entry.options.get(CONF_USE_BLUETOOTH, True):
+        # the Bluetooth stack is only imported for entries using it
+        # pylint: disable-next=import-outside-toplevel
+        from .bluetooth_index import (
+            async_get_bluetooth_index,
+            async_release_bluetooth_index,
+        )
+
+        # pylint: disable-next=import-outside-toplevel
+        from .bluetooth_session import LaMarzoccoBluetoothSession
 
         def bluetooth_configured() -> bool:
             return entry.data.get(CONF_MAC, "") and entry.data.get(CONF_NAME, "")
 
         if not bluetooth_configured():
-            for discovery_info in async_discovered_service_info(hass):
-                if (
-                    (name := discovery_info.name)
-                    and name.startswith(BT_MODEL_PREFIXES)
-                    and name.split("_")[1] == serial
-                ):
-                    _LOGGER.debug("Found Bluetooth device, configuring with Bluetooth")
-                    # found a device, add MAC address to config entry
-                    hass.config_entries.async_update_entry(
-                        entry,
-                        data={
-                            **entry.data,
-                            CONF_MAC: discovery_info.address,
-                            CONF_NAME: discovery_info.name,
-                        },
-                    )
-                    break
+            # look the machine up in the index of advertisements seen so far
+            index = async_get_bluetooth_index(hass, entry.entry_id)
+            entry.async_on_unload(
+                lambda: async_release_bluetooth_index(hass, entry.entry_id)
+            )
+
+            @callback
+            def bluetooth_found(discovery_info: BluetoothServiceInfoBleak) -> None:
+                """Add the MAC address of the machine to the config entry."""
+                hass.config_entries.async_update_entry(
+                    entry,
+                    data={
+                        **entry.data,
+                        CONF_MAC: discovery_info.address,
+                        CONF_NAME: discovery_info.name,
+                    },
+                )
+
+            if (discovery_info := index.get(serial)) is not None:
+                _LOGGER.debug("Found Bluetooth device, configuring with Bluetooth")
+                bluetooth_found(discovery_info)
+            else:
+                # the update of the config entry reloads it with Bluetooth
+                entry.async_on_unload(index.async_wait_for(serial, bluetooth_found))
 
         if bluetooth_configured():
             _LOGGER.debug("Initializing Bluetooth device")
-            bluetooth_client = LaMarzoccoBluetoothClient(
+            # keep the connection open between commands sent shortly after another
+            bluetooth_client = LaMarzoccoBluetoothSession(
+                hass,
+                transport_router,
                 username=entry.data[CONF_USERNAME],
                 serial_number=serial,
                 token=entry.data[CONF_TOKEN],
-                address_or_ble_device=entry.data[CONF_MAC],
+                address=entry.data[CONF_MAC],
+                idle_timeout=entry.options.get(
+                    CONF_BLUETOOTH_IDLE_TIMEOUT, DEFAULT_BLUETOOTH_IDLE_TIMEOUT
+                ),
             )
+            entry.async_on_unload(bluetooth_client.async_close)
 
     device = LaMarzoccoMachine(
         model=entry.data[CONF_MODEL],
@@ -150,20 +212,184 @@ async def async_setup_entry(hass: HomeAssistant, entry: LaMarzoccoConfigEntry) -
         local_client=local_client,
         bluetooth_client=bluetooth_client,
     )
+    if cached_state is not None:
+        restore_machine(device, cached_state)
 
     coordinators = LaMarzoccoRuntimeData(
-        LaMarzoccoConfigUpdateCoordinator(hass, entry, device, local_client),
+        LaMarzoccoConfigUpdateCoordinator(
+            hass, entry, device, account, command_queue, local_client
+        ),
         firmware_coordinator,
-        LaMarzoccoStatisticsUpdateCoordinator(hass, entry, device),
+        LaMarzoccoStatisticsUpdateCoordinator(
+            hass, entry, device, account, command_queue
+        ),
+        transport_router,
+        # resolve once which of the entities the machine supports
+        machine_capabilities(entry.data[CONF_MODEL], local_client is not None),
     )
 
-    # API does not like concurrent requests, so no asyncio.gather here
-    await coordinators.config_coordinator.async_config_entry_first_refresh()
-    await coordinators.statistics_coordinator.async_config_entry_first_refresh()
+    # firmware and statistics are loaded in the background, their entities
+    # are unavailable until then unless restored from the cache
+    background_coordinators: list[LaMarzoccoUpdateCoordinator] = [
+        firmware_coordinator,
+        coordinators.statistics_coordinator,
+    ]
+    if cached_state is None:
+        # only the config is needed to set up the entities
+        await coordinators.config_coordinator.async_config_entry_first_refresh()
+        for coordinator in background_coordinators:
+            coordinator.last_update_success = False
+    else:
+        background_coordinators.insert(0, coordinators.config_coordinator)
+        # the cached data is kept through failed updates as long as it is recent
+        for coordinator in (
+            coordinators.config_coordinator,
+            firmware_coordinator,
+            coordinators.statistics_coordinator,
+        ):
+            coordinator.data_updated_at = dt_util.utc_from_timestamp(
+                cached_state["saved_at"]
+            )
 
     entry.runtime_data = coordinators
 
-    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    # failed updates keep the firmware that was loaded before
+    firmware_loaded_at = firmware_coordinator.data_updated_at
+
+    @callback
+    def firmware_updated() -> None:
+        """Check the gateway firmware and the device once the firmware was loaded."""
+        nonlocal firmware_loaded_at
+        if (
+            not firmware_coordinator.last_update_success
+            or firmware_coordinator.data_updated_at == firmware_loaded_at
+        ):
+            return
+        firmware_loaded_at = firmware_coordinator.data_updated_at
+        _async_check_gateway_version(hass, entry, firmware_device)
+        _async_update_sw_version(hass, firmware_device)
+
+    entry.async_on_unload(firmware_coordinator.async_add_listener(firmware_updated))
+
+    if (shot_recorder := coordinators.config_coordinator.shot_recorder) is not None:
+        # the recorded shots are saved once they are settled
+        shot_log = coordinators.shot_log = LaMarzoccoShotLog(hass, entry.entry_id)
+        await shot_log.async_load()
+
+        statistics_coordinator = coordinators.statistics_coordinator
+        # failed updates keep the counts the recent shots were compared with
+        statistics_loaded_at = statistics_coordinator.data_updated_at
+
+        @callback
+        def statistics_updated() -> None:
+            """Tell the shot recorder which keys brewed the recent shots."""
+            nonlocal statistics_loaded_at
+            if (
+                not statistics_coordinator.last_update_success
+                or statistics_coordinator.data_updated_at == statistics_loaded_at
+            ):
+                return
+            statistics_loaded_at = statistics_coordinator.data_updated_at
+            if shots := shot_recorder.async_update_key_counts(
+                device.statistics.drink_stats
+            ):
+                entry.async_create_task(
+                    hass, shot_log.async_append(shots), "lm_shot_log_append"
+                )
+
+        async def save_unsettled_shots() -> None:
+            """Save the shots that are still waiting for their key."""
+            if shots := shot_recorder.async_settle():
+                await shot_log.async_append(shots)
+
+        entry.async_on_unload(
+            statistics_coordinator.async_add_listener(statistics_updated)
+        )
+        entry.async_on_unload(save_unsettled_shots)
+        entry.async_on_unload(
+            async_track_time_interval(
+                hass, shot_log.async_compact, COMPACT_INTERVAL, name="lm_shot_log"
+            )
+        )
+
+    @callback
+    def check_update_intervals() -> None:
+        """Poll at the right rate as soon as the machine leaves or enters standby."""
+        for coordinator in (
+            coordinators.config_coordinator,
+            coordinators.statistics_coordinator,
+        ):
+            coordinator.async_check_update_interval()
+
+    # pushed updates and sent commands can turn the machine on or off
+    entry.async_on_unload(
+        coordinators.config_coordinator.async_add_listener(check_update_intervals)
+    )
+    entry.async_on_unload(command_queue.async_add_listener(check_update_intervals))
+
+    # the schedules of all machines on the account are merged into one index
+    entry.async_on_unload(
+        account.fleet_schedule.async_add_machine(
+            entry.entry_id, coordinators.config_coordinator
+        )
+    )
+
+    # the oldest entry of the account adds the entities of the whole account,
+    # an entry that added them before it was enabled again gives them back
+    owner = async_get_account_owner(hass, account.username)
+    coordinators.owns_account = owner is not None and owner.entry_id == entry.entry_id
+    for other_entry in _async_entries_to_hand_over(hass, account.username):
+        await hass.config_entries.async_reload(other_entry.entry_id)
+
+    # the WebSocket is kept connected independently of the polls
+    if coordinators.config_coordinator.websocket_supervisor is not None:
+        coordinators.config_coordinator.websocket_supervisor.async_start()
+
+    # only set up the platforms that have entities for the machine
+    platforms = required_platforms(PLATFORMS, device.config)
+    if coordinators.owns_account and Platform.CALENDAR not in platforms:
+        # the calendar of all machines on the account
+        platforms.append(Platform.CALENDAR)
+    coordinators.platforms.update(platforms)
+    await hass.config_entries.async_forward_entry_setups(entry, platforms)
+
+    @callback
+    def forward_new_platforms() -> None:
+        """Set up the platforms the updated config of the machine needs."""
+        new_platforms = [
+            platform
+            for platform in required_platforms(PLATFORMS, device.config)
+            if platform not in coordinators.platforms
+        ]
+        if not new_platforms:
+            return
+        coordinators.platforms.update(new_platforms)
+        entry.async_create_task(
+            hass,
+            hass.config_entries.async_forward_entry_setups(entry, new_platforms),
+            name="lm_forward_platforms",
+        )
+
+    entry.async_on_unload(
+        coordinators.config_coordinator.async_add_listener(forward_new_platforms)
+    )
+
+    all_coordinators = (
+        coordinators.config_coordinator,
+        firmware_coordinator,
+        coordinators.statistics_coordinator,
+    )
+
+    @callback
+    def save_state() -> None:
+        """Save the state of the machine once all of it was loaded."""
+        if all(
+            coordinator.data_updated_at is not None for coordinator in all_coordinators
+        ):
+            cache.async_schedule_save(device, firmware_device)
+
+    for coordinator in all_coordinators:
+        entry.async_on_unload(coordinator.async_add_listener(save_state))
 
     async def update_listener(
         hass: HomeAssistant, entry: LaMarzoccoConfigEntry
@@ -172,12 +398,103 @@ async def async_setup_entry(hass: HomeAssistant, entry: LaMarzoccoConfigEntry) -
 
     entry.async_on_unload(entry.add_update_listener(update_listener))
 
+    for coordinator in background_coordinators:
+        entry.async_create_background_task(
+            hass,
+            coordinator.async_refresh(),
+            name=f"lm_refresh_{type(coordinator).__name__}",
+        )
+
     return True
 
 
+@callback
+def _async_update_sw_version(
+    hass: HomeAssistant, firmware_device: LaMarzoccoMachine
+) -> None:
+    """Show the loaded machine firmware on the device of the machine."""
+    device_registry = dr.async_get(hass)
+    device = device_registry.async_get_device(
+        identifiers={(DOMAIN, firmware_device.serial_number)}
+    )
+    if device is None:
+        return
+    sw_version = firmware_device.firmware[FirmwareType.MACHINE].current_version
+    if device.sw_version != sw_version:
+        device_registry.async_update_device(device.id, sw_version=sw_version)
+
+
+@callback
+def _async_check_gateway_version(
+    hass: HomeAssistant,
+    entry: LaMarzoccoConfigEntry,
+    firmware_device: LaMarzoccoMachine,
+) -> None:
+    """Adapt the config entry to the gateway firmware of the machine."""
+    gateway_version = version.parse(
+        firmware_device.firmware[FirmwareType.GATEWAY].current_version
+    )
+
+    if gateway_version >= version.parse("v5.0.9"):
+        # remove host from config entry, it is not supported anymore
+        data = {k: v for k, v in entry.data.items() if k != CONF_HOST}
+        hass.config_entries.async_update_entry(
+            entry,
+            data=data,
+        )
+
+    elif gateway_version < version.parse("v3.4-rc5"):
+        # incompatible gateway firmware, create an issue
+        ir.async_create_issue(
+            hass,
+            DOMAIN,
+            "unsupported_gateway_firmware",
+            is_fixable=False,
+            severity=ir.IssueSeverity.ERROR,
+            translation_key="unsupported_gateway_firmware",
+            translation_placeholders={"gateway_version": str(gateway_version)},
+        )
+
+
+@callback
+def _async_entries_to_hand_over(
+    hass: HomeAssistant, username: str
+) -> list[LaMarzoccoConfigEntry]:
+    """Return the loaded entries of an account that must be reloaded.
+
+    These are the entries that added the entities of the account but no
+    longer own it, or own it without having added them.
+    """
+    owner = async_get_account_owner(hass, username)
+    return [
+        other_entry
+        for other_entry in hass.config_entries.async_loaded_entries(DOMAIN)
+        if other_entry.data[CONF_USERNAME] == username
+        and other_entry.disabled_by is None
+        and other_entry.runtime_data.owns_account
+        != (owner is not None and other_entry.entry_id == owner.entry_id)
+    ]
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: LaMarzoccoConfigEntry) -> bool:
     """Unload a config entry."""
-    return await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    unloaded = await hass.config_entries.async_unload_platforms(
+        entry, entry.runtime_data.platforms
+    )
+    if unloaded and entry.disabled_by is not None:
+        # another entry adds the entities of the account from now on
+        for other_entry in _async_entries_to_hand_over(hass, entry.data[CONF_USERNAME]):
+            hass.config_entries.async_schedule_reload(other_entry.entry_id)
+    return unloaded
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: LaMarzoccoConfigEntry) -> None:
+    """Remove the cached state and shot history of a removed config entry."""
+    await LaMarzoccoStateCache(hass, entry.entry_id).async_remove()
+    await LaMarzoccoShotLog(hass, entry.entry_id).async_remove()
+    # another entry adds the entities of the account from now on
+    for other_entry in _async_entries_to_hand_over(hass, entry.data[CONF_USERNAME]):
+        hass.config_entries.async_schedule_reload(other_entry.entry_id)
 
 
 async def async_migrate_entry(
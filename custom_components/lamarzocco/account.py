@@ -0,0 +1,160 @@
+"""Shared state of the machines on one La Marzocco account."""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from datetime import timedelta
+from itertools import count
+from typing import Any
+
+from aiohttp import ClientSession
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import (
+    CONF_PASSWORD,
+    CONF_USERNAME,
+    EVENT_HOMEASSISTANT_CLOSE,
+)
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers.aiohttp_client import async_create_clientsession
+from homeassistant.helpers.device_registry import DeviceEntryType, DeviceInfo
+from homeassistant.util.hass_dict import HassKey
+
+from .circuit_breaker import LaMarzoccoCircuitBreaker
+from .const import DOMAIN
+from .fleet import LaMarzoccoFleetSchedule
+from .transport import LaMarzoccoRoutedCloudClient
+
+# time between the polls of two machines on the same account
+POLL_STAGGER = timedelta(seconds=2)
+
+ACCOUNTS: HassKey[dict[str, LaMarzoccoAccount]] = HassKey(DOMAIN)
+
+
+@dataclass
+class LaMarzoccoAccount:
+    """Cloud client and poll timetable shared by the machines of an account.
+
+    All machines use the same cloud client, so the account logs in once and
+    all machines use its access token. Their cloud requests share one session
+    on the connection pool of Home Assistant, which has room for a connection
+    per machine, since each machine sends one request at a time. Each
+    machine gets a slot in the poll timetable, so machines on the same
+    account don't poll the cloud at the same time. Cloud requests of all
+    machines pass the same circuit breaker. The schedules of all machines are
+    merged into the fleet schedule.
+    """
+
+    username: str
+    password: str
+    session: ClientSession
+    cloud_client: LaMarzoccoRoutedCloudClient
+    circuit_breaker: LaMarzoccoCircuitBreaker
+    slots: dict[str, int] = field(default_factory=dict)
+    fleet_schedule: LaMarzoccoFleetSchedule = field(
+        default_factory=LaMarzoccoFleetSchedule
+    )
+    unsub_close: CALLBACK_TYPE | None = None
+
+    @callback
+    def async_add_machine(self, entry_id: str) -> None:
+        """Give a machine the first free slot in the poll timetable."""
+        if entry_id not in self.slots:
+            used = set(self.slots.values())
+            self.slots[entry_id] = next(slot for slot in count() if slot not in used)
+
+    def poll_offset(self, entry_id: str) -> timedelta:
+        """Return how much the polls of a machine are delayed."""
+        return self.slots.get(entry_id, 0) * POLL_STAGGER
+
+    @callback
+    def async_set_password(self, password: str) -> None:
+        """Log in with the password changed during a reauth."""
+        self.password = password
+        self.cloud_client.set_password(password)
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        """Return the device of the entities of the whole account."""
+        return DeviceInfo(
+            identifiers={(DOMAIN, self.username)},
+            translation_key="account",
+            translation_placeholders={"username": self.username},
+            manufacturer="La Marzocco",
+            entry_type=DeviceEntryType.SERVICE,
+        )
+
+
+@callback
+def async_get_account(
+    hass: HomeAssistant, entry_id: str, data: Mapping[str, Any]
+) -> LaMarzoccoAccount:
+    """Return the account of a config entry, creating it if needed."""
+    accounts = hass.data.setdefault(ACCOUNTS, {})
+    account = accounts.get(data[CONF_USERNAME])
+    if account is None:
+        circuit_breaker = LaMarzoccoCircuitBreaker()
+        # the session outlives the entry that created it, it is detached
+        # once the last machine of the account is unloaded
+        session = async_create_clientsession(
+            hass, auto_cleanup=False, middlewares=(circuit_breaker,)
+        )
+
+        @callback
+        def async_close_session(_: Event) -> None:
+            session.detach()
+
+        account = accounts[data[CONF_USERNAME]] = LaMarzoccoAccount(
+            username=data[CONF_USERNAME],
+            password=data[CONF_PASSWORD],
+            session=session,
+            cloud_client=LaMarzoccoRoutedCloudClient(
+                username=data[CONF_USERNAME],
+                password=data[CONF_PASSWORD],
+                client=session,
+            ),
+            circuit_breaker=circuit_breaker,
+            unsub_close=hass.bus.async_listen_once(
+                EVENT_HOMEASSISTANT_CLOSE, async_close_session
+            ),
+        )
+    elif account.password != data[CONF_PASSWORD]:
+        # the password was changed during a reauth, the machines still loaded
+        # keep the account, so its session is closed with the last of them
+        account.async_set_password(data[CONF_PASSWORD])
+    account.async_add_machine(entry_id)
+    return account
+
+
+@callback
+def async_get_account_owner(hass: HomeAssistant, username: str) -> ConfigEntry | None:
+    """Return the config entry that adds the entities of the whole account.
+
+    It is the oldest enabled config entry of the account, so the entities
+    stay with the same entry while the others are reloaded.
+    """
+    return next(
+        (
+            entry
+            for entry in hass.config_entries.async_entries(
+                DOMAIN, include_ignore=False, include_disabled=False
+            )
+            if entry.data[CONF_USERNAME] == username
+        ),
+        None,
+    )
+
+
+@callback
+def async_release_account(
+    hass: HomeAssistant, account: LaMarzoccoAccount, entry_id: str
+) -> None:
+    """Remove a machine from its account and drop the account if unused."""
+    account.slots.pop(entry_id, None)
+    accounts = hass.data.get(ACCOUNTS, {})
+    if not account.slots and accounts.get(account.username) is account:
+        del accounts[account.username]
+        if account.unsub_close is not None:
+            account.unsub_close()
+        account.session.detach()
@@ -3,7 +3,6 @@
 from collections.abc import Callable
 from dataclasses import dataclass
 
-from pylamarzocco.const import MachineModel
 from pylamarzocco.models import LaMarzoccoMachineConfig
 
 from homeassistant.components.binary_sensor import (
@@ -15,6 +14,7 @@ from homeassistant.const import EntityCategory
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity_platform import AddConfigEntryEntitiesCallback
 
+from .capabilities import Capability, supported
 from .coordinator import LaMarzoccoConfigEntry
 from .entity import LaMarzoccoEntity, LaMarzoccoEntityDescription, LaMarzoccScaleEntity
 
@@ -39,7 +39,7 @@ ENTITIES: tuple[LaMarzoccoBinarySensorEntityDescription, ...] = (
         device_class=BinarySensorDeviceClass.PROBLEM,
         is_on_fn=lambda config: not config.water_contact,
         entity_category=EntityCategory.DIAGNOSTIC,
-        supported_fn=lambda coordinator: coordinator.local_connection_configured,
+        capability=Capability.LOCAL_CONNECTION,
     ),
     LaMarzoccoBinarySensorEntityDescription(
         key="brew_active",
@@ -75,17 +75,14 @@ async def async_setup_entry(
 ) -> None:
     """Set up binary sensor entities."""
     coordinator = entry.runtime_data.config_coordinator
+    capabilities = entry.runtime_data.capabilities
 
     entities = [
         LaMarzoccoBinarySensorEntity(coordinator, description)
-        for description in ENTITIES
-        if description.supported_fn(coordinator)
+        for description in supported(ENTITIES, capabilities)
     ]
 
-    if (
-        coordinator.device.model in (MachineModel.LINEA_MINI, MachineModel.LINEA_MINI_R)
-        and coordinator.device.config.scale
-    ):
+    if Capability.SCALE in capabilities and coordinator.device.config.scale:
         entities.extend(
             LaMarzoccoScaleBinarySensorEntity(coordinator, description)
             for description in SCALE_ENTITIES
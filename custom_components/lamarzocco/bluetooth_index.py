@@ -0,0 +1,128 @@
+"""Index of the La Marzocco machines seen over Bluetooth."""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+
+from pylamarzocco.const import BT_MODEL_PREFIXES
+
+from homeassistant.components.bluetooth import (
+    BluetoothCallbackMatcher,
+    BluetoothChange,
+    BluetoothScanningMode,
+    BluetoothServiceInfoBleak,
+    async_discovered_service_info,
+    async_register_callback,
+)
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.util.hass_dict import HassKey
+
+from .const import DOMAIN
+
+BLUETOOTH_INDEX: HassKey[LaMarzoccoBluetoothIndex] = HassKey(f"{DOMAIN}_bluetooth")
+
+
+def serial_from_name(name: str | None) -> str | None:
+    """Return the serial number a machine advertises in its name."""
+    if not name or not name.startswith(BT_MODEL_PREFIXES) or "_" not in name:
+        return None
+    return name.split("_")[1]
+
+
+class LaMarzoccoBluetoothIndex:
+    """Bluetooth advertisements of La Marzocco machines by serial number.
+
+    The index is built once from the advertisements seen so far and kept
+    up to date by a Bluetooth callback, so each config entry finds its
+    machine with a dict lookup. Entries waiting for their machine are told
+    when it shows up.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the index."""
+        self._hass = hass
+        self._service_infos: dict[str, BluetoothServiceInfoBleak] = {}
+        self._listeners: dict[
+            str, list[Callable[[BluetoothServiceInfoBleak], None]]
+        ] = {}
+        self._unsub_callbacks: list[CALLBACK_TYPE] = []
+        self.entry_ids: set[str] = set()
+
+    def get(self, serial_number: str) -> BluetoothServiceInfoBleak | None:
+        """Return the last advertisement of a machine."""
+        return self._service_infos.get(serial_number)
+
+    @callback
+    def async_start(self) -> None:
+        """Index the advertisements seen so far and listen for new ones."""
+        for service_info in async_discovered_service_info(self._hass):
+            if (serial_number := serial_from_name(service_info.name)) is not None:
+                self._service_infos[serial_number] = service_info
+        self._unsub_callbacks = [
+            async_register_callback(
+                self._hass,
+                self._async_handle_advertisement,
+                BluetoothCallbackMatcher(local_name=f"{prefix}*", connectable=True),
+                BluetoothScanningMode.PASSIVE,
+            )
+            for prefix in BT_MODEL_PREFIXES
+        ]
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop listening for advertisements."""
+        for unsub in self._unsub_callbacks:
+            unsub()
+        self._unsub_callbacks = []
+
+    @callback
+    def async_wait_for(
+        self,
+        serial_number: str,
+        found_callback: Callable[[BluetoothServiceInfoBleak], None],
+    ) -> CALLBACK_TYPE:
+        """Call back when a machine advertises itself."""
+        listeners = self._listeners.setdefault(serial_number, [])
+        listeners.append(found_callback)
+
+        @callback
+        def remove_listener() -> None:
+            listeners.remove(found_callback)
+            if not listeners:
+                del self._listeners[serial_number]
+
+        return remove_listener
+
+    @callback
+    def _async_handle_advertisement(
+        self, service_info: BluetoothServiceInfoBleak, change: BluetoothChange
+    ) -> None:
+        """Index an advertisement."""
+        if (serial_number := serial_from_name(service_info.name)) is None:
+            return
+        self._service_infos[serial_number] = service_info
+        for found_callback in list(self._listeners.get(serial_number, [])):
+            found_callback(service_info)
+
+
+@callback
+def async_get_bluetooth_index(
+    hass: HomeAssistant, entry_id: str
+) -> LaMarzoccoBluetoothIndex:
+    """Return the Bluetooth index, building it for the first entry."""
+    if (index := hass.data.get(BLUETOOTH_INDEX)) is None:
+        index = hass.data[BLUETOOTH_INDEX] = LaMarzoccoBluetoothIndex(hass)
+        index.async_start()
+    index.entry_ids.add(entry_id)
+    return index
+
+
+@callback
+def async_release_bluetooth_index(hass: HomeAssistant, entry_id: str) -> None:
+    """Stop using the Bluetooth index and drop it if unused."""
+    if (index := hass.data.get(BLUETOOTH_INDEX)) is None:
+        return
+    index.entry_ids.discard(entry_id)
+    if not index.entry_ids:
+        index.async_stop()
+        del hass.data[BLUETOOTH_INDEX]
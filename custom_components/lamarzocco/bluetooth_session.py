@@ -0,0 +1,222 @@
+"""Persistent Bluetooth session to La Marzocco machines."""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+from collections.abc import Awaitable, Callable
+from datetime import datetime
+import logging
+from typing import Any
+
+from bleak import BleakError, BLEDevice
+from bleak.backends.characteristic import BleakGATTCharacteristic
+from bleak_retry_connector import BleakClientWithServiceCache, establish_connection
+from pylamarzocco.clients.bluetooth import LaMarzoccoBluetoothClient
+from pylamarzocco.const import AUTH_CHARACTERISTIC, BoilerType
+from pylamarzocco.exceptions import BluetoothConnectionFailed
+
+from homeassistant.components import bluetooth
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .transport import CommandClass, LaMarzoccoTransportRouter, Transport
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class LaMarzoccoRoutedBluetoothClient(LaMarzoccoBluetoothClient):
+    """Bluetooth client that is skipped while the cloud is the better choice.
+
+    The library falls back to the cloud if a command sent over Bluetooth
+    raises BluetoothConnectionFailed, so a skipped command raises it too.
+    """
+
+    def __init__(
+        self,
+        router: LaMarzoccoTransportRouter,
+        username: str,
+        serial_number: str,
+        token: str,
+        address_or_ble_device: BLEDevice | str,
+    ) -> None:
+        """Initialize the client."""
+        super().__init__(
+            username=username,
+            serial_number=serial_number,
+            token=token,
+            address_or_ble_device=address_or_ble_device,
+        )
+        router.add_transport(Transport.BLUETOOTH)
+        self._router = router
+
+    async def set_power(self, enabled: bool) -> None:
+        """Turn the machine on or off."""
+        await self._async_send(super().set_power, enabled)
+
+    async def set_steam(self, enabled: bool) -> None:
+        """Turn the steam boiler on or off."""
+        await self._async_send(super().set_steam, enabled)
+
+    async def set_temp(self, boiler: BoilerType, temperature: float) -> None:
+        """Set the target temperature of a boiler."""
+        await self._async_send(super().set_temp, boiler, temperature)
+
+    async def _async_send(
+        self, func: Callable[..., Awaitable[None]], *args: Any
+    ) -> None:
+        """Send a command unless Bluetooth is skipped."""
+        if not self._router.should_try(CommandClass.CONTROL, Transport.BLUETOOTH):
+            _LOGGER.debug("Skipping Bluetooth for the command")
+            raise BluetoothConnectionFailed("Bluetooth skipped by the router")
+        await self._router.async_send(
+            CommandClass.CONTROL, Transport.BLUETOOTH, func, *args
+        )
+
+
+class LaMarzoccoBluetoothSession(LaMarzoccoRoutedBluetoothClient):
+    """Bluetooth client keeping the connection open between commands.
+
+    The library connects and authenticates for every command, which takes
+    several seconds through a Bluetooth proxy. The session looks the machine
+    up in the Bluetooth integration, keeps the authenticated connection open
+    until no command was sent for the idle timeout, and reuses it meanwhile.
+
+    The library builds the messages of the commands and writes them with
+    _write_bluetooth_message, which is the only part of it the session
+    replaces. The credentials are kept by the session itself.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        router: LaMarzoccoTransportRouter,
+        username: str,
+        serial_number: str,
+        token: str,
+        address: str,
+        idle_timeout: float,
+    ) -> None:
+        """Initialize the session."""
+        super().__init__(
+            router,
+            username=username,
+            serial_number=serial_number,
+            token=token,
+            address_or_ble_device=address,
+        )
+        self._hass = hass
+        self._auth = (
+            base64.b64encode(f"{username}:{serial_number}".encode())
+            + b"@"
+            + base64.b64encode(token.encode())
+        )
+        self._idle_timeout = idle_timeout
+        self._client: BleakClientWithServiceCache | None = None
+        self._lock = asyncio.Lock()
+        self._unsub_idle_disconnect: CALLBACK_TYPE | None = None
+
+    async def async_close(self) -> None:
+        """Close the connection."""
+        async with self._lock:
+            self._async_cancel_idle_disconnect()
+            await self._async_disconnect()
+
+    async def _write_bluetooth_message(
+        self, characteristic: str, message: bytes | str
+    ) -> None:
+        """Write a message over the open connection, connecting if needed."""
+        if not isinstance(message, bytes):
+            message = bytes(message, "utf-8")
+        message += b"\x00"
+
+        async with self._lock:
+            self._async_cancel_idle_disconnect()
+            try:
+                client = await self._async_connect()
+                _LOGGER.debug(
+                    "Sending bluetooth message: %s to %s", message, characteristic
+                )
+                await client.write_gatt_char(
+                    char_specifier=self._get_characteristic(client, characteristic),
+                    data=message,
+                    response=True,
+                )
+            except (BleakError, TimeoutError) as exc:
+                await self._async_disconnect()
+                raise BluetoothConnectionFailed(
+                    f"Failed to send message to machine with Bluetooth: {exc}"
+                ) from exc
+            except BluetoothConnectionFailed:
+                await self._async_disconnect()
+                raise
+            if self._idle_timeout > 0:
+                self._unsub_idle_disconnect = async_call_later(
+                    self._hass, self._idle_timeout, self._async_idle_disconnect
+                )
+            else:
+                await self._async_disconnect()
+
+    async def _async_connect(self) -> BleakClientWithServiceCache:
+        """Return the authenticated connection, connecting if needed."""
+        if self._client is not None and self._client.is_connected:
+            return self._client
+
+        ble_device = bluetooth.async_ble_device_from_address(
+            self._hass, self.address, connectable=True
+        )
+        if ble_device is None:
+            raise BluetoothConnectionFailed(
+                f"Machine with address {self.address} is not in range"
+            )
+        client = await establish_connection(
+            BleakClientWithServiceCache, ble_device, ble_device.name or self.address
+        )
+
+        try:
+            await client.write_gatt_char(
+                char_specifier=self._get_characteristic(client, AUTH_CHARACTERISTIC),
+                data=self._auth,
+                response=True,
+            )
+        except BaseException:
+            await client.disconnect()
+            raise
+        # the machine needs a moment before it accepts commands
+        await asyncio.sleep(0.1)
+        _LOGGER.debug("Connected to %s with Bluetooth", self.address)
+        self._client = client
+        return client
+
+    @staticmethod
+    def _get_characteristic(
+        client: BleakClientWithServiceCache, uuid: str
+    ) -> BleakGATTCharacteristic:
+        """Return a characteristic of the machine."""
+        if (char := client.services.get_characteristic(uuid)) is None:
+            raise BluetoothConnectionFailed(
+                f"Could not find characteristic {uuid} on machine."
+            )
+        return char
+
+    async def _async_idle_disconnect(self, _: datetime) -> None:
+        """Close the connection after no command was sent for a while."""
+        self._unsub_idle_disconnect = None
+        async with self._lock:
+            # a command may have started while waiting for the lock
+            if self._unsub_idle_disconnect is None:
+                await self._async_disconnect()
+
+    async def _async_disconnect(self) -> None:
+        """Close the connection if it is open."""
+        client, self._client = self._client, None
+        if client is not None and client.is_connected:
+            _LOGGER.debug("Disconnecting from %s", self.address)
+            await client.disconnect()
+
+    @callback
+    def _async_cancel_idle_disconnect(self) -> None:
+        """Cancel closing the connection."""
+        if self._unsub_idle_disconnect is not None:
+            self._unsub_idle_disconnect()
+            self._unsub_idle_disconnect = None
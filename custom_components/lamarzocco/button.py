@@ -12,6 +12,7 @@ from homeassistant.core import HomeAssistant
 from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.entity_platform import AddConfigEntryEntitiesCallback
 
+from .capabilities import supported
 from .const import DOMAIN
 from .coordinator import LaMarzoccoConfigEntry, LaMarzoccoUpdateCoordinator
 from .entity import LaMarzoccoEntity, LaMarzoccoEntityDescription
@@ -32,7 +33,9 @@ class LaMarzoccoButtonEntityDescription(
 
 async def async_backflush_and_update(coordinator: LaMarzoccoUpdateCoordinator) -> None:
     """Press backflush button."""
-    await coordinator.device.start_backflush()
+    await coordinator.command_queue.async_submit(
+        "backflush", coordinator.device.start_backflush
+    )
     # lib will set state optimistically
     coordinator.async_set_updated_data(None)
     # backflush is enabled for 15 seconds
@@ -60,8 +63,7 @@ async def async_setup_entry(
     coordinator = entry.runtime_data.config_coordinator
     async_add_entities(
         LaMarzoccoButtonEntity(coordinator, description)
-        for description in ENTITIES
-        if description.supported_fn(coordinator)
+        for description in supported(ENTITIES, entry.runtime_data.capabilities)
     )
 
 
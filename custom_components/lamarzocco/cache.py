@@ -0,0 +1,210 @@
+"""Cache of the last known state of a La Marzocco machine."""
+
+from __future__ import annotations
+
+from dataclasses import asdict
+from enum import Enum
+from typing import TYPE_CHECKING, Any, TypedDict
+
+from pylamarzocco.const import (
+    BoilerType,
+    FirmwareType,
+    PhysicalKey,
+    PrebrewMode,
+    SmartStandbyMode,
+    WeekDay,
+)
+from pylamarzocco.models import (
+    LaMarzoccoBoiler,
+    LaMarzoccoBrewByWeightSettings,
+    LaMarzoccoCoffeeStatistics,
+    LaMarzoccoFirmware,
+    LaMarzoccoMachineConfig,
+    LaMarzoccoPrebrewConfiguration,
+    LaMarzoccoScale,
+    LaMarzoccoSmartStandby,
+    LaMarzoccoWakeUpSleepEntry,
+)
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+
+if TYPE_CHECKING:
+    from pylamarzocco.devices.machine import LaMarzoccoMachine
+
+# version 1 stored the raw config of the API
+STORAGE_VERSION = 2
+# seconds to wait before the state is written, to combine frequent updates
+SAVE_DELAY = 60
+
+
+class CachedState(TypedDict):
+    """Last known state of a machine."""
+
+    config: dict[str, Any]
+    firmware: dict[str, dict[str, Any]]
+    statistics: dict[str, Any]
+    saved_at: float
+
+
+class _StateStore(Store[CachedState]):
+    """Store of the last known state of a machine."""
+
+    async def _async_migrate_func(
+        self, old_major_version: int, old_minor_version: int, old_data: Any
+    ) -> CachedState | None:
+        """Drop a cache in an older format, the state is loaded from the cloud."""
+        return None
+
+
+class LaMarzoccoStateCache:
+    """Store the last known state of a machine on disk.
+
+    At startup the machine is restored from the cache, so the entities can be
+    set up without waiting for the cloud. The config is saved from the parsed
+    config of the machine, so changes pushed by the WebSocket are kept too.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize the cache."""
+        self._store = _StateStore(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}")
+        self._save_scheduled = False
+
+    async def async_load(self) -> CachedState | None:
+        """Load the last known state."""
+        return await self._store.async_load()
+
+    @callback
+    def async_schedule_save(
+        self, device: LaMarzoccoMachine, firmware_device: LaMarzoccoMachine
+    ) -> None:
+        """Save the current state of the machine after a delay.
+
+        A save that is already scheduled is not postponed, it writes the state
+        at that time. Otherwise updates more frequent than the delay would keep
+        the state from ever being written.
+        """
+        if self._save_scheduled:
+            return
+        self._save_scheduled = True
+
+        def dump_state() -> CachedState:
+            self._save_scheduled = False
+            return _dump_state(device, firmware_device)
+
+        self._store.async_delay_save(dump_state, SAVE_DELAY)
+
+    async def async_remove(self) -> None:
+        """Remove the cache."""
+        await self._store.async_remove()
+
+
+def _dump_state(
+    device: LaMarzoccoMachine, firmware_device: LaMarzoccoMachine
+) -> CachedState:
+    """Return the current state of the machine."""
+    statistics = device.statistics
+    return CachedState(
+        config=_to_json(asdict(device.config)),
+        firmware={
+            component: asdict(firmware)
+            for component, firmware in firmware_device.firmware.items()
+        },
+        statistics={
+            "drink_stats": {
+                str(key.value): count for key, count in statistics.drink_stats.items()
+            },
+            "continous": statistics.continous,
+            "total_flushes": statistics.total_flushes,
+        },
+        saved_at=dt_util.utcnow().timestamp(),
+    )
+
+
+def _to_json(value: Any) -> Any:
+    """Return a value with enums and tuples replaced for the JSON file."""
+    if isinstance(value, dict):
+        return {str(_to_json(key)): _to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_json(item) for item in value]
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def _load_config(config: dict[str, Any]) -> LaMarzoccoMachineConfig:
+    """Return the machine config saved by _dump_state."""
+    return LaMarzoccoMachineConfig(
+        turned_on=config["turned_on"],
+        doses={PhysicalKey(int(key)): dose for key, dose in config["doses"].items()},
+        boilers={
+            BoilerType(boiler): LaMarzoccoBoiler(**values)
+            for boiler, values in config["boilers"].items()
+        },
+        prebrew_mode=PrebrewMode(config["prebrew_mode"]),
+        plumbed_in=config["plumbed_in"],
+        prebrew_configuration={
+            PhysicalKey(int(key)): (
+                LaMarzoccoPrebrewConfiguration(**prebrew),
+                LaMarzoccoPrebrewConfiguration(**preinfusion),
+            )
+            for key, (prebrew, preinfusion) in config["prebrew_configuration"].items()
+        },
+        dose_hot_water=config["dose_hot_water"],
+        water_contact=config["water_contact"],
+        wake_up_sleep_entries={
+            entry_id: LaMarzoccoWakeUpSleepEntry(
+                **(entry | {"days": [WeekDay(day) for day in entry["days"]]})
+            )
+            for entry_id, entry in config["wake_up_sleep_entries"].items()
+        },
+        smart_standby=LaMarzoccoSmartStandby(
+            **(
+                config["smart_standby"]
+                | {"mode": SmartStandbyMode(config["smart_standby"]["mode"])}
+            )
+        ),
+        brew_active=config["brew_active"],
+        brew_active_duration=config["brew_active_duration"],
+        backflush_enabled=config["backflush_enabled"],
+        scale=(
+            LaMarzoccoScale(**config["scale"]) if config["scale"] is not None else None
+        ),
+        bbw_settings=(
+            LaMarzoccoBrewByWeightSettings(
+                doses={
+                    PhysicalKey(int(key)): dose
+                    for key, dose in config["bbw_settings"]["doses"].items()
+                },
+                active_dose=PhysicalKey(config["bbw_settings"]["active_dose"]),
+            )
+            if config["bbw_settings"] is not None
+            else None
+        ),
+    )
+
+
+def restore_firmware(device: LaMarzoccoMachine, state: CachedState) -> None:
+    """Restore the firmware of the machine."""
+    device.firmware = {
+        FirmwareType(component): LaMarzoccoFirmware(**firmware)
+        for component, firmware in state["firmware"].items()
+    }
+
+
+def restore_machine(device: LaMarzoccoMachine, state: CachedState) -> None:
+    """Restore the config, firmware and statistics of the machine."""
+    device.config = _load_config(state["config"])
+    restore_firmware(device, state)
+    statistics = state["statistics"]
+    device.statistics = LaMarzoccoCoffeeStatistics(
+        drink_stats={
+            PhysicalKey(int(key)): count
+            for key, count in statistics["drink_stats"].items()
+        },
+        continous=statistics["continous"],
+        total_flushes=statistics["total_flushes"],
+    )
@@ -1,32 +1,39 @@
 """Calendar platform for La Marzocco espresso machines."""
 
-from collections.abc import Iterator
-from datetime import datetime, timedelta
+from dataclasses import replace
+from datetime import date, datetime, time, timedelta
+from typing import Any
 
+from pylamarzocco.const import WeekDay
 from pylamarzocco.models import LaMarzoccoWakeUpSleepEntry
 
-from homeassistant.components.calendar import CalendarEntity, CalendarEvent
-from homeassistant.core import HomeAssistant
+from homeassistant.components.calendar import (
+    EVENT_END,
+    EVENT_RRULE,
+    EVENT_START,
+    CalendarEntity,
+    CalendarEntityFeature,
+    CalendarEvent,
+)
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import ServiceValidationError
 from homeassistant.helpers.entity_platform import AddConfigEntryEntitiesCallback
 from homeassistant.util import dt as dt_util
 
-from .coordinator import LaMarzoccoConfigEntry, LaMarzoccoUpdateCoordinator
-from .entity import LaMarzoccoBaseEntity
+from .account import LaMarzoccoAccount
+from .const import DOMAIN
+from .coordinator import LaMarzoccoConfigEntry, LaMarzoccoConfigUpdateCoordinator
+from .entity import LaMarzoccoAccountEntity, LaMarzoccoBaseEntity
+from .schedule import WEEKDAYS, AutoOnOffSchedule, ScheduleWindow, WeeklySchedule
 
 # Coordinator is used to centralize the data updates
 PARALLEL_UPDATES = 0
 
 CALENDAR_KEY = "auto_on_off_schedule"
-
-DAY_OF_WEEK = [
-    "monday",
-    "tuesday",
-    "wednesday",
-    "thursday",
-    "friday",
-    "saturday",
-    "sunday",
-]
+FLEET_CALENDAR_KEY = "fleet_auto_on_off_schedule"
+# weekdays in recurrence rules, Monday first like WEEKDAYS
+RRULE_DAYS = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+THIS_AND_FUTURE = "THISANDFUTURE"
 
 
 async def async_setup_entry(
@@ -37,28 +44,216 @@ async def async_setup_entry(
     """Set up switch entities and services."""
 
     coordinator = entry.runtime_data.config_coordinator
-    async_add_entities(
-        LaMarzoccoCalendarEntity(coordinator, CALENDAR_KEY, wake_up_sleep_entry)
-        for wake_up_sleep_entry in coordinator.device.config.wake_up_sleep_entries.values()
-    )
+    added: set[str] = set()
+
+    @callback
+    def _async_add_new_schedules() -> None:
+        """Add a calendar for every schedule the machine did not have yet."""
+        new_entries = [
+            wake_up_sleep_entry
+            for entry_id, wake_up_sleep_entry in (
+                coordinator.device.config.wake_up_sleep_entries.items()
+            )
+            if entry_id not in added
+        ]
+        if new_entries:
+            added.update(
+                wake_up_sleep_entry.entry_id for wake_up_sleep_entry in new_entries
+            )
+            async_add_entities(
+                LaMarzoccoCalendarEntity(coordinator, CALENDAR_KEY, wake_up_sleep_entry)
+                for wake_up_sleep_entry in new_entries
+            )
+
+    _async_add_new_schedules()
+    # the calendar of all machines keeps the platform of the owner set up
+    entry.async_on_unload(coordinator.async_add_listener(_async_add_new_schedules))
+
+    if entry.runtime_data.owns_account:
+        async_add_entities(
+            [LaMarzoccoFleetCalendarEntity(coordinator.account, FLEET_CALENDAR_KEY)]
+        )
 
 
 class LaMarzoccoCalendarEntity(LaMarzoccoBaseEntity, CalendarEntity):
-    """Class representing a La Marzocco calendar."""
+    """Class representing a La Marzocco calendar.
+
+    The events of the calendar repeat weekly on the days of the schedule, so
+    events are changed or deleted as a whole. Deleting them disables the
+    schedule, and creating events requires a disabled schedule.
+    """
 
+    coordinator: LaMarzoccoConfigUpdateCoordinator
     _attr_translation_key = CALENDAR_KEY
+    _attr_supported_features = (
+        CalendarEntityFeature.CREATE_EVENT
+        | CalendarEntityFeature.DELETE_EVENT
+        | CalendarEntityFeature.UPDATE_EVENT
+    )
+    _schedule_key: tuple[bool, tuple[str, ...], str, str] | None = None
+    _schedule: WeeklySchedule
 
     def __init__(
         self,
-        coordinator: LaMarzoccoUpdateCoordinator,
+        coordinator: LaMarzoccoConfigUpdateCoordinator,
         key: str,
         wake_up_sleep_entry: LaMarzoccoWakeUpSleepEntry,
     ) -> None:
         """Set up calendar."""
         super().__init__(coordinator, f"{key}_{wake_up_sleep_entry.entry_id}")
-        self.wake_up_sleep_entry = wake_up_sleep_entry
+        self._identifier = wake_up_sleep_entry.entry_id
         self._attr_translation_placeholders = {"id": wake_up_sleep_entry.entry_id}
 
+    @property
+    def wake_up_sleep_entry(self) -> LaMarzoccoWakeUpSleepEntry | None:
+        """Return the wake up sleep entry, which is replaced when it changes.
+
+        None if the entry was deleted, e.g. in the app.
+        """
+        return self.coordinator.device.config.wake_up_sleep_entries.get(
+            self._identifier
+        )
+
+    @property
+    def available(self) -> bool:
+        """Return True if the schedule still exists."""
+        return super().available and self.wake_up_sleep_entry is not None
+
+    @property
+    def schedule(self) -> WeeklySchedule:
+        """Return the compiled schedule, compiling it again if it changed."""
+        entry = self._get_wake_up_sleep_entry()
+        key = (entry.enabled, tuple(entry.days), entry.time_on, entry.time_off)
+        if key != self._schedule_key:
+            self._schedule_key = key
+            self._schedule = WeeklySchedule.from_entry(entry)
+        return self._schedule
+
+    @property
+    def event(self) -> CalendarEvent | None:
+        """Return the next upcoming event."""
+        now = dt_util.now()
+
+        events = self._get_events(
+            start_date=now,
+            end_date=now + timedelta(days=7),  # only need to check a week ahead
+        )
+        return next(iter(events), None)
+
+    async def async_get_events(
+        self,
+        hass: HomeAssistant,
+        start_date: datetime,
+        end_date: datetime,
+    ) -> list[CalendarEvent]:
+        """Return calendar events within a datetime range."""
+
+        return self._get_events(
+            start_date=start_date,
+            end_date=end_date,
+        )
+
+    async def async_create_event(self, **kwargs: Any) -> None:
+        """Set the disabled schedule to the times of an event."""
+        entry = self._get_wake_up_sleep_entry()
+        if entry.enabled:
+            raise ServiceValidationError(
+                translation_domain=DOMAIN,
+                translation_key="auto_on_off_schedule_in_use",
+                translation_placeholders={"id": self._identifier},
+            )
+        schedule = _schedule_from_event(kwargs)
+        await self.coordinator.async_set_wake_up_sleep_entries([schedule.apply(entry)])
+
+    async def async_update_event(
+        self,
+        uid: str,
+        event: dict[str, Any],
+        recurrence_id: str | None = None,
+        recurrence_range: str | None = None,
+    ) -> None:
+        """Set the schedule to the times of an event."""
+        self._check_whole_schedule(recurrence_id, recurrence_range)
+        schedule = _schedule_from_event(event)
+        await self.coordinator.async_set_wake_up_sleep_entries(
+            [schedule.apply(self._get_wake_up_sleep_entry())]
+        )
+
+    async def async_delete_event(
+        self,
+        uid: str,
+        recurrence_id: str | None = None,
+        recurrence_range: str | None = None,
+    ) -> None:
+        """Disable the schedule."""
+        self._check_whole_schedule(recurrence_id, recurrence_range)
+        await self.coordinator.async_set_wake_up_sleep_entries(
+            [replace(self._get_wake_up_sleep_entry(), enabled=False)]
+        )
+
+    def _get_wake_up_sleep_entry(self) -> LaMarzoccoWakeUpSleepEntry:
+        """Return the wake up sleep entry, raise if it was deleted."""
+        if (entry := self.wake_up_sleep_entry) is None:
+            raise ServiceValidationError(
+                translation_domain=DOMAIN,
+                translation_key="auto_on_off_schedule_not_found",
+                translation_placeholders={"id": self._identifier},
+            )
+        return entry
+
+    def _check_whole_schedule(
+        self, recurrence_id: str | None, recurrence_range: str | None
+    ) -> None:
+        """Raise if only a single event of the schedule is changed."""
+        if recurrence_id and recurrence_range != THIS_AND_FUTURE:
+            raise ServiceValidationError(
+                translation_domain=DOMAIN,
+                translation_key="auto_on_off_schedule_single_event",
+                translation_placeholders={"id": self._identifier},
+            )
+
+    def _get_events(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+    ) -> list[CalendarEvent]:
+        """Get calendar events within a datetime range."""
+        if (entry := self.wake_up_sleep_entry) is None:
+            return []
+        rrule = "FREQ=WEEKLY;BYDAY=" + ",".join(
+            code for day, code in zip(WEEKDAYS, RRULE_DAYS) if day in entry.days
+        )
+        return [
+            CalendarEvent(
+                start=start,
+                end=end,
+                summary=f"Machine {self.coordinator.config_entry.title} on",
+                description="Machine is scheduled to turn on at the start time and off at the end time",
+                uid=self._identifier,
+                recurrence_id=start.isoformat(),
+                rrule=rrule,
+            )
+            for start, end in self.schedule.intervals(start_date, end_date)
+        ]
+
+
+class LaMarzoccoFleetCalendarEntity(LaMarzoccoAccountEntity, CalendarEntity):
+    """Calendar of the schedules of all machines on an account."""
+
+    _attr_translation_key = FLEET_CALENDAR_KEY
+
+    def __init__(self, account: LaMarzoccoAccount, key: str) -> None:
+        """Set up calendar."""
+        super().__init__(account, key)
+        self.fleet_schedule = account.fleet_schedule
+
+    async def async_added_to_hass(self) -> None:
+        """Update the calendar when a schedule changes."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self.fleet_schedule.async_add_listener(self.async_write_ha_state)
+        )
+
     @property
     def event(self) -> CalendarEvent | None:
         """Return the next upcoming event."""
@@ -89,60 +284,82 @@ class LaMarzoccoCalendarEntity(LaMarzoccoBaseEntity, CalendarEntity):
         end_date: datetime,
     ) -> list[CalendarEvent]:
         """Get calendar events within a datetime range."""
+        index = self.fleet_schedule.index
+        return [
+            CalendarEvent(
+                start=start,
+                end=end,
+                summary=f"Machine {window.name} on",
+                description=_describe_window(
+                    index.overlaps.get(window, []), index.conflicts.get(window, [])
+                ),
+            )
+            for start, end, window in index.intervals(start_date, end_date)
+        ]
 
-        events: list[CalendarEvent] = []
-        for date in self._get_date_range(start_date, end_date):
-            if scheduled := self._async_get_calendar_event(date):
-                if scheduled.end < start_date:
-                    continue
-                if scheduled.start > end_date:
-                    continue
-                events.append(scheduled)
-        return events
-
-    def _get_date_range(
-        self, start_date: datetime, end_date: datetime
-    ) -> Iterator[datetime]:
-        current_date = start_date
-        while current_date.date() < end_date.date():
-            yield current_date
-            current_date += timedelta(days=1)
-        yield end_date
-
-    def _async_get_calendar_event(self, date: datetime) -> CalendarEvent | None:
-        """Return calendar event for a given weekday."""
-
-        # check first if auto/on off is turned on in general
-        if not self.wake_up_sleep_entry.enabled:
-            return None
-
-        # parse the schedule for the day
-
-        if DAY_OF_WEEK[date.weekday()] not in self.wake_up_sleep_entry.days:
-            return None
-
-        hour_on, minute_on = self.wake_up_sleep_entry.time_on.split(":")
-        hour_off, minute_off = self.wake_up_sleep_entry.time_off.split(":")
-
-        # if off time is 24:00, then it means the off time is the next day
-        # only for legacy schedules
-        day_offset = 0
-        if hour_off == "24":
-            day_offset = 1
-            hour_off = "0"
-
-        end_date = date.replace(
-            hour=int(hour_off),
-            minute=int(minute_off),
+
+def _schedule_from_event(event: dict[str, Any]) -> AutoOnOffSchedule:
+    """Return the schedule repeating an event weekly."""
+    start: date | datetime = event[EVENT_START]
+    end: date | datetime = event[EVENT_END]
+    if not isinstance(start, datetime) or not isinstance(end, datetime):
+        raise ServiceValidationError(
+            translation_domain=DOMAIN, translation_key="auto_on_off_all_day_event"
+        )
+    start = dt_util.as_local(start)
+    end = dt_util.as_local(end)
+    # an event may end at midnight of the next day
+    if end.date() != start.date() and end != datetime.combine(
+        start.date() + timedelta(days=1), time(), end.tzinfo
+    ):
+        raise ServiceValidationError(
+            translation_domain=DOMAIN,
+            translation_key="invalid_schedule_times",
+            translation_placeholders={
+                "time_on": start.strftime("%H:%M"),
+                "time_off": end.strftime("%H:%M"),
+            },
         )
-        end_date += timedelta(days=day_offset)
-
-        return CalendarEvent(
-            start=date.replace(
-                hour=int(hour_on),
-                minute=int(minute_on),
-            ),
-            end=end_date,
-            summary=f"Machine {self.coordinator.config_entry.title} on",
-            description="Machine is scheduled to turn on at the start time and off at the end time",
+    return AutoOnOffSchedule.from_times(
+        _rrule_days(event.get(EVENT_RRULE), WEEKDAYS[start.weekday()]),
+        start.time(),
+        end.time(),
+    )
+
+
+def _rrule_days(rrule: str | None, first_day: WeekDay) -> list[WeekDay]:
+    """Return the days a weekly or daily recurrence rule repeats on."""
+    if not rrule:
+        return [first_day]
+    parts = dict(part.split("=", 1) for part in rrule.split(";") if "=" in part)
+    if parts.get("FREQ") == "DAILY" and parts.keys() == {"FREQ"}:
+        return WEEKDAYS
+    if parts.get("FREQ") == "WEEKLY" and parts.keys() <= {"FREQ", "BYDAY", "WKST"}:
+        if "BYDAY" not in parts:
+            return [first_day]
+        codes = parts["BYDAY"].split(",")
+        if all(code in RRULE_DAYS for code in codes):
+            return [WEEKDAYS[RRULE_DAYS.index(code)] for code in codes]
+    raise ServiceValidationError(
+        translation_domain=DOMAIN,
+        translation_key="unsupported_schedule_recurrence",
+        translation_placeholders={"rrule": rrule},
+    )
+
+
+def _describe_window(
+    overlaps: list[ScheduleWindow], conflicts: list[ScheduleWindow]
+) -> str:
+    """Describe a window and the windows it overlaps."""
+    description = (
+        "Machine is scheduled to turn on at the start time and off at the end time"
+    )
+    if overlaps:
+        names = sorted({window.name for window in overlaps})
+        description += f". Overlaps the schedule of {', '.join(names)}"
+    if conflicts:
+        ids = sorted({window.schedule_id for window in conflicts})
+        description += (
+            f". Conflicts with auto on/off schedule {', '.join(ids)} of the machine"
         )
+    return description
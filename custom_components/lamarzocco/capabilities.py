@@ -0,0 +1,95 @@
+"""Capabilities of the La Marzocco machine models."""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable
+from enum import StrEnum
+from typing import TYPE_CHECKING
+
+from pylamarzocco.const import MachineModel
+from pylamarzocco.models import LaMarzoccoMachineConfig
+
+from homeassistant.const import Platform
+
+if TYPE_CHECKING:
+    from .entity import LaMarzoccoEntityDescription
+
+
+class Capability(StrEnum):
+    """Feature that only some machines have."""
+
+    DOSE = "dose"
+    HOT_WATER_DOSE = "hot_water_dose"
+    LOCAL_CONNECTION = "local_connection"
+    PREBREW = "prebrew"
+    SCALE = "scale"
+    STEAM_BOILER_TEMPERATURE = "steam_boiler_temperature"
+    STEAM_LEVEL = "steam_level"
+    STEAM_TEMPERATURE = "steam_temperature"
+
+
+MODEL_CAPABILITIES: dict[MachineModel, frozenset[Capability]] = {
+    MachineModel.GS3_AV: frozenset(
+        {
+            Capability.DOSE,
+            Capability.HOT_WATER_DOSE,
+            Capability.PREBREW,
+            Capability.STEAM_BOILER_TEMPERATURE,
+            Capability.STEAM_TEMPERATURE,
+        }
+    ),
+    MachineModel.GS3_MP: frozenset(
+        {
+            Capability.HOT_WATER_DOSE,
+            Capability.STEAM_BOILER_TEMPERATURE,
+            Capability.STEAM_TEMPERATURE,
+        }
+    ),
+    MachineModel.LINEA_MICRA: frozenset(
+        {
+            Capability.PREBREW,
+            Capability.STEAM_BOILER_TEMPERATURE,
+            Capability.STEAM_LEVEL,
+        }
+    ),
+    MachineModel.LINEA_MINI: frozenset({Capability.PREBREW, Capability.SCALE}),
+    MachineModel.LINEA_MINI_R: frozenset({Capability.PREBREW, Capability.SCALE}),
+}
+
+# platforms that only have entities for some configs of a machine
+CONFIG_PLATFORMS: dict[Platform, Callable[[LaMarzoccoMachineConfig], bool]] = {
+    Platform.CALENDAR: lambda config: bool(config.wake_up_sleep_entries),
+}
+
+
+def machine_capabilities(
+    model: str, local_connection_configured: bool
+) -> frozenset[Capability]:
+    """Return the capabilities of a machine."""
+    capabilities = MODEL_CAPABILITIES[MachineModel(model)]
+    if local_connection_configured:
+        capabilities |= {Capability.LOCAL_CONNECTION}
+    return capabilities
+
+
+def supported[_DescriptionT: LaMarzoccoEntityDescription](
+    descriptions: Iterable[_DescriptionT], capabilities: frozenset[Capability]
+) -> list[_DescriptionT]:
+    """Return the descriptions of the entities the machine supports."""
+    return [
+        description
+        for description in descriptions
+        if description.capability is None or description.capability in capabilities
+    ]
+
+
+def required_platforms(
+    platforms: Iterable[Platform], config: LaMarzoccoMachineConfig
+) -> list[Platform]:
+    """Return the platforms that have entities for the config of a machine."""
+    return [
+        platform
+        for platform in platforms
+        if (required_fn := CONFIG_PLATFORMS.get(platform)) is None
+        or required_fn(config)
+    ]
@@ -0,0 +1,151 @@
+"""Circuit breaker for the requests of a La Marzocco account."""
+
+from __future__ import annotations
+
+from datetime import timedelta
+from enum import StrEnum
+from http import HTTPStatus
+import logging
+import random
+from time import monotonic
+
+from aiohttp import ClientError, ClientHandlerType, ClientRequest, ClientResponse
+
+from homeassistant.core import CALLBACK_TYPE, callback
+from homeassistant.exceptions import HomeAssistantError
+
+from .const import DOMAIN
+
+# failed requests in a row after which requests are paused
+FAILURE_THRESHOLD = 5
+# time requests are paused when the breaker opens for the first time
+BASE_OPEN_TIME = timedelta(seconds=30)
+MAX_OPEN_TIME = timedelta(minutes=30)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class CircuitBreakerState(StrEnum):
+    """State of the circuit breaker."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(HomeAssistantError):
+    """Error raised for requests while the circuit breaker is open."""
+
+
+class LaMarzoccoCircuitBreaker:
+    """Pause the cloud requests of an account while the API keeps failing.
+
+    After FAILURE_THRESHOLD failed requests in a row the breaker opens and
+    requests fail right away. Once the open time has passed, a single request
+    is let through to probe the API. If it succeeds the breaker closes,
+    otherwise it opens again for twice as long, with some jitter so machines
+    and accounts don't retry in lockstep.
+
+    The breaker is a middleware of the session of the account, so it only
+    sees requests to the cloud, local and Bluetooth commands bypass it.
+    Connection errors, timeouts and server errors count as failures, any
+    other response shows the API is reachable.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the circuit breaker."""
+        self.state = CircuitBreakerState.CLOSED
+        self._failures = 0
+        self._trips = 0
+        self._open_until = 0.0
+        self._probing = False
+        self._listeners: list[CALLBACK_TYPE] = []
+
+    @property
+    def retry_in(self) -> timedelta:
+        """Return the time until requests are let through again."""
+        if self.state is not CircuitBreakerState.OPEN:
+            return timedelta(0)
+        return timedelta(seconds=max(self._open_until - monotonic(), 0))
+
+    @callback
+    def async_add_listener(self, update_callback: CALLBACK_TYPE) -> CALLBACK_TYPE:
+        """Listen for state changes of the breaker."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            self._listeners.remove(update_callback)
+
+        return remove_listener
+
+    async def __call__(
+        self, request: ClientRequest, handler: ClientHandlerType
+    ) -> ClientResponse:
+        """Send a request unless the breaker is open."""
+        self._before_request()
+        try:
+            response = await handler(request)
+        except (ClientError, TimeoutError):
+            self._record_failure()
+            raise
+        finally:
+            self._probing = False
+        if (
+            response.status >= HTTPStatus.INTERNAL_SERVER_ERROR
+            or response.status == HTTPStatus.TOO_MANY_REQUESTS
+        ):
+            self._record_failure()
+        else:
+            self._record_success()
+        return response
+
+    def _before_request(self) -> None:
+        """Raise if the request may not be sent."""
+        if self.state is CircuitBreakerState.OPEN and monotonic() >= self._open_until:
+            self._set_state(CircuitBreakerState.HALF_OPEN)
+        if self.state is CircuitBreakerState.CLOSED:
+            return
+        if self.state is CircuitBreakerState.HALF_OPEN and not self._probing:
+            self._probing = True
+            return
+        raise CircuitOpenError(
+            translation_domain=DOMAIN,
+            translation_key="circuit_open",
+            translation_placeholders={
+                "retry_in": str(max(round(self.retry_in.total_seconds()), 1))
+            },
+        )
+
+    def _record_failure(self) -> None:
+        """Count a failed request and open the breaker if needed."""
+        self._failures += 1
+        if (
+            self.state is CircuitBreakerState.HALF_OPEN
+            or self._failures >= FAILURE_THRESHOLD
+        ):
+            self._trips += 1
+            open_time = min(BASE_OPEN_TIME * 2 ** (self._trips - 1), MAX_OPEN_TIME)
+            self._open_until = monotonic() + open_time.total_seconds() * random.uniform(
+                0.8, 1.2
+            )
+            _LOGGER.warning(
+                "Requests failed %s times in a row, pausing requests for %s",
+                self._failures,
+                open_time,
+            )
+            self._set_state(CircuitBreakerState.OPEN)
+
+    def _record_success(self) -> None:
+        """Close the breaker after a successful request."""
+        self._failures = 0
+        self._trips = 0
+        if self.state is not CircuitBreakerState.CLOSED:
+            _LOGGER.info("Requests succeed again, resuming requests")
+            self._set_state(CircuitBreakerState.CLOSED)
+
+    def _set_state(self, state: CircuitBreakerState) -> None:
+        """Set the state and inform the listeners."""
+        self.state = state
+        for update_callback in list(self._listeners):
+            update_callback()
@@ -0,0 +1,130 @@
+"""Serialized command queue for La Marzocco machines."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from dataclasses import dataclass
+from functools import partial
+from typing import Any
+
+from homeassistant.core import CALLBACK_TYPE, callback
+from homeassistant.util.async_ import create_eager_task
+
+
+@dataclass
+class _QueuedCommand:
+    """Command waiting to be sent to the machine."""
+
+    func: Callable[[], Awaitable[Any]]
+    future: asyncio.Future[Any]
+    send_at: float
+    # callers still waiting for the result
+    waiters: int = 1
+    task: asyncio.Task[None] | None = None
+    sent: bool = False
+
+
+class LaMarzoccoCommandQueue:
+    """Send requests to a machine one at a time.
+
+    A command that is still waiting for its turn is superseded by a newer
+    command with the same key, so only the last value is sent and all
+    callers receive its result. If both commands are partials of the same
+    function, their keyword arguments are merged, so related settings end
+    up in a single request. Listeners are told about every command with a
+    key that was sent successfully.
+
+    Commands are sent by tasks of the queue, so a caller that is cancelled
+    doesn't take the command of the other callers with it. A command is only
+    dropped if all its callers were cancelled before it was sent.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the queue."""
+        self._lock = asyncio.Lock()
+        self._pending: dict[Hashable, _QueuedCommand] = {}
+        self._listeners: list[CALLBACK_TYPE] = []
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    @callback
+    def async_add_listener(self, update_callback: CALLBACK_TYPE) -> CALLBACK_TYPE:
+        """Listen for commands with a key being sent successfully."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            self._listeners.remove(update_callback)
+
+        return remove_listener
+
+    async def async_submit[_T](
+        self,
+        key: Hashable | None,
+        func: Callable[[], Awaitable[_T]],
+        debounce: float = 0,
+    ) -> _T:
+        """Queue a command and wait for its result.
+
+        With a debounce, the command is sent once no newer command with the
+        same key was submitted for that many seconds.
+        """
+        loop = asyncio.get_running_loop()
+        if key is not None and (queued := self._pending.get(key)) is not None:
+            if (
+                isinstance(queued.func, partial)
+                and isinstance(func, partial)
+                and queued.func.func == func.func
+            ):
+                func = partial(
+                    func.func, *func.args, **(queued.func.keywords | func.keywords)
+                )
+            queued.func = func
+            queued.send_at = max(queued.send_at, loop.time() + debounce)
+            queued.waiters += 1
+            return await self._async_wait(queued)
+
+        queued = _QueuedCommand(func, loop.create_future(), loop.time() + debounce)
+        if key is not None:
+            self._pending[key] = queued
+        # a command that is due is sent right away if the queue is free
+        queued.task = create_eager_task(self._async_send(key, queued), loop=loop)
+        self._tasks.add(queued.task)
+        queued.task.add_done_callback(self._tasks.discard)
+        return await self._async_wait(queued)
+
+    async def _async_wait(self, queued: _QueuedCommand) -> Any:
+        """Wait for the result of a command."""
+        try:
+            return await asyncio.shield(queued.future)
+        except asyncio.CancelledError:
+            queued.waiters -= 1
+            if not queued.waiters and not queued.sent and queued.task is not None:
+                queued.task.cancel()
+            raise
+
+    async def _async_send(self, key: Hashable | None, queued: _QueuedCommand) -> None:
+        """Send a command once it is due and set its result."""
+        loop = asyncio.get_running_loop()
+        try:
+            while (delay := queued.send_at - loop.time()) > 0:
+                await asyncio.sleep(delay)
+            async with self._lock:
+                if key is not None:
+                    del self._pending[key]
+                queued.sent = True
+                result = await queued.func()
+        except asyncio.CancelledError:
+            if key is not None and self._pending.get(key) is queued:
+                del self._pending[key]
+            queued.future.cancel()
+            raise
+        except Exception as exc:
+            queued.future.set_exception(exc)
+            # the callers get the exception, it is not lost if they were cancelled
+            queued.future.exception()
+            return
+        queued.future.set_result(result)
+        if key is not None:
+            for update_callback in list(self._listeners):
+                update_callback()
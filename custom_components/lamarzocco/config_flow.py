@@ -13,10 +13,6 @@ from pylamarzocco.exceptions import AuthFail, RequestNotSuccessful
 from pylamarzocco.models import LaMarzoccoDeviceInfo
 import voluptuous as vol
 
-from homeassistant.components.bluetooth import (
-    BluetoothServiceInfo,
-    async_discovered_service_info,
-)
 from homeassistant.config_entries import (
     SOURCE_REAUTH,
     SOURCE_RECONFIGURE,
@@ -36,8 +32,11 @@ from homeassistant.const import (
 )
 from homeassistant.core import callback
 from homeassistant.helpers import config_validation as cv
-from homeassistant.helpers.aiohttp_client import async_create_clientsession
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.helpers.selector import (
+    NumberSelector,
+    NumberSelectorConfig,
+    NumberSelectorMode,
     SelectOptionDict,
     SelectSelector,
     SelectSelectorConfig,
@@ -46,9 +45,21 @@ from homeassistant.helpers.selector import (
     TextSelectorConfig,
     TextSelectorType,
 )
+from homeassistant.helpers.service_info.bluetooth import BluetoothServiceInfo
 from homeassistant.helpers.service_info.dhcp import DhcpServiceInfo
 
-from .const import CONF_USE_BLUETOOTH, DOMAIN
+from .const import (
+    CONF_BLUETOOTH_IDLE_TIMEOUT,
+    CONF_MAX_DATA_AGE,
+    CONF_MAX_FAILED_UPDATES,
+    CONF_USE_BLUETOOTH,
+    CONF_WEBSOCKET_UPDATE_WINDOW,
+    DEFAULT_BLUETOOTH_IDLE_TIMEOUT,
+    DEFAULT_MAX_DATA_AGE,
+    DEFAULT_MAX_FAILED_UPDATES,
+    DEFAULT_WEBSOCKET_UPDATE_WINDOW,
+    DOMAIN,
+)
 from .coordinator import LaMarzoccoConfigEntry
 
 CONF_MACHINE = "machine"
@@ -86,7 +97,7 @@ class LmConfigFlow(ConfigFlow, domain=DOMAIN):
                 **self._discovered,
             }
 
-            self._client = async_create_clientsession(self.hass)
+            self._client = async_get_clientsession(self.hass)
             cloud_client = LaMarzoccoCloudClient(
                 username=data[CONF_USERNAME],
                 password=data[CONF_PASSWORD],
@@ -190,6 +201,11 @@ class LmConfigFlow(ConfigFlow, domain=DOMAIN):
 
             if not errors:
                 if self.source == SOURCE_RECONFIGURE:
+                    # pylint: disable-next=import-outside-toplevel
+                    from homeassistant.components.bluetooth import (
+                        async_discovered_service_info,
+                    )
+
                     for service_info in async_discovered_service_info(self.hass):
                         self._discovered[service_info.name] = service_info.address
 
@@ -400,6 +416,73 @@ class LmOptionsFlowHandler(OptionsFlow):
                     CONF_USE_BLUETOOTH,
                     default=self.config_entry.options.get(CONF_USE_BLUETOOTH, True),
                 ): cv.boolean,
+                vol.Optional(
+                    CONF_BLUETOOTH_IDLE_TIMEOUT,
+                    default=self.config_entry.options.get(
+                        CONF_BLUETOOTH_IDLE_TIMEOUT, DEFAULT_BLUETOOTH_IDLE_TIMEOUT
+                    ),
+                ): vol.All(
+                    NumberSelector(
+                        NumberSelectorConfig(
+                            min=0,
+                            max=600,
+                            step=5,
+                            mode=NumberSelectorMode.BOX,
+                            unit_of_measurement="s",
+                        )
+                    ),
+                    vol.Coerce(int),
+                ),
+                vol.Optional(
+                    CONF_WEBSOCKET_UPDATE_WINDOW,
+                    default=self.config_entry.options.get(
+                        CONF_WEBSOCKET_UPDATE_WINDOW, DEFAULT_WEBSOCKET_UPDATE_WINDOW
+                    ),
+                ): vol.All(
+                    NumberSelector(
+                        NumberSelectorConfig(
+                            min=0,
+                            max=5000,
+                            step=50,
+                            mode=NumberSelectorMode.BOX,
+                            unit_of_measurement="ms",
+                        )
+                    ),
+                    vol.Coerce(int),
+                ),
+                vol.Optional(
+                    CONF_MAX_DATA_AGE,
+                    default=self.config_entry.options.get(
+                        CONF_MAX_DATA_AGE, DEFAULT_MAX_DATA_AGE
+                    ),
+                ): vol.All(
+                    NumberSelector(
+                        NumberSelectorConfig(
+                            min=0,
+                            max=1440,
+                            step=1,
+                            mode=NumberSelectorMode.BOX,
+                            unit_of_measurement="min",
+                        )
+                    ),
+                    vol.Coerce(int),
+                ),
+                vol.Optional(
+                    CONF_MAX_FAILED_UPDATES,
+                    default=self.config_entry.options.get(
+                        CONF_MAX_FAILED_UPDATES, DEFAULT_MAX_FAILED_UPDATES
+                    ),
+                ): vol.All(
+                    NumberSelector(
+                        NumberSelectorConfig(
+                            min=1,
+                            max=100,
+                            step=1,
+                            mode=NumberSelectorMode.BOX,
+                        )
+                    ),
+                    vol.Coerce(int),
+                ),
             }
         )
 
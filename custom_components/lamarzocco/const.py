@@ -4,4 +4,20 @@ from typing import Final
 
 DOMAIN: Final = "lamarzocco"
 
+CONF_BLUETOOTH_IDLE_TIMEOUT: Final = "bluetooth_idle_timeout"
+CONF_MAX_DATA_AGE: Final = "max_data_age"
+CONF_MAX_FAILED_UPDATES: Final = "max_failed_updates"
 CONF_USE_BLUETOOTH: Final = "use_bluetooth"
+CONF_WEBSOCKET_UPDATE_WINDOW: Final = "websocket_update_window"
+
+# milliseconds in which WebSocket updates are combined into one entity update
+DEFAULT_WEBSOCKET_UPDATE_WINDOW: Final = 500
+
+# minutes the last data is shown after it should have been refreshed
+DEFAULT_MAX_DATA_AGE: Final = 15
+
+# failed updates in a row after which the last data is no longer shown
+DEFAULT_MAX_FAILED_UPDATES: Final = 3
+
+# seconds the Bluetooth connection is kept open after the last command
+DEFAULT_BLUETOOTH_IDLE_TIMEOUT: Final = 30
@@ -3,28 +3,63 @@
 from __future__ import annotations
 
 from abc import abstractmethod
-from collections.abc import Callable
-from dataclasses import dataclass
-from datetime import timedelta
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from functools import cached_property, partial
 import logging
-from typing import Any
+from time import time
+from typing import TYPE_CHECKING
 
-from pylamarzocco.clients.local import LaMarzoccoLocalClient
-from pylamarzocco.devices.machine import LaMarzoccoMachine
+from pylamarzocco.const import FirmwareType
 from pylamarzocco.exceptions import AuthFail, RequestNotSuccessful
+from pylamarzocco.models import LaMarzoccoScale, LaMarzoccoWakeUpSleepEntry
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.const import CONF_ADDRESS, CONF_MAC, Platform
 from homeassistant.core import HomeAssistant, callback
-from homeassistant.exceptions import ConfigEntryAuthFailed
+from homeassistant.exceptions import ConfigEntryAuthFailed, HomeAssistantError
 from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.helpers.event import async_call_later
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
-
-from .const import DOMAIN
+from homeassistant.util import dt as dt_util
+
+from .account import LaMarzoccoAccount
+from .capabilities import Capability
+from .circuit_breaker import CircuitOpenError
+from .command_queue import LaMarzoccoCommandQueue
+from .const import (
+    CONF_MAX_DATA_AGE,
+    CONF_MAX_FAILED_UPDATES,
+    CONF_WEBSOCKET_UPDATE_WINDOW,
+    DEFAULT_MAX_DATA_AGE,
+    DEFAULT_MAX_FAILED_UPDATES,
+    DEFAULT_WEBSOCKET_UPDATE_WINDOW,
+    DOMAIN,
+)
+from .schedule import WeeklySchedule
+from .shot_log import LaMarzoccoShotLog
+from .shots import LaMarzoccoShotRecorder
+from .transport import LaMarzoccoTransportRouter
+from .websocket import LaMarzoccoWebSocketSupervisor
+
+if TYPE_CHECKING:
+    from pylamarzocco.clients.local import LaMarzoccoLocalClient
+    from pylamarzocco.devices.machine import LaMarzoccoMachine
 
 SCAN_INTERVAL = timedelta(seconds=30)
 FIRMWARE_UPDATE_INTERVAL = timedelta(hours=1)
 STATISTICS_UPDATE_INTERVAL = timedelta(minutes=5)
+# intervals used while the machine is in standby outside of its schedule
+IDLE_SCAN_INTERVAL = timedelta(minutes=5)
+IDLE_STATISTICS_UPDATE_INTERVAL = timedelta(minutes=30)
+# upper bound for the backoff after repeated failed updates
+MAX_BACKOFF_INTERVAL = timedelta(minutes=30)
+# while the WebSocket pushes updates, only poll the full config occasionally
+PUSH_MODE_POLL_INTERVAL = timedelta(minutes=30)
+# the machine sends keep alive frames, so a silent socket is considered stale
+WEBSOCKET_IDLE_TIMEOUT = timedelta(minutes=1)
 _LOGGER = logging.getLogger(__name__)
 
 
@@ -35,15 +70,29 @@ class LaMarzoccoRuntimeData:
     config_coordinator: LaMarzoccoConfigUpdateCoordinator
     firmware_coordinator: LaMarzoccoFirmwareUpdateCoordinator
     statistics_coordinator: LaMarzoccoStatisticsUpdateCoordinator
+    transport_router: LaMarzoccoTransportRouter
+    capabilities: frozenset[Capability]
+    platforms: set[Platform] = field(default_factory=set)
+    shot_log: LaMarzoccoShotLog | None = None
+    # the entry adds the entities of the whole account
+    owns_account: bool = False
 
 
 type LaMarzoccoConfigEntry = ConfigEntry[LaMarzoccoRuntimeData]
 
 
+def in_wake_up_window(
+    entries: Iterable[LaMarzoccoWakeUpSleepEntry], now: datetime
+) -> bool:
+    """Return True if any enabled auto on/off entry covers the given time."""
+    return any(WeeklySchedule.from_entry(entry).is_on(now) for entry in entries)
+
+
 class LaMarzoccoUpdateCoordinator(DataUpdateCoordinator[None]):
     """Base class for La Marzocco coordinators."""
 
     _default_update_interval = SCAN_INTERVAL
+    _idle_update_interval: timedelta | None = None
     config_entry: LaMarzoccoConfigEntry
 
     def __init__(
@@ -51,6 +100,8 @@ class LaMarzoccoUpdateCoordinator(DataUpdateCoordinator[None]):
         hass: HomeAssistant,
         entry: LaMarzoccoConfigEntry,
         device: LaMarzoccoMachine,
+        account: LaMarzoccoAccount,
+        command_queue: LaMarzoccoCommandQueue,
         local_client: LaMarzoccoLocalClient | None = None,
     ) -> None:
         """Initialize coordinator."""
@@ -62,71 +113,287 @@ class LaMarzoccoUpdateCoordinator(DataUpdateCoordinator[None]):
             update_interval=self._default_update_interval,
         )
         self.device = device
+        self.account = account
+        self.command_queue = command_queue
+        # shift the timetable of this machine once, after the first refresh
+        self._poll_offset = account.poll_offset(entry.entry_id)
         self.local_connection_configured = local_client is not None
         self._local_client = local_client
         self.new_device_callback: list[Callable] = []
+        self._consecutive_failures = 0
+        # time the current data was fetched and when it was due to be refreshed
+        self.data_updated_at: datetime | None = None
+        self._data_update_interval = self._default_update_interval
+        self._scale_device_infos: dict[str, DeviceInfo] = {}
+
+    @cached_property
+    def device_info(self) -> DeviceInfo:
+        """Return the device info shared by all entities of the machine.
+
+        The entities share this dict, so it must not be changed. The firmware
+        is unknown until it was loaded, newer versions are written to the
+        device registry after each firmware update.
+        """
+        device = self.device
+        device_info = DeviceInfo(
+            identifiers={(DOMAIN, device.serial_number)},
+            name=device.name,
+            manufacturer="La Marzocco",
+            model=device.full_model_name,
+            model_id=device.model,
+            serial_number=device.serial_number,
+        )
+        if (firmware := device.firmware.get(FirmwareType.MACHINE)) is not None:
+            device_info["sw_version"] = firmware.current_version
+        connections: set[tuple[str, str]] = set()
+        if self.config_entry.data.get(CONF_ADDRESS):
+            connections.add(
+                (dr.CONNECTION_NETWORK_MAC, self.config_entry.data[CONF_ADDRESS])
+            )
+        if self.config_entry.data.get(CONF_MAC):
+            connections.add((dr.CONNECTION_BLUETOOTH, self.config_entry.data[CONF_MAC]))
+        if connections:
+            device_info["connections"] = connections
+        return device_info
+
+    def scale_device_info(self, scale: LaMarzoccoScale) -> DeviceInfo:
+        """Return the device info shared by all entities of a scale."""
+        if (device_info := self._scale_device_infos.get(scale.address)) is None:
+            device_info = self._scale_device_infos[scale.address] = DeviceInfo(
+                identifiers={(DOMAIN, scale.address)},
+                name=scale.name,
+                manufacturer="Acaia",
+                model="Lunar",
+                model_id="Y.301",
+                via_device=(DOMAIN, self.device.serial_number),
+            )
+        return device_info
 
     async def _async_update_data(self) -> None:
         """Do the data update."""
         try:
-            await self._internal_async_update_data()
+            fetched = await self._internal_async_update_data()
         except AuthFail as ex:
             _LOGGER.debug("Authentication failed", exc_info=True)
             raise ConfigEntryAuthFailed(
                 translation_domain=DOMAIN, translation_key="authentication_failed"
             ) from ex
-        except RequestNotSuccessful as ex:
+        except (RequestNotSuccessful, CircuitOpenError) as ex:
             _LOGGER.debug(ex, exc_info=True)
+            self._consecutive_failures += 1
+            # don't poll again while the circuit breaker pauses requests
+            self.update_interval = max(
+                self._next_update_interval(), self.account.circuit_breaker.retry_in
+            )
+            if self.data_is_usable:
+                _LOGGER.debug(
+                    "Update failed, keeping data from %s", self.data_updated_at
+                )
+                return
+            if isinstance(ex, CircuitOpenError):
+                raise UpdateFailed(
+                    translation_domain=DOMAIN,
+                    translation_key=ex.translation_key,
+                    translation_placeholders=ex.translation_placeholders,
+                ) from ex
             raise UpdateFailed(
                 translation_domain=DOMAIN, translation_key="api_error"
             ) from ex
+        self._consecutive_failures = 0
+        self.update_interval = self._next_update_interval() + self._poll_offset
+        self._poll_offset = timedelta(0)
+        if fetched:
+            self.data_updated_at = dt_util.utcnow()
+        self._data_update_interval = self.update_interval
+
+    @property
+    def data_is_usable(self) -> bool:
+        """Return True if the last data can still be shown after failed updates.
+
+        The data is kept until the configured max age has passed since it was
+        due to be refreshed, or until the configured number of updates failed
+        in a row.
+        """
+        if self.data_updated_at is None:
+            return False
+        options = self.config_entry.options
+        max_age = timedelta(
+            minutes=options.get(CONF_MAX_DATA_AGE, DEFAULT_MAX_DATA_AGE)
+        )
+        return (
+            self._consecutive_failures
+            < options.get(CONF_MAX_FAILED_UPDATES, DEFAULT_MAX_FAILED_UPDATES)
+            and dt_util.utcnow()
+            < self.data_updated_at + self._data_update_interval + max_age
+        )
+
+    @property
+    def machine_idle(self) -> bool:
+        """Return True if the machine is in standby outside of its schedule."""
+        config = self.device.config
+        if config.turned_on or config.brew_active or config.backflush_enabled:
+            return False
+        return not in_wake_up_window(
+            config.wake_up_sleep_entries.values(), dt_util.now()
+        )
+
+    def _next_update_interval(self) -> timedelta:
+        """Return the interval to the next update based on the machine state."""
+        interval = self._default_update_interval
+        if self._idle_update_interval is not None and self.machine_idle:
+            interval = self._idle_update_interval
+        if self._consecutive_failures > 1:
+            # back off exponentially, but never poll faster than usual
+            backoff = interval * 2 ** (self._consecutive_failures - 1)
+            interval = max(interval, min(backoff, MAX_BACKOFF_INTERVAL))
+        return interval
+
+    @callback
+    def async_check_update_interval(self) -> None:
+        """Reschedule the next update if the machine left or entered standby.
+
+        The interval is otherwise only picked after a refresh, so a machine
+        turned on by a command or on the machine itself would keep the idle
+        interval until the next poll.
+        """
+        if self.data_updated_at is None or self._consecutive_failures:
+            # not refreshed yet, or backing off after failed updates
+            return
+        if (interval := self._next_update_interval()) == self.update_interval:
+            return
+        _LOGGER.debug("Machine state changed, next update in %s", interval)
+        self.update_interval = interval
+        self._schedule_refresh()
 
     @abstractmethod
-    async def _internal_async_update_data(self) -> None:
-        """Actual data update logic."""
+    async def _internal_async_update_data(self) -> bool:
+        """Actual data update logic, return False if no data was fetched."""
 
 
 class LaMarzoccoConfigUpdateCoordinator(LaMarzoccoUpdateCoordinator):
     """Class to handle fetching data from the La Marzocco API centrally."""
 
+    _idle_update_interval = IDLE_SCAN_INTERVAL
     _scale_address: str | None = None
+    _last_poll: float | None = None
+    _brew_active = False
+    _last_push_update = 0.0
+    _unsub_push_update: Callable[[], None] | None = None
 
-    async def _async_connect_websocket(self) -> None:
-        """Set up the coordinator."""
-        if self._local_client is not None and (
-            self._local_client.websocket is None or self._local_client.websocket.closed
-        ):
-            _LOGGER.debug("Init WebSocket in background task")
-
-            self.config_entry.async_create_background_task(
-                hass=self.hass,
-                target=self.device.websocket_connect(
-                    notify_callback=lambda: self.async_set_updated_data(None)
-                ),
-                name="lm_websocket_task",
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: LaMarzoccoConfigEntry,
+        device: LaMarzoccoMachine,
+        account: LaMarzoccoAccount,
+        command_queue: LaMarzoccoCommandQueue,
+        local_client: LaMarzoccoLocalClient | None = None,
+    ) -> None:
+        """Initialize coordinator."""
+        super().__init__(hass, entry, device, account, command_queue, local_client)
+        # a scale restored from the cache is set up with the platforms
+        if device.config.scale:
+            self._scale_address = device.config.scale.address
+        self.websocket_supervisor: LaMarzoccoWebSocketSupervisor | None = None
+        self.shot_recorder: LaMarzoccoShotRecorder | None = None
+        if local_client is not None:
+            self.websocket_supervisor = LaMarzoccoWebSocketSupervisor(
+                hass, entry, device, local_client, self._async_handle_websocket_update
             )
+            self.shot_recorder = LaMarzoccoShotRecorder(device)
+        entry.async_on_unload(self._async_cancel_push_update)
+
+    @property
+    def websocket_healthy(self) -> bool:
+        """Return True if the WebSocket is connected and recently received data."""
+        last_message = self.device.timestamp_last_websocket_msg
+        return (
+            self.device.websocket_connected
+            and last_message is not None
+            and time() - last_message < WEBSOCKET_IDLE_TIMEOUT.total_seconds()
+        )
 
-            async def websocket_close(_: Any | None = None) -> None:
-                if (
-                    self._local_client is not None
-                    and self._local_client.websocket is not None
-                    and not self._local_client.websocket.closed
-                ):
-                    await self._local_client.websocket.close()
-
-            self.config_entry.async_on_unload(
-                self.hass.bus.async_listen_once(
-                    EVENT_HOMEASSISTANT_STOP, websocket_close
+    async def async_set_wake_up_sleep_entries(
+        self, entries: Iterable[LaMarzoccoWakeUpSleepEntry]
+    ) -> None:
+        """Send changed auto on/off schedules to the machine, one request each."""
+        try:
+            for entry in entries:
+                await self.command_queue.async_submit(
+                    f"auto_on_off_{entry.entry_id}",
+                    partial(self.device.set_wake_up_sleep, entry),
                 )
+        except RequestNotSuccessful as exc:
+            raise HomeAssistantError(
+                translation_domain=DOMAIN,
+                translation_key="auto_on_off_schedule_error",
+                translation_placeholders={"id": entry.entry_id},
+            ) from exc
+        finally:
+            # entries sent before a failure were changed on the machine
+            self.async_update_listeners()
+
+    @callback
+    def _async_handle_websocket_update(self) -> None:
+        """Combine WebSocket updates arriving within the update window.
+
+        During a shot the machine sends several updates per second, so
+        listeners are updated at most once per window. Start and end of a
+        shot are passed on immediately, which also flushes pending updates.
+        The shot recorder still sees every update.
+        """
+        if self.shot_recorder is not None:
+            self.shot_recorder.async_update()
+        window = (
+            self.config_entry.options.get(
+                CONF_WEBSOCKET_UPDATE_WINDOW, DEFAULT_WEBSOCKET_UPDATE_WINDOW
             )
-            self.config_entry.async_on_unload(websocket_close)
+            / 1000
+        )
+        if self.device.config.brew_active != self._brew_active:
+            self._brew_active = self.device.config.brew_active
+            self._async_push_update()
+            return
+        if self._unsub_push_update is not None:
+            return
+        if (delay := self._last_push_update + window - time()) <= 0:
+            self._async_push_update()
+            return
+        self._unsub_push_update = async_call_later(
+            self.hass, delay, self._async_push_update
+        )
 
-    async def _internal_async_update_data(self) -> None:
+    @callback
+    def _async_push_update(self, _: datetime | None = None) -> None:
+        """Update the listeners with the state pushed by the WebSocket."""
+        self._async_cancel_push_update()
+        self._last_push_update = time()
+        self.async_set_updated_data(None)
+
+    @callback
+    def _async_cancel_push_update(self) -> None:
+        """Cancel a scheduled update of the listeners."""
+        if self._unsub_push_update is not None:
+            self._unsub_push_update()
+            self._unsub_push_update = None
+
+    async def _internal_async_update_data(self) -> bool:
         """Fetch data from API endpoint."""
-        await self.device.get_config()
+        if (
+            self._last_poll is not None
+            and time() - self._last_poll < PUSH_MODE_POLL_INTERVAL.total_seconds()
+            and self.websocket_healthy
+            and (last_message := self.device.timestamp_last_websocket_msg) is not None
+        ):
+            _LOGGER.debug("WebSocket is pushing updates, skipping poll")
+            # the keep alives of the machine confirm the pushed state is current
+            self.data_updated_at = dt_util.utc_from_timestamp(last_message)
+            return False
+        await self.command_queue.async_submit(None, self.device.get_config)
+        self._last_poll = time()
         _LOGGER.debug("Current status: %s", str(self.device.config))
-        await self._async_connect_websocket()
         self._async_add_remove_scale()
+        return True
 
     @callback
     def _async_add_remove_scale(self) -> None:
@@ -152,18 +419,21 @@ class LaMarzoccoFirmwareUpdateCoordinator(LaMarzoccoUpdateCoordinator):
 
     _default_update_interval = FIRMWARE_UPDATE_INTERVAL
 
-    async def _internal_async_update_data(self) -> None:
+    async def _internal_async_update_data(self) -> bool:
         """Fetch data from API endpoint."""
-        await self.device.get_firmware()
+        await self.command_queue.async_submit(None, self.device.get_firmware)
         _LOGGER.debug("Current firmware: %s", str(self.device.firmware))
+        return True
 
 
 class LaMarzoccoStatisticsUpdateCoordinator(LaMarzoccoUpdateCoordinator):
     """Coordinator for La Marzocco statistics."""
 
     _default_update_interval = STATISTICS_UPDATE_INTERVAL
+    _idle_update_interval = IDLE_STATISTICS_UPDATE_INTERVAL
 
-    async def _internal_async_update_data(self) -> None:
+    async def _internal_async_update_data(self) -> bool:
         """Fetch data from API endpoint."""
-        await self.device.get_statistics()
+        await self.command_queue.async_submit(None, self.device.get_statistics)
         _LOGGER.debug("Current statistics: %s", str(self.device.statistics))
+        return True
@@ -24,6 +24,7 @@ class DiagnosticsData(TypedDict):
     config: dict[str, Any]
     firmware: list[dict[FirmwareType, dict[str, Any]]]
     statistics: dict[str, Any]
+    transports: dict[str, dict[str, dict[str, Any]]]
 
 
 async def async_get_config_entry_diagnostics(
@@ -39,6 +40,7 @@ async def async_get_config_entry_diagnostics(
         config=asdict(device.config),
         firmware=[{key: asdict(firmware)} for key, firmware in device.firmware.items()],
         statistics=asdict(device.statistics),
+        transports=entry.runtime_data.transport_router.as_dict(),
     )
 
     return async_redact_data(diagnostics_data, TO_REDACT)
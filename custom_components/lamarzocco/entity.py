@@ -2,21 +2,16 @@
 
 from collections.abc import Callable
 from dataclasses import dataclass
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
 
-from pylamarzocco.const import FirmwareType
 from pylamarzocco.devices.machine import LaMarzoccoMachine
 
-from homeassistant.const import CONF_ADDRESS, CONF_MAC
-from homeassistant.helpers.device_registry import (
-    CONNECTION_BLUETOOTH,
-    CONNECTION_NETWORK_MAC,
-    DeviceInfo,
-)
-from homeassistant.helpers.entity import EntityDescription
+from homeassistant.core import callback
+from homeassistant.helpers.entity import Entity, EntityDescription
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
-from .const import DOMAIN
+from .account import LaMarzoccoAccount
+from .capabilities import Capability
 from .coordinator import LaMarzoccoUpdateCoordinator
 
 
@@ -25,7 +20,7 @@ class LaMarzoccoEntityDescription(EntityDescription):
     """Description for all LM entities."""
 
     available_fn: Callable[[LaMarzoccoMachine], bool] = lambda _: True
-    supported_fn: Callable[[LaMarzoccoUpdateCoordinator], bool] = lambda _: True
+    capability: Capability | None = None
 
 
 class LaMarzoccoBaseEntity(
@@ -34,6 +29,7 @@ class LaMarzoccoBaseEntity(
     """Common elements for all entities."""
 
     _attr_has_entity_name = True
+    _last_written_state: tuple[Any, ...] | None = None
 
     def __init__(
         self,
@@ -44,26 +40,25 @@ class LaMarzoccoBaseEntity(
         super().__init__(coordinator)
         device = coordinator.device
         self._attr_unique_id = f"{device.serial_number}_{key}"
-        self._attr_device_info = DeviceInfo(
-            identifiers={(DOMAIN, device.serial_number)},
-            name=device.name,
-            manufacturer="La Marzocco",
-            model=device.full_model_name,
-            model_id=device.model,
-            serial_number=device.serial_number,
-            sw_version=device.firmware[FirmwareType.MACHINE].current_version,
-        )
-        connections: set[tuple[str, str]] = set()
-        if coordinator.config_entry.data.get(CONF_ADDRESS):
-            connections.add(
-                (CONNECTION_NETWORK_MAC, coordinator.config_entry.data[CONF_ADDRESS])
-            )
-        if coordinator.config_entry.data.get(CONF_MAC):
-            connections.add(
-                (CONNECTION_BLUETOOTH, coordinator.config_entry.data[CONF_MAC])
-            )
-        if connections:
-            self._attr_device_info.update(DeviceInfo(connections=connections))
+        self._attr_device_info = coordinator.device_info
+
+    def _state_snapshot(self) -> tuple[Any, ...]:
+        """Return what is written to the state machine for this entity."""
+        if not self.available:
+            return (False,)
+        return (True, self.state, self.state_attributes, self.extra_state_attributes)
+
+    @callback
+    def async_write_ha_state(self) -> None:
+        """Write the state and remember what was written."""
+        self._last_written_state = self._state_snapshot()
+        super().async_write_ha_state()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Only write the state if it changed since the last write."""
+        if self._state_snapshot() != self._last_written_state:
+            self.async_write_ha_state()
 
 
 class LaMarzoccoEntity(LaMarzoccoBaseEntity):
@@ -101,11 +96,21 @@ class LaMarzoccScaleEntity(LaMarzoccoEntity):
         scale = coordinator.device.config.scale
         if TYPE_CHECKING:
             assert scale
-        self._attr_device_info = DeviceInfo(
-            identifiers={(DOMAIN, scale.address)},
-            name=scale.name,
-            manufacturer="Acaia",
-            model="Lunar",
-            model_id="Y.301",
-            via_device=(DOMAIN, coordinator.device.serial_number),
-        )
+        self._attr_device_info = coordinator.scale_device_info(scale)
+
+
+class LaMarzoccoAccountEntity(Entity):
+    """Common elements for the entities of a whole account.
+
+    They belong to the device of the account and are only added by the
+    config entry that owns the account.
+    """
+
+    _attr_has_entity_name = True
+    _attr_should_poll = False
+
+    def __init__(self, account: LaMarzoccoAccount, key: str) -> None:
+        """Initialize the entity."""
+        self.account = account
+        self._attr_unique_id = f"{account.username}_{key}"
+        self._attr_device_info = account.device_info
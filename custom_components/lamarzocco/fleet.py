@@ -0,0 +1,108 @@
+"""Auto on/off schedules of all machines on a La Marzocco account."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.core import CALLBACK_TYPE, callback
+
+from .schedule import ScheduleIndex, ScheduleWindow, WeeklySchedule
+
+if TYPE_CHECKING:
+    from .coordinator import LaMarzoccoUpdateCoordinator
+
+
+class LaMarzoccoFleetSchedule:
+    """Schedules of the machines on an account, merged into one index.
+
+    The schedules of a machine are compiled again when they change, and the
+    index is then built again on its next use. The config entry owning the
+    account adds the calendar of the index.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the fleet schedule."""
+        # fingerprint and windows of the schedules of each machine
+        self._machines: dict[str, tuple[tuple[Any, ...], list[ScheduleWindow]]] = {}
+        self._listeners: list[CALLBACK_TYPE] = []
+        self._index: ScheduleIndex | None = None
+
+    @property
+    def index(self) -> ScheduleIndex:
+        """Return the index of all schedules, building it again if needed."""
+        if self._index is None:
+            self._index = ScheduleIndex(
+                window for _, windows in self._machines.values() for window in windows
+            )
+        return self._index
+
+    @callback
+    def async_add_machine(
+        self, entry_id: str, coordinator: LaMarzoccoUpdateCoordinator
+    ) -> CALLBACK_TYPE:
+        """Add the schedules of a machine, returning a callback to remove them."""
+
+        @callback
+        def machine_updated() -> None:
+            self._async_update_machine(entry_id, coordinator)
+
+        unsub_coordinator = coordinator.async_add_listener(machine_updated)
+        machine_updated()
+
+        @callback
+        def remove_machine() -> None:
+            unsub_coordinator()
+            del self._machines[entry_id]
+            self._async_update_listeners()
+
+        return remove_machine
+
+    @callback
+    def async_add_listener(self, update_callback: CALLBACK_TYPE) -> CALLBACK_TYPE:
+        """Listen for changes of the machines or their schedules."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            self._listeners.remove(update_callback)
+
+        return remove_listener
+
+    @callback
+    def _async_update_machine(
+        self, entry_id: str, coordinator: LaMarzoccoUpdateCoordinator
+    ) -> None:
+        """Compile the schedules of a machine again if they changed."""
+        device = coordinator.device
+        entries = device.config.wake_up_sleep_entries.values()
+        fingerprint = tuple(
+            (
+                device.name,
+                entry.entry_id,
+                entry.enabled,
+                tuple(entry.days),
+                entry.time_on,
+                entry.time_off,
+            )
+            for entry in entries
+        )
+        if (machine := self._machines.get(entry_id)) and machine[0] == fingerprint:
+            return
+        self._machines[entry_id] = (
+            fingerprint,
+            [
+                window
+                for entry in entries
+                for window in WeeklySchedule.from_entry(entry).windows(
+                    device.serial_number, device.name, entry.entry_id
+                )
+            ],
+        )
+        self._async_update_listeners()
+
+    @callback
+    def _async_update_listeners(self) -> None:
+        """Build the index again on its next use and inform the listeners."""
+        self._index = None
+        for update_callback in list(self._listeners):
+            update_callback()
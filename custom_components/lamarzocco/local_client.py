@@ -0,0 +1,43 @@
+"""Local API client of La Marzocco machines, routed by the transport router."""
+
+from __future__ import annotations
+
+import logging
+from typing import Any
+
+from aiohttp import ClientSession
+from pylamarzocco.clients.local import LaMarzoccoLocalClient
+from pylamarzocco.exceptions import RequestNotSuccessful
+
+from .transport import CommandClass, LaMarzoccoTransportRouter, Transport
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class LaMarzoccoRoutedLocalClient(LaMarzoccoLocalClient):
+    """Local client that is skipped while the cloud is the better choice.
+
+    The library falls back to the cloud if getting the config from the local
+    API raises RequestNotSuccessful, so a skipped request raises it too.
+    """
+
+    def __init__(
+        self,
+        router: LaMarzoccoTransportRouter,
+        host: str,
+        local_bearer: str,
+        client: ClientSession | None = None,
+    ) -> None:
+        """Initialize the client."""
+        super().__init__(host=host, local_bearer=local_bearer, client=client)
+        router.add_transport(Transport.LOCAL)
+        self._router = router
+
+    async def get_config(self) -> dict[str, Any]:
+        """Get the config of the machine."""
+        if not self._router.should_try(CommandClass.CONFIG, Transport.LOCAL):
+            _LOGGER.debug("Skipping the local API for the config")
+            raise RequestNotSuccessful("Local API skipped by the router")
+        return await self._router.async_send(
+            CommandClass.CONFIG, Transport.LOCAL, super().get_config
+        )
@@ -2,6 +2,7 @@
 
 from collections.abc import Callable, Coroutine
 from dataclasses import dataclass
+from functools import partial
 from typing import Any
 
 from pylamarzocco.const import (
@@ -31,11 +32,15 @@ from homeassistant.core import HomeAssistant
 from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.entity_platform import AddConfigEntryEntitiesCallback
 
+from .capabilities import Capability, supported
 from .const import DOMAIN
 from .coordinator import LaMarzoccoConfigEntry, LaMarzoccoUpdateCoordinator
 from .entity import LaMarzoccoEntity, LaMarzoccoEntityDescription, LaMarzoccScaleEntity
 
-PARALLEL_UPDATES = 1
+# Writes are serialized and debounced by the command queue of the machine
+PARALLEL_UPDATES = 0
+# Seconds to wait for a value to settle before it is sent to the machine
+DEBOUNCE_DELAY = 0.5
 
 
 @dataclass(frozen=True, kw_only=True)
@@ -54,13 +59,21 @@ class LaMarzoccoKeyNumberEntityDescription(
     LaMarzoccoEntityDescription,
     NumberEntityDescription,
 ):
-    """Description of an La Marzocco number entity with keys."""
+    """Description of an La Marzocco number entity with keys.
+
+    set_value_fn returns the machine command as a partial, so pending writes
+    of descriptions with the same command_key to the same key are merged into
+    a single request.
+    """
+
+    command_key: str | None = None
 
     native_value_fn: Callable[
         [LaMarzoccoMachineConfig, PhysicalKey], float | int | None
     ]
     set_value_fn: Callable[
-        [LaMarzoccoMachine, float | int, PhysicalKey], Coroutine[Any, Any, bool]
+        [LaMarzoccoMachine, float | int, PhysicalKey],
+        partial[Coroutine[Any, Any, bool]],
     ]
 
 
@@ -90,11 +103,7 @@ ENTITIES: tuple[LaMarzoccoNumberEntityDescription, ...] = (
         native_value_fn=lambda config: config.boilers[
             BoilerType.STEAM
         ].target_temperature,
-        supported_fn=lambda coordinator: coordinator.device.model
-        in (
-            MachineModel.GS3_AV,
-            MachineModel.GS3_MP,
-        ),
+        capability=Capability.STEAM_TEMPERATURE,
     ),
     LaMarzoccoNumberEntityDescription(
         key="tea_water_duration",
@@ -106,11 +115,7 @@ ENTITIES: tuple[LaMarzoccoNumberEntityDescription, ...] = (
         native_max_value=30,
         set_value_fn=lambda machine, value: machine.set_dose_tea_water(int(value)),
         native_value_fn=lambda config: config.dose_hot_water,
-        supported_fn=lambda coordinator: coordinator.device.model
-        in (
-            MachineModel.GS3_AV,
-            MachineModel.GS3_MP,
-        ),
+        capability=Capability.HOT_WATER_DOSE,
     ),
     LaMarzoccoNumberEntityDescription(
         key="smart_standby_time",
@@ -135,14 +140,15 @@ KEY_ENTITIES: tuple[LaMarzoccoKeyNumberEntityDescription, ...] = (
     LaMarzoccoKeyNumberEntityDescription(
         key="prebrew_off",
         translation_key="prebrew_off",
+        command_key="prebrew_time",
         device_class=NumberDeviceClass.DURATION,
         native_unit_of_measurement=UnitOfTime.SECONDS,
         native_step=PRECISION_TENTHS,
         native_min_value=1,
         native_max_value=10,
         entity_category=EntityCategory.CONFIG,
-        set_value_fn=lambda machine, value, key: machine.set_prebrew_time(
-            prebrew_off_time=value, key=key
+        set_value_fn=lambda machine, value, key: partial(
+            machine.set_prebrew_time, prebrew_off_time=value, key=key
         ),
         native_value_fn=lambda config, key: config.prebrew_configuration[key][
             0
@@ -150,20 +156,20 @@ KEY_ENTITIES: tuple[LaMarzoccoKeyNumberEntityDescription, ...] = (
         available_fn=lambda device: len(device.config.prebrew_configuration) > 0
         and device.config.prebrew_mode
         in (PrebrewMode.PREBREW, PrebrewMode.PREBREW_ENABLED),
-        supported_fn=lambda coordinator: coordinator.device.model
-        != MachineModel.GS3_MP,
+        capability=Capability.PREBREW,
     ),
     LaMarzoccoKeyNumberEntityDescription(
         key="prebrew_on",
         translation_key="prebrew_on",
+        command_key="prebrew_time",
         device_class=NumberDeviceClass.DURATION,
         native_unit_of_measurement=UnitOfTime.SECONDS,
         native_step=PRECISION_TENTHS,
         native_min_value=2,
         native_max_value=10,
         entity_category=EntityCategory.CONFIG,
-        set_value_fn=lambda machine, value, key: machine.set_prebrew_time(
-            prebrew_on_time=value, key=key
+        set_value_fn=lambda machine, value, key: partial(
+            machine.set_prebrew_time, prebrew_on_time=value, key=key
         ),
         native_value_fn=lambda config, key: config.prebrew_configuration[key][
             0
@@ -171,8 +177,7 @@ KEY_ENTITIES: tuple[LaMarzoccoKeyNumberEntityDescription, ...] = (
         available_fn=lambda device: len(device.config.prebrew_configuration) > 0
         and device.config.prebrew_mode
         in (PrebrewMode.PREBREW, PrebrewMode.PREBREW_ENABLED),
-        supported_fn=lambda coordinator: coordinator.device.model
-        != MachineModel.GS3_MP,
+        capability=Capability.PREBREW,
     ),
     LaMarzoccoKeyNumberEntityDescription(
         key="preinfusion_off",
@@ -183,16 +188,15 @@ KEY_ENTITIES: tuple[LaMarzoccoKeyNumberEntityDescription, ...] = (
         native_min_value=2,
         native_max_value=29,
         entity_category=EntityCategory.CONFIG,
-        set_value_fn=lambda machine, value, key: machine.set_preinfusion_time(
-            preinfusion_time=value, key=key
+        set_value_fn=lambda machine, value, key: partial(
+            machine.set_preinfusion_time, preinfusion_time=value, key=key
         ),
         native_value_fn=lambda config, key: config.prebrew_configuration[key][
             1
         ].preinfusion_time,
         available_fn=lambda device: len(device.config.prebrew_configuration) > 0
         and device.config.prebrew_mode == PrebrewMode.PREINFUSION,
-        supported_fn=lambda coordinator: coordinator.device.model
-        != MachineModel.GS3_MP,
+        capability=Capability.PREBREW,
     ),
     LaMarzoccoKeyNumberEntityDescription(
         key="dose",
@@ -202,12 +206,11 @@ KEY_ENTITIES: tuple[LaMarzoccoKeyNumberEntityDescription, ...] = (
         native_min_value=0,
         native_max_value=999,
         entity_category=EntityCategory.CONFIG,
-        set_value_fn=lambda machine, ticks, key: machine.set_dose(
-            dose=int(ticks), key=key
+        set_value_fn=lambda machine, ticks, key: partial(
+            machine.set_dose, dose=int(ticks), key=key
         ),
         native_value_fn=lambda config, key: config.doses[key],
-        supported_fn=lambda coordinator: coordinator.device.model
-        == MachineModel.GS3_AV,
+        capability=Capability.DOSE,
     ),
 )
 
@@ -219,17 +222,13 @@ SCALE_KEY_ENTITIES: tuple[LaMarzoccoKeyNumberEntityDescription, ...] = (
         native_min_value=1,
         native_max_value=100,
         entity_category=EntityCategory.CONFIG,
-        set_value_fn=lambda machine, weight, key: machine.set_bbw_recipe_target(
-            key, int(weight)
+        set_value_fn=lambda machine, weight, key: partial(
+            machine.set_bbw_recipe_target, key, int(weight)
         ),
         native_value_fn=lambda config, key: (
             config.bbw_settings.doses[key] if config.bbw_settings else None
         ),
-        supported_fn=(
-            lambda coordinator: coordinator.device.model
-            in (MachineModel.LINEA_MINI, MachineModel.LINEA_MINI_R)
-            and coordinator.device.config.scale is not None
-        ),
+        capability=Capability.SCALE,
     ),
 )
 
@@ -241,29 +240,27 @@ async def async_setup_entry(
 ) -> None:
     """Set up number entities."""
     coordinator = entry.runtime_data.config_coordinator
+    capabilities = entry.runtime_data.capabilities
     entities: list[NumberEntity] = [
         LaMarzoccoNumberEntity(coordinator, description)
-        for description in ENTITIES
-        if description.supported_fn(coordinator)
+        for description in supported(ENTITIES, capabilities)
     ]
 
-    for description in KEY_ENTITIES:
-        if description.supported_fn(coordinator):
-            num_keys = KEYS_PER_MODEL[MachineModel(coordinator.device.model)]
-            entities.extend(
-                LaMarzoccoKeyNumberEntity(coordinator, description, key)
-                for key in range(min(num_keys, 1), num_keys + 1)
-            )
-
-    for description in SCALE_KEY_ENTITIES:
-        if description.supported_fn(coordinator):
-            if bbw_settings := coordinator.device.config.bbw_settings:
-                entities.extend(
-                    LaMarzoccoScaleTargetNumberEntity(
-                        coordinator, description, int(key)
-                    )
-                    for key in bbw_settings.doses
-                )
+    num_keys = KEYS_PER_MODEL[MachineModel(coordinator.device.model)]
+    entities.extend(
+        LaMarzoccoKeyNumberEntity(coordinator, description, key)
+        for description in supported(KEY_ENTITIES, capabilities)
+        for key in range(min(num_keys, 1), num_keys + 1)
+    )
+
+    if coordinator.device.config.scale is not None and (
+        bbw_settings := coordinator.device.config.bbw_settings
+    ):
+        entities.extend(
+            LaMarzoccoScaleTargetNumberEntity(coordinator, description, int(key))
+            for description in supported(SCALE_KEY_ENTITIES, capabilities)
+            for key in bbw_settings.doses
+        )
 
     def _async_add_new_scale() -> None:
         if bbw_settings := coordinator.device.config.bbw_settings:
@@ -278,7 +275,29 @@ async def async_setup_entry(
     async_add_entities(entities)
 
 
-class LaMarzoccoNumberEntity(LaMarzoccoEntity, NumberEntity):
+class LaMarzoccoBaseNumberEntity(LaMarzoccoEntity, NumberEntity):
+    """Number entity that shows pending values until they are sent."""
+
+    _pending_value: float | None = None
+
+    async def _async_send_value(
+        self, key: Any, func: Callable[[], Coroutine[Any, Any, bool]], value: float
+    ) -> None:
+        """Show the value optimistically and send it once it settled."""
+        self._pending_value = value
+        self.async_write_ha_state()
+        try:
+            await self.coordinator.command_queue.async_submit(
+                key, func, DEBOUNCE_DELAY
+            )
+        finally:
+            # a newer value might be pending already
+            if self._pending_value == value:
+                self._pending_value = None
+                self.async_write_ha_state()
+
+
+class LaMarzoccoNumberEntity(LaMarzoccoBaseNumberEntity):
     """La Marzocco number entity."""
 
     entity_description: LaMarzoccoNumberEntityDescription
@@ -286,14 +305,20 @@ class LaMarzoccoNumberEntity(LaMarzoccoEntity, NumberEntity):
     @property
     def native_value(self) -> float:
         """Return the current value."""
+        if self._pending_value is not None:
+            return self._pending_value
         return self.entity_description.native_value_fn(self.coordinator.device.config)
 
     async def async_set_native_value(self, value: float) -> None:
         """Set the value."""
         if value != self.native_value:
             try:
-                await self.entity_description.set_value_fn(
-                    self.coordinator.device, value
+                await self._async_send_value(
+                    self.entity_description.key,
+                    lambda: self.entity_description.set_value_fn(
+                        self.coordinator.device, value
+                    ),
+                    value,
                 )
             except RequestNotSuccessful as exc:
                 raise HomeAssistantError(
@@ -304,10 +329,9 @@ class LaMarzoccoNumberEntity(LaMarzoccoEntity, NumberEntity):
                         "value": str(value),
                     },
                 ) from exc
-            self.async_write_ha_state()
 
 
-class LaMarzoccoKeyNumberEntity(LaMarzoccoEntity, NumberEntity):
+class LaMarzoccoKeyNumberEntity(LaMarzoccoBaseNumberEntity):
     """Number representing espresso machine with key support."""
 
     entity_description: LaMarzoccoKeyNumberEntityDescription
@@ -334,6 +358,8 @@ class LaMarzoccoKeyNumberEntity(LaMarzoccoEntity, NumberEntity):
     @property
     def native_value(self) -> float | None:
         """Return the current value."""
+        if self._pending_value is not None:
+            return self._pending_value
         return self.entity_description.native_value_fn(
             self.coordinator.device.config, PhysicalKey(self.pyhsical_key)
         )
@@ -341,9 +367,19 @@ class LaMarzoccoKeyNumberEntity(LaMarzoccoEntity, NumberEntity):
     async def async_set_native_value(self, value: float) -> None:
         """Set the value."""
         if value != self.native_value:
+            command = self.entity_description.set_value_fn(
+                self.coordinator.device, value, PhysicalKey(self.pyhsical_key)
+            )
             try:
-                await self.entity_description.set_value_fn(
-                    self.coordinator.device, value, PhysicalKey(self.pyhsical_key)
+                # writes to the same command and key are batched, e.g. prebrew on/off
+                await self._async_send_value(
+                    (
+                        self.entity_description.command_key
+                        or self.entity_description.key,
+                        self.pyhsical_key,
+                    ),
+                    command,
+                    value,
                 )
             except RequestNotSuccessful as exc:
                 raise HomeAssistantError(
@@ -355,7 +391,6 @@ class LaMarzoccoKeyNumberEntity(LaMarzoccoEntity, NumberEntity):
                         "physical_key": str(self.pyhsical_key),
                     },
                 ) from exc
-            self.async_write_ha_state()
 
 
 class LaMarzoccoScaleTargetNumberEntity(
@@ -0,0 +1,358 @@
+"""Auto on/off schedules of La Marzocco machines."""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping, Sequence
+from dataclasses import dataclass, replace
+from datetime import date, datetime, time, timedelta, tzinfo
+from operator import attrgetter
+
+from pylamarzocco.const import WeekDay
+from pylamarzocco.models import LaMarzoccoWakeUpSleepEntry
+
+from homeassistant.exceptions import ServiceValidationError
+
+from .const import DOMAIN
+
+WEEKDAYS = list(WeekDay)
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+
+def minutes(time_str: str) -> int:
+    """Convert a HH:MM string to minutes since midnight."""
+    hour, minute = time_str.split(":")
+    return int(hour) * 60 + int(minute)
+
+
+def format_minutes(value: int) -> str:
+    """Convert minutes since midnight to a HH:MM string."""
+    return f"{value // 60:02d}:{value % 60:02d}"
+
+
+@dataclass(frozen=True, slots=True)
+class AutoOnOffSchedule:
+    """Auto on/off schedule a machine should have.
+
+    The steam boiler setting of the entry it is written to is kept if steam
+    is None.
+    """
+
+    days: frozenset[WeekDay]
+    # minutes after midnight, a schedule turning off at midnight ends at 24:00
+    time_on: int
+    time_off: int
+    steam: bool | None = None
+
+    @classmethod
+    def from_times(
+        cls,
+        days: Iterable[WeekDay],
+        time_on: time,
+        time_off: time,
+        steam: bool | None = None,
+    ) -> AutoOnOffSchedule:
+        """Create a schedule, turning off at midnight if time off is 00:00."""
+        on = time_on.hour * 60 + time_on.minute
+        off = time_off.hour * 60 + time_off.minute or MINUTES_PER_DAY
+        if off <= on:
+            raise ServiceValidationError(
+                translation_domain=DOMAIN,
+                translation_key="invalid_schedule_times",
+                translation_placeholders={
+                    "time_on": format_minutes(on),
+                    "time_off": format_minutes(off),
+                },
+            )
+        return cls(frozenset(days), on, off, steam)
+
+    def matches(self, entry: LaMarzoccoWakeUpSleepEntry) -> bool:
+        """Return if a wake up sleep entry already is this schedule."""
+        return (
+            entry.enabled
+            and set(entry.days) == self.days
+            and minutes(entry.time_on) == self.time_on
+            and minutes(entry.time_off) == self.time_off
+            and self.steam in (None, entry.steam)
+        )
+
+    def apply(self, entry: LaMarzoccoWakeUpSleepEntry) -> LaMarzoccoWakeUpSleepEntry:
+        """Return a copy of a wake up sleep entry set to this schedule."""
+        return replace(
+            entry,
+            enabled=True,
+            days=[day for day in WEEKDAYS if day in self.days],
+            time_on=format_minutes(self.time_on),
+            time_off=format_minutes(self.time_off),
+            steam=entry.steam if self.steam is None else self.steam,
+        )
+
+
+def plan_schedules(
+    entries: Mapping[str, LaMarzoccoWakeUpSleepEntry],
+    schedules: Sequence[AutoOnOffSchedule],
+) -> list[LaMarzoccoWakeUpSleepEntry]:
+    """Return the changed entries that give a machine exactly these schedules.
+
+    Entries already matching a schedule are kept. The other schedules are
+    written to enabled entries first, as those would need a request to be
+    disabled otherwise, and the enabled entries left over are disabled. This
+    takes one request per changed entry, the fewest possible.
+    """
+    free = dict(entries)
+    missing: list[AutoOnOffSchedule] = []
+    for schedule in schedules:
+        match = next(
+            (entry_id for entry_id, entry in free.items() if schedule.matches(entry)),
+            None,
+        )
+        if match is None:
+            missing.append(schedule)
+        else:
+            del free[match]
+    # enabled entries first, keeping the order of the machine otherwise
+    targets = sorted(free.values(), key=lambda entry: not entry.enabled)
+    if len(missing) > len(targets):
+        raise ServiceValidationError(
+            translation_domain=DOMAIN,
+            translation_key="too_many_schedules",
+            translation_placeholders={"count": str(len(entries))},
+        )
+    changes = [
+        schedule.apply(entry) for schedule, entry in zip(missing, targets, strict=False)
+    ]
+    changes.extend(
+        replace(entry, enabled=False)
+        for entry in targets[len(missing) :]
+        if entry.enabled
+    )
+    return changes
+
+
+@dataclass(frozen=True, slots=True)
+class WeeklySchedule:
+    """Auto on/off schedule compiled to the minutes it is on per weekday.
+
+    Legacy schedules turn off at 24:00, which is midnight of the next day.
+    """
+
+    # minutes after midnight the machine turns on and off, Monday first,
+    # None on days the schedule does not turn the machine on
+    weekdays: tuple[tuple[int, int] | None, ...]
+
+    @classmethod
+    def from_entry(cls, entry: LaMarzoccoWakeUpSleepEntry) -> WeeklySchedule:
+        """Compile a wake up sleep entry."""
+        if not entry.enabled:
+            return cls((None,) * len(WEEKDAYS))
+        times = (minutes(entry.time_on), minutes(entry.time_off))
+        return cls(tuple(times if day in entry.days else None for day in WEEKDAYS))
+
+    def intervals(
+        self, start_date: datetime, end_date: datetime
+    ) -> list[tuple[datetime, datetime]]:
+        """Return when the machine is on during the days of a range.
+
+        Only the weekdays the schedule turns the machine on are visited,
+        and the intervals are sorted by their start.
+        """
+        first_day = start_date.date()
+        last_day = end_date.date()
+        intervals: list[tuple[datetime, datetime]] = []
+        for weekday, times in enumerate(self.weekdays):
+            if times is None:
+                continue
+            day = first_day + timedelta(days=(weekday - first_day.weekday()) % 7)
+            while day <= last_day:
+                start, end = _interval(day, times, start_date.tzinfo)
+                if end >= start_date and start <= end_date:
+                    intervals.append((start, end))
+                day += timedelta(days=7)
+        intervals.sort()
+        return intervals
+
+    def windows(
+        self, serial_number: str, name: str, schedule_id: str
+    ) -> list[ScheduleWindow]:
+        """Return the windows the machine is on, in minutes of the week."""
+        return [
+            ScheduleWindow(serial_number, name, schedule_id, start, end)
+            for start, end in self._minutes_of_week()
+        ]
+
+    def is_on(self, moment: datetime) -> bool:
+        """Return True if the schedule turns the machine on at a point in time."""
+        minute = _minute_of_week(moment)
+        # windows running past the end of the week also cover the next week
+        return any(
+            start <= minute < end or start <= minute + MINUTES_PER_WEEK < end
+            for start, end in self._minutes_of_week()
+        )
+
+    def _minutes_of_week(self) -> list[tuple[int, int]]:
+        """Return when the machine turns on and off, in minutes of the week.
+
+        A window that turns off before it turns on runs past midnight.
+        """
+        windows: list[tuple[int, int]] = []
+        for weekday, times in enumerate(self.weekdays):
+            if times is None or times[0] == times[1]:
+                continue
+            time_on, time_off = times
+            if time_off < time_on:
+                time_off += MINUTES_PER_DAY
+            midnight = weekday * MINUTES_PER_DAY
+            windows.append((midnight + time_on, midnight + time_off))
+        return windows
+
+
+@dataclass(frozen=True, slots=True)
+class ScheduleWindow:
+    """Weekly window a schedule turns a machine on.
+
+    Start and end are minutes after midnight on Monday. A window on Sunday
+    may end after the end of the week.
+    """
+
+    serial_number: str
+    name: str
+    schedule_id: str
+    start: int
+    end: int
+
+
+class _Node:
+    """Node of the interval tree, holding the windows around its center."""
+
+    __slots__ = ("by_end", "by_start", "center", "left", "right")
+
+    def __init__(self, windows: list[ScheduleWindow]) -> None:
+        """Build the subtree of a list of windows."""
+        starts = sorted(window.start for window in windows)
+        self.center = center = starts[len(starts) // 2]
+        here = [window for window in windows if window.start <= center < window.end]
+        left = [window for window in windows if window.end <= center]
+        right = [window for window in windows if window.start > center]
+        self.by_start = sorted(here, key=attrgetter("start"))
+        self.by_end = sorted(here, key=attrgetter("end"), reverse=True)
+        self.left = _Node(left) if left else None
+        self.right = _Node(right) if right else None
+
+
+class ScheduleIndex:
+    """Interval tree of the schedule windows of many machines.
+
+    Range and point queries take O(log n + k) for n windows and k matches.
+    When it is built, every window is checked for windows it overlaps: windows
+    of other machines overlap, windows of the same machine conflict.
+    """
+
+    def __init__(self, windows: Iterable[ScheduleWindow]) -> None:
+        """Build the index."""
+        self.windows = list(windows)
+        self._root = _Node(self.windows) if self.windows else None
+        self.overlaps: dict[ScheduleWindow, list[ScheduleWindow]] = {}
+        self.conflicts: dict[ScheduleWindow, list[ScheduleWindow]] = {}
+        for window in self.windows:
+            for other in self._overlapping_windows(window):
+                if other.serial_number != window.serial_number:
+                    self.overlaps.setdefault(window, []).append(other)
+                else:
+                    self.conflicts.setdefault(window, []).append(other)
+
+    def query(self, start: int, end: int) -> list[ScheduleWindow]:
+        """Return the windows overlapping a range of minutes of the week.
+
+        Ranges are half open, so a window ending at the start of the range
+        does not overlap it.
+        """
+        found: list[ScheduleWindow] = []
+        node = self._root
+        stack: list[_Node] = []
+        while node is not None or stack:
+            if node is None:
+                node = stack.pop()
+            if end <= node.center:
+                for window in node.by_start:
+                    if window.start >= end:
+                        break
+                    found.append(window)
+                node = node.left
+            elif start >= node.center:
+                # windows here start at or before the center and end after it
+                for window in node.by_end:
+                    if window.end <= start:
+                        break
+                    found.append(window)
+                node = node.right
+            else:
+                found.extend(node.by_start)
+                if node.right is not None:
+                    stack.append(node.right)
+                node = node.left
+        return found
+
+    def at(self, moment: datetime) -> list[ScheduleWindow]:
+        """Return the windows that are on at a point in time."""
+        minute = _minute_of_week(moment)
+        # windows of last week that run past its end are shifted a week back
+        return self.query(minute, minute + 1) + self.query(
+            minute + MINUTES_PER_WEEK, minute + MINUTES_PER_WEEK + 1
+        )
+
+    def intervals(
+        self, start_date: datetime, end_date: datetime
+    ) -> list[tuple[datetime, datetime, ScheduleWindow]]:
+        """Return when the windows are on during a range, sorted by start."""
+        intervals: list[tuple[datetime, datetime, ScheduleWindow]] = []
+        tz = start_date.tzinfo
+        # start a week early for the windows that run past the end of a week
+        monday = start_date.date() - timedelta(days=start_date.weekday() + 7)
+        last_day = end_date.date()
+        while monday <= last_day:
+            week_start = datetime.combine(monday, time(), tz)
+            first = max(_minutes_between(week_start, start_date), 0)
+            last = _minutes_between(week_start, end_date)
+            # the range is closed, so windows touching it are included
+            for window in self.query(first - 1, last + 1):
+                start = week_start + timedelta(minutes=window.start)
+                end = week_start + timedelta(minutes=window.end)
+                if end >= start_date and start <= end_date:
+                    intervals.append((start, end, window))
+            monday += timedelta(days=7)
+        intervals.sort(key=lambda interval: (interval[0], interval[1]))
+        return intervals
+
+    def _overlapping_windows(self, window: ScheduleWindow) -> list[ScheduleWindow]:
+        """Return the other windows overlapping a window, in any week."""
+        found: list[ScheduleWindow] = []
+        for shift in (-MINUTES_PER_WEEK, 0, MINUTES_PER_WEEK):
+            # windows of the week before or after are shifted back or forward
+            found.extend(
+                other
+                for other in self.query(window.start - shift, window.end - shift)
+                if other is not window
+            )
+        return found
+
+
+def _interval(
+    day: date, times: tuple[int, int], tz: tzinfo | None
+) -> tuple[datetime, datetime]:
+    """Return the on and off time of a day."""
+    midnight = datetime.combine(day, time(), tz)
+    return (
+        midnight + timedelta(minutes=times[0]),
+        midnight + timedelta(minutes=times[1]),
+    )
+
+
+def _minutes_between(start: datetime, end: datetime) -> int:
+    """Return the whole wall clock minutes from one time to another."""
+    delta = end.replace(tzinfo=None) - start.replace(tzinfo=None)
+    return int(delta.total_seconds() // 60)
+
+
+def _minute_of_week(moment: datetime) -> int:
+    """Return the wall clock minutes since midnight on Monday."""
+    return moment.weekday() * MINUTES_PER_DAY + moment.hour * 60 + moment.minute
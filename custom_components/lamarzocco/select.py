@@ -5,7 +5,6 @@ from dataclasses import dataclass
 from typing import Any
 
 from pylamarzocco.const import (
-    MachineModel,
     PhysicalKey,
     PrebrewMode,
     SmartStandbyMode,
@@ -21,6 +20,7 @@ from homeassistant.core import HomeAssistant
 from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.entity_platform import AddConfigEntryEntitiesCallback
 
+from .capabilities import Capability, supported
 from .const import DOMAIN
 from .coordinator import LaMarzoccoConfigEntry
 from .entity import LaMarzoccoEntity, LaMarzoccoEntityDescription, LaMarzoccScaleEntity
@@ -72,8 +72,7 @@ ENTITIES: tuple[LaMarzoccoSelectEntityDescription, ...] = (
             STEAM_LEVEL_HA_TO_LM[option]
         ),
         current_option_fn=lambda config: STEAM_LEVEL_LM_TO_HA[config.steam_level],
-        supported_fn=lambda coordinator: coordinator.device.model
-        == MachineModel.LINEA_MICRA,
+        capability=Capability.STEAM_LEVEL,
     ),
     LaMarzoccoSelectEntityDescription(
         key="prebrew_infusion_select",
@@ -84,13 +83,7 @@ ENTITIES: tuple[LaMarzoccoSelectEntityDescription, ...] = (
             PREBREW_MODE_HA_TO_LM[option]
         ),
         current_option_fn=lambda config: PREBREW_MODE_LM_TO_HA[config.prebrew_mode],
-        supported_fn=lambda coordinator: coordinator.device.model
-        in (
-            MachineModel.GS3_AV,
-            MachineModel.LINEA_MICRA,
-            MachineModel.LINEA_MINI,
-            MachineModel.LINEA_MINI_R,
-        ),
+        capability=Capability.PREBREW,
     ),
     LaMarzoccoSelectEntityDescription(
         key="smart_standby_mode",
@@ -132,17 +125,14 @@ async def async_setup_entry(
 ) -> None:
     """Set up select entities."""
     coordinator = entry.runtime_data.config_coordinator
+    capabilities = entry.runtime_data.capabilities
 
     entities = [
         LaMarzoccoSelectEntity(coordinator, description)
-        for description in ENTITIES
-        if description.supported_fn(coordinator)
+        for description in supported(ENTITIES, capabilities)
     ]
 
-    if (
-        coordinator.device.model in (MachineModel.LINEA_MINI, MachineModel.LINEA_MINI_R)
-        and coordinator.device.config.scale
-    ):
+    if Capability.SCALE in capabilities and coordinator.device.config.scale:
         entities.extend(
             LaMarzoccoScaleSelectEntity(coordinator, description)
             for description in SCALE_ENTITIES
@@ -175,8 +165,11 @@ class LaMarzoccoSelectEntity(LaMarzoccoEntity, SelectEntity):
         """Change the selected option."""
         if option != self.current_option:
             try:
-                await self.entity_description.select_option_fn(
-                    self.coordinator.device, option
+                await self.coordinator.command_queue.async_submit(
+                    self.entity_description.key,
+                    lambda: self.entity_description.select_option_fn(
+                        self.coordinator.device, option
+                    ),
                 )
             except RequestNotSuccessful as exc:
                 raise HomeAssistantError(
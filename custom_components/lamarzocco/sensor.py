@@ -2,6 +2,7 @@
 
 from collections.abc import Callable
 from dataclasses import dataclass
+from datetime import datetime
 
 from pylamarzocco.const import KEYS_PER_MODEL, BoilerType, MachineModel, PhysicalKey
 from pylamarzocco.devices.machine import LaMarzoccoMachine
@@ -20,9 +21,24 @@ from homeassistant.const import (
 )
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity_platform import AddConfigEntryEntitiesCallback
-
-from .coordinator import LaMarzoccoConfigEntry, LaMarzoccoUpdateCoordinator
-from .entity import LaMarzoccoEntity, LaMarzoccoEntityDescription, LaMarzoccScaleEntity
+from homeassistant.util import dt as dt_util
+
+from .account import LaMarzoccoAccount
+from .capabilities import Capability, supported
+from .circuit_breaker import CircuitBreakerState
+from .coordinator import (
+    LaMarzoccoConfigEntry,
+    LaMarzoccoRuntimeData,
+    LaMarzoccoUpdateCoordinator,
+)
+from .entity import (
+    LaMarzoccoAccountEntity,
+    LaMarzoccoEntity,
+    LaMarzoccoEntityDescription,
+    LaMarzoccScaleEntity,
+)
+from .shots import LaMarzoccoShotRecorder, Shot
+from .websocket import LaMarzoccoWebSocketSupervisor
 
 # Coordinator is used to centralize the data updates
 PARALLEL_UPDATES = 0
@@ -46,6 +62,33 @@ class LaMarzoccoKeySensorEntityDescription(
     value_fn: Callable[[LaMarzoccoMachine, PhysicalKey], int | None]
 
 
+@dataclass(frozen=True, kw_only=True)
+class LaMarzoccoLastUpdateSensorEntityDescription(
+    LaMarzoccoEntityDescription, SensorEntityDescription
+):
+    """Description of a sensor showing when the data of a coordinator was fetched."""
+
+    coordinator_fn: Callable[[LaMarzoccoRuntimeData], LaMarzoccoUpdateCoordinator]
+
+
+@dataclass(frozen=True, kw_only=True)
+class LaMarzoccoWebSocketSensorEntityDescription(
+    LaMarzoccoEntityDescription, SensorEntityDescription
+):
+    """Description of a sensor showing the health of the WebSocket."""
+
+    value_fn: Callable[[LaMarzoccoWebSocketSupervisor], datetime | float | int | None]
+
+
+@dataclass(frozen=True, kw_only=True)
+class LaMarzoccoShotSensorEntityDescription(
+    LaMarzoccoEntityDescription, SensorEntityDescription
+):
+    """Description of a sensor showing the last recorded shot."""
+
+    value_fn: Callable[[Shot], datetime | float | str | None]
+
+
 ENTITIES: tuple[LaMarzoccoSensorEntityDescription, ...] = (
     LaMarzoccoSensorEntityDescription(
         key="shot_timer",
@@ -56,7 +99,7 @@ ENTITIES: tuple[LaMarzoccoSensorEntityDescription, ...] = (
         value_fn=lambda device: device.config.brew_active_duration,
         available_fn=lambda device: device.websocket_connected,
         entity_category=EntityCategory.DIAGNOSTIC,
-        supported_fn=lambda coordinator: coordinator.local_connection_configured,
+        capability=Capability.LOCAL_CONNECTION,
     ),
     LaMarzoccoSensorEntityDescription(
         key="current_temp_coffee",
@@ -79,8 +122,7 @@ ENTITIES: tuple[LaMarzoccoSensorEntityDescription, ...] = (
         value_fn=lambda device: device.config.boilers[
             BoilerType.STEAM
         ].current_temperature,
-        supported_fn=lambda coordinator: coordinator.device.model
-        not in (MachineModel.LINEA_MINI, MachineModel.LINEA_MINI_R),
+        capability=Capability.STEAM_BOILER_TEMPERATURE,
     ),
 )
 
@@ -115,6 +157,110 @@ KEY_STATISTIC_ENTITIES: tuple[LaMarzoccoKeySensorEntityDescription, ...] = (
     ),
 )
 
+LAST_UPDATE_ENTITIES: tuple[LaMarzoccoLastUpdateSensorEntityDescription, ...] = (
+    LaMarzoccoLastUpdateSensorEntityDescription(
+        key="last_config_update",
+        translation_key="last_config_update",
+        device_class=SensorDeviceClass.TIMESTAMP,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        coordinator_fn=lambda runtime_data: runtime_data.config_coordinator,
+    ),
+    LaMarzoccoLastUpdateSensorEntityDescription(
+        key="last_firmware_update",
+        translation_key="last_firmware_update",
+        device_class=SensorDeviceClass.TIMESTAMP,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        coordinator_fn=lambda runtime_data: runtime_data.firmware_coordinator,
+    ),
+    LaMarzoccoLastUpdateSensorEntityDescription(
+        key="last_statistics_update",
+        translation_key="last_statistics_update",
+        device_class=SensorDeviceClass.TIMESTAMP,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        coordinator_fn=lambda runtime_data: runtime_data.statistics_coordinator,
+    ),
+)
+
+CIRCUIT_BREAKER_ENTITY = SensorEntityDescription(
+    key="circuit_breaker",
+    translation_key="circuit_breaker",
+    device_class=SensorDeviceClass.ENUM,
+    options=[state.value for state in CircuitBreakerState],
+    entity_category=EntityCategory.DIAGNOSTIC,
+)
+
+WEBSOCKET_ENTITIES: tuple[LaMarzoccoWebSocketSensorEntityDescription, ...] = (
+    LaMarzoccoWebSocketSensorEntityDescription(
+        key="websocket_connections",
+        translation_key="websocket_connections",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        value_fn=lambda supervisor: supervisor.connect_count,
+    ),
+    LaMarzoccoWebSocketSensorEntityDescription(
+        key="websocket_connected_since",
+        translation_key="websocket_connected_since",
+        device_class=SensorDeviceClass.TIMESTAMP,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        value_fn=lambda supervisor: supervisor.connected_since,
+    ),
+    LaMarzoccoWebSocketSensorEntityDescription(
+        key="websocket_last_message",
+        translation_key="websocket_last_message",
+        device_class=SensorDeviceClass.TIMESTAMP,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        value_fn=lambda supervisor: supervisor.last_message_at,
+    ),
+    LaMarzoccoWebSocketSensorEntityDescription(
+        key="websocket_update_rate",
+        translation_key="websocket_update_rate",
+        suggested_display_precision=1,
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        value_fn=lambda supervisor: supervisor.update_rate,
+    ),
+)
+
+SHOT_ENTITIES: tuple[LaMarzoccoShotSensorEntityDescription, ...] = (
+    LaMarzoccoShotSensorEntityDescription(
+        key="last_shot_start",
+        translation_key="last_shot_start",
+        device_class=SensorDeviceClass.TIMESTAMP,
+        value_fn=lambda shot: dt_util.utc_from_timestamp(shot.start),
+    ),
+    LaMarzoccoShotSensorEntityDescription(
+        key="last_shot_duration",
+        translation_key="last_shot_duration",
+        native_unit_of_measurement=UnitOfTime.SECONDS,
+        suggested_display_precision=1,
+        device_class=SensorDeviceClass.DURATION,
+        value_fn=lambda shot: shot.duration,
+    ),
+    LaMarzoccoShotSensorEntityDescription(
+        key="last_shot_coffee_temp",
+        translation_key="last_shot_coffee_temp",
+        native_unit_of_measurement=UnitOfTemperature.CELSIUS,
+        suggested_display_precision=1,
+        device_class=SensorDeviceClass.TEMPERATURE,
+        value_fn=lambda shot: shot.coffee_temperature,
+    ),
+)
+
+SHOT_KEY_ENTITY = LaMarzoccoShotSensorEntityDescription(
+    key="last_shot_key",
+    translation_key="last_shot_key",
+    device_class=SensorDeviceClass.ENUM,
+    options=[key.name.lower() for key in PhysicalKey],
+    value_fn=lambda shot: None if shot.key is None else shot.key.name.lower(),
+)
+
 SCALE_ENTITIES: tuple[LaMarzoccoSensorEntityDescription, ...] = (
     LaMarzoccoSensorEntityDescription(
         key="scale_battery",
@@ -124,10 +270,7 @@ SCALE_ENTITIES: tuple[LaMarzoccoSensorEntityDescription, ...] = (
         value_fn=lambda device: (
             device.config.scale.battery if device.config.scale else 0
         ),
-        supported_fn=(
-            lambda coordinator: coordinator.device.model
-            in (MachineModel.LINEA_MINI, MachineModel.LINEA_MINI_R)
-        ),
+        capability=Capability.SCALE,
     ),
 )
 
@@ -139,20 +282,23 @@ async def async_setup_entry(
 ) -> None:
     """Set up sensor entities."""
     config_coordinator = entry.runtime_data.config_coordinator
+    capabilities = entry.runtime_data.capabilities
 
-    entities: list[LaMarzoccoSensorEntity | LaMarzoccoKeySensorEntity] = []
+    entities: list[
+        LaMarzoccoSensorEntity
+        | LaMarzoccoKeySensorEntity
+        | LaMarzoccoLastUpdateSensorEntity
+        | LaMarzoccoCircuitBreakerSensorEntity
+        | LaMarzoccoWebSocketSensorEntity
+        | LaMarzoccoShotSensorEntity
+    ] = []
 
     entities = [
         LaMarzoccoSensorEntity(config_coordinator, description)
-        for description in ENTITIES
-        if description.supported_fn(config_coordinator)
+        for description in supported(ENTITIES, capabilities)
     ]
 
-    if (
-        config_coordinator.device.model
-        in (MachineModel.LINEA_MINI, MachineModel.LINEA_MINI_R)
-        and config_coordinator.device.config.scale
-    ):
+    if Capability.SCALE in capabilities and config_coordinator.device.config.scale:
         entities.extend(
             LaMarzoccoScaleSensorEntity(config_coordinator, description)
             for description in SCALE_ENTITIES
@@ -161,8 +307,7 @@ async def async_setup_entry(
     statistics_coordinator = entry.runtime_data.statistics_coordinator
     entities.extend(
         LaMarzoccoSensorEntity(statistics_coordinator, description)
-        for description in STATISTIC_ENTITIES
-        if description.supported_fn(statistics_coordinator)
+        for description in supported(STATISTIC_ENTITIES, capabilities)
     )
 
     num_keys = KEYS_PER_MODEL[MachineModel(config_coordinator.device.model)]
@@ -173,6 +318,33 @@ async def async_setup_entry(
             for key in range(1, num_keys + 1)
         )
 
+    entities.extend(
+        LaMarzoccoLastUpdateSensorEntity(
+            description.coordinator_fn(entry.runtime_data), description
+        )
+        for description in LAST_UPDATE_ENTITIES
+    )
+    if entry.runtime_data.owns_account:
+        entities.append(
+            LaMarzoccoCircuitBreakerSensorEntity(
+                config_coordinator.account, CIRCUIT_BREAKER_ENTITY
+            )
+        )
+    if (supervisor := config_coordinator.websocket_supervisor) is not None:
+        entities.extend(
+            LaMarzoccoWebSocketSensorEntity(config_coordinator, description, supervisor)
+            for description in WEBSOCKET_ENTITIES
+        )
+
+    if (recorder := config_coordinator.shot_recorder) is not None:
+        shot_descriptions = list(SHOT_ENTITIES)
+        if num_keys > 0:
+            shot_descriptions.append(SHOT_KEY_ENTITY)
+        entities.extend(
+            LaMarzoccoShotSensorEntity(config_coordinator, description, recorder)
+            for description in shot_descriptions
+        )
+
     def _async_add_new_scale() -> None:
         async_add_entities(
             LaMarzoccoScaleSensorEntity(config_coordinator, description)
@@ -220,7 +392,109 @@ class LaMarzoccoKeySensorEntity(LaMarzoccoEntity, SensorEntity):
         )
 
 
+class LaMarzoccoLastUpdateSensorEntity(LaMarzoccoEntity, SensorEntity):
+    """Sensor showing how old the data of a coordinator is."""
+
+    entity_description: LaMarzoccoLastUpdateSensorEntityDescription
+
+    @property
+    def available(self) -> bool:
+        """Stay available while the data is outdated."""
+        return self.coordinator.data_updated_at is not None
+
+    @property
+    def native_value(self) -> datetime | None:
+        """Return when the data was fetched."""
+        return self.coordinator.data_updated_at
+
+
+class LaMarzoccoCircuitBreakerSensorEntity(LaMarzoccoAccountEntity, SensorEntity):
+    """Sensor showing if the cloud requests of the account are paused."""
+
+    def __init__(
+        self, account: LaMarzoccoAccount, entity_description: SensorEntityDescription
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(account, entity_description.key)
+        self.entity_description = entity_description
+
+    async def async_added_to_hass(self) -> None:
+        """Update the state when the circuit breaker changes."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self.account.circuit_breaker.async_add_listener(self.async_write_ha_state)
+        )
+
+    @property
+    def native_value(self) -> str:
+        """Return the state of the circuit breaker."""
+        return self.account.circuit_breaker.state
+
+
+class LaMarzoccoWebSocketSensorEntity(LaMarzoccoEntity, SensorEntity):
+    """Sensor showing the health of the WebSocket."""
+
+    entity_description: LaMarzoccoWebSocketSensorEntityDescription
+
+    def __init__(
+        self,
+        coordinator: LaMarzoccoUpdateCoordinator,
+        description: LaMarzoccoWebSocketSensorEntityDescription,
+        supervisor: LaMarzoccoWebSocketSupervisor,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator, description)
+        self._supervisor = supervisor
+
+    async def async_added_to_hass(self) -> None:
+        """Update the state when the connection changes."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self._supervisor.async_add_listener(self.async_write_ha_state)
+        )
+
+    @property
+    def available(self) -> bool:
+        """Stay available while the cloud can't be reached."""
+        return True
+
+    @property
+    def native_value(self) -> datetime | float | int | None:
+        """Return the value of the sensor."""
+        return self.entity_description.value_fn(self._supervisor)
+
+
 class LaMarzoccoScaleSensorEntity(LaMarzoccoSensorEntity, LaMarzoccScaleEntity):
     """Sensor for a La Marzocco scale."""
 
     entity_description: LaMarzoccoSensorEntityDescription
+
+
+class LaMarzoccoShotSensorEntity(LaMarzoccoEntity, SensorEntity):
+    """Sensor showing the last shot of the machine."""
+
+    entity_description: LaMarzoccoShotSensorEntityDescription
+
+    def __init__(
+        self,
+        coordinator: LaMarzoccoUpdateCoordinator,
+        description: LaMarzoccoShotSensorEntityDescription,
+        recorder: LaMarzoccoShotRecorder,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator, description)
+        self._recorder = recorder
+
+    async def async_added_to_hass(self) -> None:
+        """Update the state when a shot was recorded."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self._recorder.async_add_listener(self.async_write_ha_state)
+        )
+
+    @property
+    def native_value(self) -> datetime | float | str | None:
+        """Return the value of the last shot."""
+        if (shot := self._recorder.last_shot) is None:
+            return None
+        return self.entity_description.value_fn(shot)
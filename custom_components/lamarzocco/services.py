@@ -0,0 +1,300 @@
+"""Services for La Marzocco espresso machines."""
+
+from __future__ import annotations
+
+import asyncio
+from contextlib import aclosing
+from datetime import datetime
+from typing import Any
+
+from pylamarzocco.const import PhysicalKey, WeekDay
+import voluptuous as vol
+
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.helpers import (
+    config_validation as cv,
+    device_registry as dr,
+    entity_registry as er,
+)
+from homeassistant.helpers.target import (
+    TargetSelection,
+    async_extract_referenced_entity_ids,
+)
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+from .coordinator import LaMarzoccoConfigEntry, LaMarzoccoConfigUpdateCoordinator
+from .schedule import AutoOnOffSchedule, plan_schedules
+from .shot_log import LaMarzoccoShotLog
+from .shots import Shot
+
+SERVICE_GET_SCHEDULED_MACHINES = "get_scheduled_machines"
+SERVICE_GET_SHOTS = "get_shots"
+SERVICE_GET_SHOT_HISTORY = "get_shot_history"
+SERVICE_SET_AUTO_ON_OFF_SCHEDULES = "set_auto_on_off_schedules"
+ATTR_SCHEDULES = "schedules"
+ATTR_DAYS = "days"
+ATTR_TIME_ON = "time_on"
+ATTR_TIME_OFF = "time_off"
+ATTR_STEAM = "steam"
+ATTR_START = "start"
+ATTR_END = "end"
+ATTR_KEY = "key"
+ATTR_LIMIT = "limit"
+ATTR_AT = "at"
+# shots returned per machine by one call of the shot history
+DEFAULT_SHOT_HISTORY_LIMIT = 100
+MAX_SHOT_HISTORY_LIMIT = 1000
+
+# machines are targeted by their devices, their entities, or the areas,
+# floors and labels they are in
+MACHINES_SCHEMA = vol.Schema(cv.ENTITY_SERVICE_FIELDS)
+SCHEDULE_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_DAYS): vol.All(cv.ensure_list, [vol.Coerce(WeekDay)]),
+        vol.Required(ATTR_TIME_ON): cv.time,
+        vol.Required(ATTR_TIME_OFF): cv.time,
+        vol.Optional(ATTR_STEAM): cv.boolean,
+    }
+)
+SET_AUTO_ON_OFF_SCHEDULES_SCHEMA = MACHINES_SCHEMA.extend(
+    {vol.Required(ATTR_SCHEDULES): vol.All(cv.ensure_list, [SCHEDULE_SCHEMA])}
+)
+GET_SCHEDULED_MACHINES_SCHEMA = MACHINES_SCHEMA.extend(
+    {vol.Optional(ATTR_AT): cv.datetime}
+)
+GET_SHOT_HISTORY_SCHEMA = MACHINES_SCHEMA.extend(
+    {
+        vol.Optional(ATTR_START): cv.datetime,
+        vol.Optional(ATTR_END): cv.datetime,
+        vol.Optional(ATTR_KEY): vol.All(
+            vol.Lower, vol.In([key.name.lower() for key in PhysicalKey])
+        ),
+        vol.Optional(ATTR_LIMIT, default=DEFAULT_SHOT_HISTORY_LIMIT): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=MAX_SHOT_HISTORY_LIMIT)
+        ),
+    }
+)
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the services of the integration."""
+
+    async def set_auto_on_off_schedules(call: ServiceCall) -> ServiceResponse:
+        """Give machines exactly the auto on/off schedules of the call.
+
+        All machines are checked before anything is sent. Only the schedules
+        that differ from the machine are sent, one request each, and the
+        machines are updated in parallel.
+        """
+        schedules = [
+            AutoOnOffSchedule.from_times(
+                schedule[ATTR_DAYS],
+                schedule[ATTR_TIME_ON],
+                schedule[ATTR_TIME_OFF],
+                schedule.get(ATTR_STEAM),
+            )
+            for schedule in call.data[ATTR_SCHEDULES]
+        ]
+        coordinators = _async_get_coordinators(hass, call)
+        changes = {
+            serial_number: plan_schedules(
+                coordinator.device.config.wake_up_sleep_entries, schedules
+            )
+            for serial_number, coordinator in coordinators.items()
+        }
+        await asyncio.gather(
+            *(
+                coordinators[serial_number].async_set_wake_up_sleep_entries(entries)
+                for serial_number, entries in changes.items()
+                if entries
+            )
+        )
+        return {
+            "changed": {
+                serial_number: [entry.entry_id for entry in entries]
+                for serial_number, entries in changes.items()
+            }
+        }
+
+    async def get_scheduled_machines(call: ServiceCall) -> ServiceResponse:
+        """Return which machines their auto on/off schedules turn on at a time.
+
+        The schedules are looked up in the index of all schedules of the
+        account, the time defaults to now.
+        """
+        moment = dt_util.as_local(call.data.get(ATTR_AT) or dt_util.now())
+        machines: dict[str, Any] = {}
+        for serial_number, coordinator in _async_get_coordinators(hass, call).items():
+            schedule_ids = [
+                window.schedule_id
+                for window in coordinator.account.fleet_schedule.index.at(moment)
+                if window.serial_number == serial_number
+            ]
+            machines[serial_number] = {
+                "on": bool(schedule_ids),
+                "schedules": schedule_ids,
+            }
+        return {"machines": machines}
+
+    async def get_shots(call: ServiceCall) -> ServiceResponse:
+        """Return the shots recorded for machines, oldest first."""
+        shots: dict[str, Any] = {}
+        for coordinator in _async_get_coordinators(hass, call).values():
+            if (recorder := coordinator.shot_recorder) is None:
+                raise ServiceValidationError(
+                    translation_domain=DOMAIN,
+                    translation_key="shots_not_recorded",
+                    translation_placeholders={"name": coordinator.device.name},
+                )
+            shots[coordinator.device.serial_number] = [
+                shot.as_dict() for shot in recorder.shots
+            ]
+        return {"shots": shots}
+
+    async def get_shot_history(call: ServiceCall) -> ServiceResponse:
+        """Return the saved shots of machines in a time range, oldest first.
+
+        At most limit shots are returned per machine. For machines with more
+        shots in the range, the start of the next one is returned, to continue
+        the history from there with another call.
+        """
+        start = _as_utc(call.data.get(ATTR_START))
+        end = _as_utc(call.data.get(ATTR_END))
+        key = (
+            PhysicalKey[call.data[ATTR_KEY].upper()] if ATTR_KEY in call.data else None
+        )
+        limit: int = call.data[ATTR_LIMIT]
+        shot_logs: dict[str, LaMarzoccoShotLog] = {}
+        for coordinator in _async_get_coordinators(hass, call).values():
+            if (shot_log := coordinator.config_entry.runtime_data.shot_log) is None:
+                raise ServiceValidationError(
+                    translation_domain=DOMAIN,
+                    translation_key="shots_not_recorded",
+                    translation_placeholders={"name": coordinator.device.name},
+                )
+            shot_logs[coordinator.device.serial_number] = shot_log
+        shots: dict[str, Any] = {}
+        next_start: dict[str, str] = {}
+        for serial_number, shot_log in shot_logs.items():
+            # the history is read in batches until one more shot than returned
+            machine_shots: list[Shot] = []
+            async with aclosing(shot_log.async_iter_shots(start, end, key)) as batches:
+                async for batch in batches:
+                    machine_shots.extend(batch)
+                    if len(machine_shots) > limit:
+                        break
+            if len(machine_shots) > limit:
+                next_start[serial_number] = dt_util.utc_from_timestamp(
+                    machine_shots[limit].start
+                ).isoformat()
+            shots[serial_number] = [shot.as_dict() for shot in machine_shots[:limit]]
+        return {"shots": shots, "next_start": next_start}
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_SCHEDULED_MACHINES,
+        get_scheduled_machines,
+        schema=GET_SCHEDULED_MACHINES_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_SHOT_HISTORY,
+        get_shot_history,
+        schema=GET_SHOT_HISTORY_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_SHOTS,
+        get_shots,
+        schema=MACHINES_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SET_AUTO_ON_OFF_SCHEDULES,
+        set_auto_on_off_schedules,
+        schema=SET_AUTO_ON_OFF_SCHEDULES_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+
+def _as_utc(moment: datetime | None) -> datetime | None:
+    """Return a moment in UTC, taking naive ones as local time."""
+    if moment is None:
+        return None
+    return dt_util.as_utc(moment)
+
+
+@callback
+def _async_get_coordinators(
+    hass: HomeAssistant, call: ServiceCall
+) -> dict[str, LaMarzoccoConfigUpdateCoordinator]:
+    """Return the config coordinators of the machines a call targets.
+
+    Devices and entities targeted directly have to belong to a machine, the
+    other devices in the targeted areas, floors and labels are skipped.
+    """
+    selection = TargetSelection(call.data)
+    selected = async_extract_referenced_entity_ids(hass, selection)
+    coordinators: dict[str, LaMarzoccoConfigUpdateCoordinator] = {}
+    for device_id in sorted(selection.device_ids):
+        if (coordinator := _async_get_coordinator(hass, device_id)) is None:
+            raise ServiceValidationError(
+                translation_domain=DOMAIN,
+                translation_key="invalid_machine",
+                translation_placeholders={"device_id": device_id},
+            )
+        coordinators[coordinator.device.serial_number] = coordinator
+    entity_registry = er.async_get(hass)
+    for entity_id in sorted(selected.referenced):
+        if (
+            (entity := entity_registry.async_get(entity_id)) is None
+            or entity.device_id is None
+            or (coordinator := _async_get_coordinator(hass, entity.device_id)) is None
+        ):
+            raise ServiceValidationError(
+                translation_domain=DOMAIN,
+                translation_key="invalid_machine_entity",
+                translation_placeholders={"entity_id": entity_id},
+            )
+        coordinators[coordinator.device.serial_number] = coordinator
+    for device_id in sorted(selected.referenced_devices - selection.device_ids):
+        if (coordinator := _async_get_coordinator(hass, device_id)) is not None:
+            coordinators[coordinator.device.serial_number] = coordinator
+    if not coordinators:
+        raise ServiceValidationError(
+            translation_domain=DOMAIN, translation_key="no_machine_targeted"
+        )
+    return coordinators
+
+
+@callback
+def _async_get_coordinator(
+    hass: HomeAssistant, device_id: str
+) -> LaMarzoccoConfigUpdateCoordinator | None:
+    """Return the config coordinator of the machine of a device."""
+    if device := dr.async_get(hass).async_get(device_id):
+        for entry_id in device.config_entries:
+            entry: LaMarzoccoConfigEntry | None = hass.config_entries.async_get_entry(
+                entry_id
+            )
+            if (
+                entry is not None
+                and entry.domain == DOMAIN
+                and entry.state is ConfigEntryState.LOADED
+                and (DOMAIN, entry.unique_id) in device.identifiers
+            ):
+                return entry.runtime_data.config_coordinator
+    return None
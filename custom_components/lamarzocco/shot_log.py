@@ -0,0 +1,315 @@
+"""Shot history of La Marzocco machines, kept in a binary file."""
+
+from __future__ import annotations
+
+from array import array
+import asyncio
+from bisect import bisect_left
+from collections.abc import AsyncIterator, Sequence
+from datetime import datetime, timedelta
+import logging
+import math
+from pathlib import Path
+import shutil
+import struct
+from typing import Any
+
+from pylamarzocco.const import PhysicalKey
+
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.storage import STORAGE_DIR
+
+from .const import DOMAIN
+from .shots import TRACE_SIZE, Shot
+
+_LOGGER = logging.getLogger(__name__)
+
+MAGIC = b"LMSH"
+VERSION = 1
+# magic, version and size of the records, to recognize the file
+HEADER = struct.Struct("<4sHH")
+# start, end, duration, key (0 if unknown), length of the trace, the coffee
+# boiler temperature at the start, lowest and highest, the steam boiler
+# temperature (NaN if unknown) and the trace in hundredths of a degree
+RECORD = struct.Struct(f"<ddfBB2x4f{TRACE_SIZE}H")
+# temperatures of the trace are clamped to the range of the record
+TRACE_MAX = 0xFFFF
+# the fields of a record kept in memory: start and key
+INDEX = struct.Struct("<d12xB")
+# shots older than this are removed by the compaction
+RETENTION = timedelta(days=365)
+COMPACT_INTERVAL = timedelta(days=1)
+# the file is only rewritten if this share of it expired, so that every
+# shot is copied only a few times before it expires itself
+COMPACT_RATIO = 0.1
+# records read from the file at once by queries
+READ_BATCH = 256
+# start times only survive a round trip through datetime to the microsecond
+START_TOLERANCE = 1e-6
+
+
+class ShotLogFile:
+    """Append-only file of fixed-width shot records.
+
+    Shots are appended in the order they were brewed, so the start times kept
+    in memory are sorted and the records of a time range are found with a
+    binary search and read in one piece. Only the start and key of a shot are
+    kept in memory, 9 bytes per shot. The methods block, in Home Assistant
+    they are run in the executor.
+    """
+
+    def __init__(self, path: Path) -> None:
+        """Initialize the file."""
+        self.path = path
+        self.starts = array("d")
+        self.keys = bytearray()
+        # increased when records move, positions from before are invalid
+        self.generation = 0
+
+    def __len__(self) -> int:
+        """Return the number of shots in the file."""
+        return len(self.starts)
+
+    def load(self) -> None:
+        """Read the start and key of all shots in the file."""
+        try:
+            data = self.path.read_bytes()
+        except FileNotFoundError:
+            return
+        header = HEADER.pack(MAGIC, VERSION, RECORD.size)
+        if not data.startswith(header):
+            # keep the file for inspection, but start a new one
+            invalid = self.path.with_suffix(".invalid")
+            _LOGGER.warning("Shot log %s is invalid, moved to %s", self.path, invalid)
+            self.path.replace(invalid)
+            return
+        end = len(data) - (len(data) - HEADER.size) % RECORD.size
+        if end != len(data):
+            # the last append was interrupted
+            with self.path.open("r+b") as file:
+                file.truncate(end)
+        for offset in range(HEADER.size, end, RECORD.size):
+            start, key = INDEX.unpack_from(data, offset)
+            self._add(start, key)
+
+    def append(self, shots: Sequence[Shot]) -> None:
+        """Append shots to the end of the file.
+
+        A shot with a value that doesn't fit its record is skipped.
+        """
+        records: list[bytes] = []
+        packed: list[Shot] = []
+        for shot in shots:
+            try:
+                records.append(_pack(shot))
+            except (struct.error, OverflowError) as err:
+                _LOGGER.warning(
+                    "Could not save the shot started at %s: %s", shot.start, err
+                )
+                continue
+            packed.append(shot)
+        data = b"".join(records)
+        if not self.starts:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("ab") as file:
+            size = file.tell()
+            try:
+                if size == 0:
+                    file.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+                file.write(data)
+                file.flush()
+            except OSError:
+                # records that are written in part would shift all later ones
+                file.truncate(size)
+                raise
+        for shot in packed:
+            self._add(shot.start, 0 if shot.key is None else shot.key.value)
+
+    def _add(self, start: float, key: int) -> None:
+        """Add a shot to the index."""
+        # a clock set back must not unsort the start times
+        self.starts.append(max(start, self.starts[-1]) if self.starts else start)
+        self.keys.append(key)
+
+    def bisect(self, moment: float) -> int:
+        """Return the position of the first shot started at or after a moment."""
+        return bisect_left(self.starts, moment - START_TOLERANCE)
+
+    def read(self, first: int, last: int) -> list[Shot]:
+        """Read the shots from position first up to last."""
+        if first >= last:
+            return []
+        with self.path.open("rb") as file:
+            file.seek(HEADER.size + first * RECORD.size)
+            data = file.read((last - first) * RECORD.size)
+        return [_unpack(record) for record in RECORD.iter_unpack(data)]
+
+    def compact(self, count: int) -> None:
+        """Remove the first count shots from the file."""
+        temporary = self.path.with_suffix(".tmp")
+        with self.path.open("rb") as source, temporary.open("wb") as target:
+            target.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+            source.seek(HEADER.size + count * RECORD.size)
+            shutil.copyfileobj(source, target)
+        temporary.replace(self.path)
+        del self.starts[:count]
+        del self.keys[:count]
+        self.generation += 1
+
+    def remove(self) -> None:
+        """Remove the file."""
+        self.path.unlink(missing_ok=True)
+        del self.starts[:]
+        del self.keys[:]
+        self.generation += 1
+
+
+class LaMarzoccoShotLog:
+    """Shot history of a machine, kept on disk for a year.
+
+    The file is only accessed in the executor, one operation at a time.
+    Queries read the file in batches, so a long history is never held in
+    memory at once and the file can be appended to between the batches.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize the shot log."""
+        self._hass = hass
+        self._file = ShotLogFile(
+            Path(hass.config.path(STORAGE_DIR, f"{DOMAIN}.{entry_id}.shots"))
+        )
+        self._lock = asyncio.Lock()
+
+    async def async_load(self) -> None:
+        """Load the index of the shots."""
+        async with self._lock:
+            await self._hass.async_add_executor_job(self._file.load)
+
+    async def async_append(self, shots: Sequence[Shot]) -> None:
+        """Save settled shots."""
+        async with self._lock:
+            try:
+                await self._hass.async_add_executor_job(self._file.append, shots)
+            except OSError as err:
+                _LOGGER.error(
+                    "Could not save %s shots to %s: %s",
+                    len(shots),
+                    self._file.path,
+                    err,
+                )
+
+    async def async_compact(self, now: datetime) -> None:
+        """Remove the shots older than the retention, once enough expired."""
+        async with self._lock:
+            expired = self._file.bisect((now - RETENTION).timestamp())
+            if not expired or expired < len(self._file) * COMPACT_RATIO:
+                return
+            try:
+                await self._hass.async_add_executor_job(self._file.compact, expired)
+            except OSError as err:
+                _LOGGER.error("Could not compact %s: %s", self._file.path, err)
+
+    async def async_remove(self) -> None:
+        """Remove the shot log."""
+        async with self._lock:
+            await self._hass.async_add_executor_job(self._file.remove)
+
+    async def async_iter_shots(
+        self,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        key: PhysicalKey | None = None,
+    ) -> AsyncIterator[list[Shot]]:
+        """Yield the shots started in a range in batches, oldest first."""
+        position: int | None = None
+        generation = self._file.generation
+        cursor = -math.inf if start is None else start.timestamp()
+        while True:
+            async with self._lock:
+                if position is None or generation != self._file.generation:
+                    # records moved by a compaction are found again by their start
+                    position = self._file.bisect(cursor)
+                    generation = self._file.generation
+                last = len(self._file)
+                if end is not None:
+                    last = self._file.bisect(end.timestamp())
+                last = min(last, position + READ_BATCH)
+                if position >= last:
+                    return
+                shots: list[Shot] = []
+                # batches without a shot of the key are not read
+                if key is None or key.value in self._file.keys[position:last]:
+                    try:
+                        shots = await self._hass.async_add_executor_job(
+                            self._file.read, position, last
+                        )
+                    except OSError as err:
+                        raise HomeAssistantError(
+                            translation_domain=DOMAIN,
+                            translation_key="shot_history_error",
+                            translation_placeholders={"error": str(err)},
+                        ) from err
+                cursor = self._file.starts[last - 1] + 2 * START_TOLERANCE
+                position = last
+            if key is not None:
+                shots = [shot for shot in shots if shot.key is key]
+            if shots:
+                yield shots
+
+
+def _pack(shot: Shot) -> bytes:
+    """Return the record of a shot."""
+    trace = [_trace_value(temperature) for temperature in shot.coffee_temperature_trace]
+    return RECORD.pack(
+        shot.start,
+        shot.end,
+        shot.duration,
+        0 if shot.key is None else shot.key.value,
+        len(trace),
+        shot.coffee_temperature,
+        shot.coffee_temperature_min,
+        shot.coffee_temperature_max,
+        math.nan if shot.steam_temperature is None else shot.steam_temperature,
+        *trace,
+        *[0] * (TRACE_SIZE - len(trace)),
+    )
+
+
+def _trace_value(temperature: float) -> int:
+    """Return a temperature of the trace in hundredths of a degree."""
+    if math.isnan(temperature):
+        return 0
+    return round(min(max(temperature * 100, 0), TRACE_MAX))
+
+
+def _unpack(record: tuple[Any, ...]) -> Shot:
+    """Return the shot of a record."""
+    (
+        start,
+        end,
+        duration,
+        key,
+        trace_length,
+        coffee_temperature,
+        coffee_temperature_min,
+        coffee_temperature_max,
+        steam_temperature,
+        *trace,
+    ) = record
+    return Shot(
+        start=start,
+        end=end,
+        # all but the times are stored with single precision
+        duration=round(duration, 2),
+        key=PhysicalKey(key) if key else None,
+        coffee_temperature=round(coffee_temperature, 2),
+        coffee_temperature_min=round(coffee_temperature_min, 2),
+        coffee_temperature_max=round(coffee_temperature_max, 2),
+        steam_temperature=(
+            None if math.isnan(steam_temperature) else round(steam_temperature, 2)
+        ),
+        coffee_temperature_trace=tuple(
+            temperature / 100 for temperature in trace[:trace_length]
+        ),
+    )
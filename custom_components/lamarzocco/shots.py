@@ -0,0 +1,200 @@
+"""Shots brewed by La Marzocco machines, recorded from the WebSocket."""
+
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Mapping, Sequence
+from dataclasses import asdict, dataclass, replace
+from itertools import pairwise
+from statistics import fmean
+from time import time
+from typing import TYPE_CHECKING, Any
+
+from pylamarzocco.const import BoilerType, PhysicalKey
+
+from homeassistant.core import CALLBACK_TYPE, callback
+from homeassistant.util import dt as dt_util
+
+if TYPE_CHECKING:
+    from pylamarzocco.devices.machine import LaMarzoccoMachine
+
+# shots kept in memory per machine
+SHOT_HISTORY_SIZE = 250
+# points of the coffee boiler temperature kept per shot
+TRACE_SIZE = 16
+
+
+@dataclass(frozen=True, slots=True)
+class Shot:
+    """Compact record of a shot."""
+
+    # timestamps of the start and end
+    start: float
+    end: float
+    # seconds as counted by the machine, or measured if it did not report them
+    duration: float
+    # None until the statistics show which key brewed the shot
+    key: PhysicalKey | None
+    # boiler temperatures, the coffee boiler also at its extremes during the shot
+    coffee_temperature: float
+    coffee_temperature_min: float
+    coffee_temperature_max: float
+    steam_temperature: float | None
+    # coffee boiler temperature during the shot, at most TRACE_SIZE points
+    coffee_temperature_trace: tuple[float, ...] = ()
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the shot as a dict for a service response."""
+        return asdict(self) | {
+            "start": dt_util.utc_from_timestamp(self.start).isoformat(),
+            "end": dt_util.utc_from_timestamp(self.end).isoformat(),
+            "key": None if self.key is None else self.key.name.lower(),
+            "coffee_temperature_trace": list(self.coffee_temperature_trace),
+        }
+
+
+def downsample(values: Sequence[float], size: int = TRACE_SIZE) -> tuple[float, ...]:
+    """Return the means of size equal parts of the values."""
+    if len(values) <= size:
+        return tuple(values)
+    bounds = [index * len(values) // size for index in range(size + 1)]
+    return tuple(round(fmean(values[low:high]), 2) for low, high in pairwise(bounds))
+
+
+class LaMarzoccoShotRecorder:
+    """Record the shots of a machine in a ring buffer.
+
+    The recorder is updated with every WebSocket message, so shots are
+    recorded in full without writing states during them. The WebSocket does
+    not tell which key brewed a shot. When the statistics show that a single
+    key brewed exactly the shots recorded since the last statistics, the key
+    is added to those shots. After that the shots are settled and can be
+    saved, they do not change anymore.
+    """
+
+    def __init__(
+        self, device: LaMarzoccoMachine, size: int = SHOT_HISTORY_SIZE
+    ) -> None:
+        """Initialize the recorder."""
+        self.shots: deque[Shot] = deque(maxlen=size)
+        self._device = device
+        self._listeners: list[CALLBACK_TYPE] = []
+        self._start_duration = 0.0
+        self._shot: Shot | None = None
+        self._temperatures: list[float] = []
+        self._key_counts: dict[PhysicalKey, int] | None = None
+        self._unsettled = 0
+
+    @property
+    def last_shot(self) -> Shot | None:
+        """Return the last recorded shot."""
+        return self.shots[-1] if self.shots else None
+
+    @callback
+    def async_add_listener(self, update_callback: CALLBACK_TYPE) -> CALLBACK_TYPE:
+        """Listen for new or changed shots."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            self._listeners.remove(update_callback)
+
+        return remove_listener
+
+    @callback
+    def async_update(self) -> None:
+        """Follow the shot with the state of the last WebSocket message."""
+        config = self._device.config
+        temperature = config.boilers[BoilerType.COFFEE].current_temperature
+        shot = self._shot
+        if shot is None:
+            if config.brew_active:
+                # the shot is filled in while it is brewed
+                now = time()
+                steam_boiler = config.boilers.get(BoilerType.STEAM)
+                self._shot = Shot(
+                    start=now,
+                    end=now,
+                    duration=0,
+                    key=None,
+                    coffee_temperature=temperature,
+                    coffee_temperature_min=temperature,
+                    coffee_temperature_max=temperature,
+                    steam_temperature=(
+                        steam_boiler.current_temperature if steam_boiler else None
+                    ),
+                )
+                self._start_duration = config.brew_active_duration
+                self._temperatures = [temperature]
+            return
+        self._temperatures.append(temperature)
+        shot = replace(
+            shot,
+            end=time(),
+            coffee_temperature_min=min(shot.coffee_temperature_min, temperature),
+            coffee_temperature_max=max(shot.coffee_temperature_max, temperature),
+        )
+        if config.brew_active:
+            self._shot = shot
+            return
+        self._shot = None
+        self.shots.append(
+            replace(
+                shot,
+                duration=(
+                    config.brew_active_duration
+                    if config.brew_active_duration != self._start_duration
+                    else round(shot.end - shot.start, 1)
+                ),
+                coffee_temperature_trace=downsample(self._temperatures),
+            )
+        )
+        self._temperatures = []
+        self._unsettled += 1
+        self._async_update_listeners()
+
+    @callback
+    def async_update_key_counts(self, counts: Mapping[PhysicalKey, int]) -> list[Shot]:
+        """Add the key to the shots since the last counts if it is certain.
+
+        Return these shots, they are settled.
+        """
+        previous, self._key_counts = self._key_counts, dict(counts)
+        if previous is not None and self._unsettled:
+            self._async_add_key(previous, counts)
+        return self.async_settle()
+
+    @callback
+    def _async_add_key(
+        self, previous: Mapping[PhysicalKey, int], counts: Mapping[PhysicalKey, int]
+    ) -> None:
+        """Add the key to the unsettled shots if only it brewed all of them."""
+        grown = {
+            key: count - previous.get(key, 0)
+            for key, count in counts.items()
+            if count != previous.get(key, 0)
+        }
+        if len(grown) != 1:
+            return
+        ((key, count),) = grown.items()
+        if count != self._unsettled:
+            return
+        for index in range(max(len(self.shots) - count, 0), len(self.shots)):
+            self.shots[index] = replace(self.shots[index], key=key)
+        self._async_update_listeners()
+
+    @callback
+    def async_settle(self) -> list[Shot]:
+        """Return the shots recorded since they were last settled."""
+        count = min(self._unsettled, len(self.shots))
+        self._unsettled = 0
+        return [
+            self.shots[index]
+            for index in range(len(self.shots) - count, len(self.shots))
+        ]
+
+    @callback
+    def _async_update_listeners(self) -> None:
+        """Inform the listeners."""
+        for update_callback in list(self._listeners):
+            update_callback()
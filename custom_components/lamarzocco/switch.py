@@ -15,6 +15,7 @@ from homeassistant.core import HomeAssistant
 from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.entity_platform import AddConfigEntryEntitiesCallback
 
+from .capabilities import supported
 from .const import DOMAIN
 from .coordinator import LaMarzoccoConfigEntry, LaMarzoccoUpdateCoordinator
 from .entity import LaMarzoccoBaseEntity, LaMarzoccoEntity, LaMarzoccoEntityDescription
@@ -73,8 +74,7 @@ async def async_setup_entry(
     entities: list[SwitchEntity] = []
     entities.extend(
         LaMarzoccoSwitchEntity(coordinator, description)
-        for description in ENTITIES
-        if description.supported_fn(coordinator)
+        for description in supported(ENTITIES, entry.runtime_data.capabilities)
     )
 
     entities.extend(
@@ -93,7 +93,12 @@ class LaMarzoccoSwitchEntity(LaMarzoccoEntity, SwitchEntity):
     async def async_turn_on(self, **kwargs: Any) -> None:
         """Turn device on."""
         try:
-            await self.entity_description.control_fn(self.coordinator.device, True)
+            await self.coordinator.command_queue.async_submit(
+                self.entity_description.key,
+                lambda: self.entity_description.control_fn(
+                    self.coordinator.device, True
+                ),
+            )
         except RequestNotSuccessful as exc:
             raise HomeAssistantError(
                 translation_domain=DOMAIN,
@@ -105,7 +110,12 @@ class LaMarzoccoSwitchEntity(LaMarzoccoEntity, SwitchEntity):
     async def async_turn_off(self, **kwargs: Any) -> None:
         """Turn device off."""
         try:
-            await self.entity_description.control_fn(self.coordinator.device, False)
+            await self.coordinator.command_queue.async_submit(
+                self.entity_description.key,
+                lambda: self.entity_description.control_fn(
+                    self.coordinator.device, False
+                ),
+            )
         except RequestNotSuccessful as exc:
             raise HomeAssistantError(
                 translation_domain=DOMAIN,
@@ -144,7 +154,10 @@ class LaMarzoccoAutoOnOffSwitchEntity(LaMarzoccoBaseEntity, SwitchEntity):
         ]
         wake_up_sleep_entry.enabled = state
         try:
-            await self.coordinator.device.set_wake_up_sleep(wake_up_sleep_entry)
+            await self.coordinator.command_queue.async_submit(
+                f"auto_on_off_{self._identifier}",
+                lambda: self.coordinator.device.set_wake_up_sleep(wake_up_sleep_entry),
+            )
         except RequestNotSuccessful as exc:
             raise HomeAssistantError(
                 translation_domain=DOMAIN,
@@ -161,9 +174,18 @@ class LaMarzoccoAutoOnOffSwitchEntity(LaMarzoccoBaseEntity, SwitchEntity):
         """Turn switch off."""
         await self._async_enable(False)
 
+    @property
+    def available(self) -> bool:
+        """Return True if the schedule still exists."""
+        return (
+            super().available
+            and self._identifier in self.coordinator.device.config.wake_up_sleep_entries
+        )
+
     @property
     def is_on(self) -> bool:
         """Return true if switch is on."""
-        return self.coordinator.device.config.wake_up_sleep_entries[
+        wake_up_sleep_entry = self.coordinator.device.config.wake_up_sleep_entries.get(
             self._identifier
-        ].enabled
+        )
+        return wake_up_sleep_entry is not None and wake_up_sleep_entry.enabled
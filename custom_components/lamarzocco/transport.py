@@ -0,0 +1,247 @@
+"""Latency-aware routing of commands across the transports of a machine."""
+
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from datetime import timedelta
+from enum import StrEnum
+from statistics import fmean
+from time import monotonic
+from typing import Any
+
+from aiohttp import ClientSession
+from pylamarzocco.clients.cloud import LaMarzoccoCloudClient
+from pylamarzocco.const import BoilerType
+
+from homeassistant.core import CALLBACK_TYPE, callback
+
+# results kept per transport for the statistics
+WINDOW_SIZE = 20
+# transports failing more often than this are avoided, once they were used
+# for a few commands
+MIN_SUCCESS_RATE = 0.5
+MIN_COMMANDS = 3
+# a transport that is passed over is tried again after this time, so its
+# statistics stay current and a recovered transport is noticed
+PROBE_INTERVAL = timedelta(minutes=5)
+
+
+class Transport(StrEnum):
+    """Way of talking to the machine."""
+
+    LOCAL = "local"
+    BLUETOOTH = "bluetooth"
+    CLOUD = "cloud"
+
+
+class CommandClass(StrEnum):
+    """Group of commands that can take the same transports."""
+
+    CONFIG = "config"
+    CONTROL = "control"
+
+
+TRANSPORT_COMMAND_CLASSES: dict[Transport, tuple[CommandClass, ...]] = {
+    Transport.LOCAL: (CommandClass.CONFIG,),
+    Transport.BLUETOOTH: (CommandClass.CONTROL,),
+    Transport.CLOUD: (CommandClass.CONFIG, CommandClass.CONTROL),
+}
+
+
+@dataclass
+class TransportStats:
+    """Round trip times and results of the recent commands over a transport."""
+
+    results: deque[tuple[float, bool]] = field(
+        default_factory=lambda: deque(maxlen=WINDOW_SIZE)
+    )
+    last_tried: float | None = None
+
+    @property
+    def success_rate(self) -> float | None:
+        """Return the share of recent commands that succeeded."""
+        if not self.results:
+            return None
+        return sum(success for _, success in self.results) / len(self.results)
+
+    @property
+    def latency(self) -> float | None:
+        """Return the average round trip time of recent successful commands."""
+        latencies = [latency for latency, success in self.results if success]
+        return fmean(latencies) if latencies else None
+
+    @property
+    def healthy(self) -> bool:
+        """Return True unless the transport failed too often recently."""
+        success_rate = self.success_rate
+        return (
+            success_rate is None
+            or len(self.results) < MIN_COMMANDS
+            or success_rate >= MIN_SUCCESS_RATE
+        )
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the statistics for the diagnostics."""
+        return {
+            "commands": len(self.results),
+            "success_rate": self.success_rate,
+            "latency": self.latency,
+        }
+
+
+class LaMarzoccoTransportRouter:
+    """Send each command over the fastest healthy transport.
+
+    The library tries the local API or Bluetooth first and falls back to the
+    cloud. The clients handed to the machine are routed clients, so the round
+    trip of every command is measured per transport. A transport that is
+    failing or slower than the cloud is skipped, which makes the library go
+    to the cloud right away instead of waiting for a timeout.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the router."""
+        self._stats: dict[CommandClass, dict[Transport, TransportStats]] = {}
+
+    def add_transport(self, transport: Transport) -> None:
+        """Measure the commands sent over a transport."""
+        for command_class in TRANSPORT_COMMAND_CLASSES[transport]:
+            self._stats.setdefault(command_class, {})[transport] = TransportStats()
+
+    def should_try(self, command_class: CommandClass, transport: Transport) -> bool:
+        """Return True if the command should be sent over the transport."""
+        stats = self._stats[command_class]
+        if (
+            transport is Transport.CLOUD
+            or (cloud := stats.get(Transport.CLOUD)) is None
+        ):
+            # nothing to fall back to
+            return True
+        own = stats[transport]
+        if own.healthy and (
+            not cloud.healthy
+            or own.latency is None
+            or cloud.latency is None
+            or own.latency <= cloud.latency
+        ):
+            return True
+        return (
+            own.last_tried is None
+            or monotonic() - own.last_tried >= PROBE_INTERVAL.total_seconds()
+        )
+
+    async def async_send[_T](
+        self,
+        command_class: CommandClass,
+        transport: Transport,
+        func: Callable[..., Awaitable[_T]],
+        *args: Any,
+    ) -> _T:
+        """Send a command over a transport and record how it went."""
+        stats = self._stats[command_class][transport]
+        stats.last_tried = start = monotonic()
+        try:
+            result = await func(*args)
+        except Exception:
+            stats.results.append((monotonic() - start, False))
+            raise
+        stats.results.append((monotonic() - start, result is not False))
+        return result
+
+    def as_dict(self) -> dict[str, dict[str, dict[str, Any]]]:
+        """Return the statistics of all transports for the diagnostics."""
+        return {
+            command_class: {
+                transport: stats.as_dict() for transport, stats in transports.items()
+            }
+            for command_class, transports in self._stats.items()
+        }
+
+
+class LaMarzoccoRoutedCloudClient(LaMarzoccoCloudClient):
+    """Cloud client measuring the commands that can take other transports.
+
+    The client is shared by the machines of an account, so the commands are
+    recorded by the router of the machine they are sent to. The cloud is
+    never skipped, it is the fallback of the other transports.
+    """
+
+    def __init__(
+        self, username: str, password: str, client: ClientSession | None = None
+    ) -> None:
+        """Initialize the client."""
+        super().__init__(username=username, password=password, client=client)
+        self._routers: dict[str, LaMarzoccoTransportRouter] = {}
+
+    def set_password(self, password: str) -> None:
+        """Log in with a new password on the next request."""
+        self._password = password
+        self._access_token = None
+
+    @callback
+    def async_add_router(
+        self, serial_number: str, router: LaMarzoccoTransportRouter
+    ) -> CALLBACK_TYPE:
+        """Record the commands sent to a machine with its router."""
+        router.add_transport(Transport.CLOUD)
+        self._routers[serial_number] = router
+
+        @callback
+        def remove_router() -> None:
+            if self._routers.get(serial_number) is router:
+                del self._routers[serial_number]
+
+        return remove_router
+
+    async def get_config(self, serial_number: str) -> dict[str, Any]:
+        """Get the config of a machine."""
+        return await self._async_send(
+            serial_number, CommandClass.CONFIG, super().get_config, serial_number
+        )
+
+    async def set_power(self, serial_number: str, enabled: bool) -> bool:
+        """Turn a machine on or off."""
+        return await self._async_send(
+            serial_number,
+            CommandClass.CONTROL,
+            super().set_power,
+            serial_number,
+            enabled,
+        )
+
+    async def set_steam(self, serial_number: str, enabled: bool) -> bool:
+        """Turn the steam boiler of a machine on or off."""
+        return await self._async_send(
+            serial_number,
+            CommandClass.CONTROL,
+            super().set_steam,
+            serial_number,
+            enabled,
+        )
+
+    async def set_temp(
+        self, serial_number: str, boiler: BoilerType, temperature: float
+    ) -> bool:
+        """Set the target temperature of a boiler."""
+        return await self._async_send(
+            serial_number,
+            CommandClass.CONTROL,
+            super().set_temp,
+            serial_number,
+            boiler,
+            temperature,
+        )
+
+    async def _async_send[_T](
+        self,
+        serial_number: str,
+        command_class: CommandClass,
+        func: Callable[..., Awaitable[_T]],
+        *args: Any,
+    ) -> _T:
+        """Send a command, measured if the machine has a router."""
+        if (router := self._routers.get(serial_number)) is None:
+            return await func(*args)
+        return await router.async_send(command_class, Transport.CLOUD, func, *args)
@@ -17,6 +17,7 @@ from homeassistant.core import HomeAssistant
 from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.entity_platform import AddConfigEntryEntitiesCallback
 
+from .capabilities import supported
 from .const import DOMAIN
 from .coordinator import LaMarzoccoConfigEntry
 from .entity import LaMarzoccoEntity, LaMarzoccoEntityDescription
@@ -62,8 +63,7 @@ async def async_setup_entry(
     coordinator = entry.runtime_data.firmware_coordinator
     async_add_entities(
         LaMarzoccoUpdateEntity(coordinator, description)
-        for description in ENTITIES
-        if description.supported_fn(coordinator)
+        for description in supported(ENTITIES, entry.runtime_data.capabilities)
     )
 
 
@@ -99,8 +99,11 @@ class LaMarzoccoUpdateEntity(LaMarzoccoEntity, UpdateEntity):
         self._attr_in_progress = True
         self.async_write_ha_state()
         try:
-            success = await self.coordinator.device.update_firmware(
-                self.entity_description.component
+            success = await self.coordinator.command_queue.async_submit(
+                None,
+                lambda: self.coordinator.device.update_firmware(
+                    self.entity_description.component
+                ),
             )
         except RequestNotSuccessful as exc:
             raise HomeAssistantError(
@@ -0,0 +1,178 @@
+"""WebSocket supervisor for La Marzocco machines."""
+
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from collections.abc import Callable
+from datetime import datetime, timedelta
+import logging
+import random
+from time import monotonic, time
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.util import dt as dt_util
+
+if TYPE_CHECKING:
+    from pylamarzocco.clients.local import LaMarzoccoLocalClient
+    from pylamarzocco.devices.machine import LaMarzoccoMachine
+
+    from .coordinator import LaMarzoccoConfigEntry
+
+# delay before the first reconnect after the connection was lost
+RECONNECT_DELAY = timedelta(seconds=5)
+MAX_RECONNECT_DELAY = timedelta(minutes=5)
+# a connection that lasted this long resets the reconnect delay
+STABLE_CONNECTION_TIME = timedelta(minutes=1)
+# time span over which the update rate is measured
+UPDATE_RATE_WINDOW = timedelta(seconds=10)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class LaMarzoccoWebSocketSupervisor:
+    """Keep the WebSocket of a machine connected.
+
+    The supervisor owns the only connection task of a machine. When the
+    connection is lost, it reconnects after a delay that doubles with every
+    failed attempt, with some jitter so machines don't reconnect in lockstep.
+
+    The library returns the same way whether a connection failed or was
+    closed, so an attempt only counts as connected once the machine sent
+    something.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: LaMarzoccoConfigEntry,
+        device: LaMarzoccoMachine,
+        local_client: LaMarzoccoLocalClient,
+        update_callback: Callable[[], None],
+    ) -> None:
+        """Initialize the supervisor."""
+        self._hass = hass
+        self._entry = entry
+        self._device = device
+        self._local_client = local_client
+        self._update_callback = update_callback
+        self._task: asyncio.Task[None] | None = None
+        self._stopped = False
+        self._update_times: deque[float] = deque()
+        self._listeners: list[CALLBACK_TYPE] = []
+        self.connect_count = 0
+        self.connected_since: datetime | None = None
+
+    @property
+    def last_message_at(self) -> datetime | None:
+        """Return when the last message, including keep alives, was received."""
+        if (timestamp := self._device.timestamp_last_websocket_msg) is None:
+            return None
+        return dt_util.utc_from_timestamp(timestamp)
+
+    @property
+    def update_rate(self) -> float:
+        """Return the updates per second received recently."""
+        self._trim_update_times(monotonic())
+        return len(self._update_times) / UPDATE_RATE_WINDOW.total_seconds()
+
+    @callback
+    def async_add_listener(self, update_callback: CALLBACK_TYPE) -> CALLBACK_TYPE:
+        """Listen for the connection being established or lost."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            self._listeners.remove(update_callback)
+
+        return remove_listener
+
+    @callback
+    def async_start(self) -> None:
+        """Start the connection task."""
+        if self._task is not None:
+            return
+        _LOGGER.debug("Init WebSocket in background task")
+        self._task = self._entry.async_create_background_task(
+            hass=self._hass,
+            target=self._async_run(),
+            name="lm_websocket_task",
+        )
+        self._entry.async_on_unload(
+            self._hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, self.async_stop)
+        )
+        self._entry.async_on_unload(self.async_stop)
+
+    async def async_stop(self, _: Any | None = None) -> None:
+        """Close the connection and stop reconnecting."""
+        self._stopped = True
+        if (
+            self._local_client.websocket is not None
+            and not self._local_client.websocket.closed
+        ):
+            await self._local_client.websocket.close()
+
+    async def _async_run(self) -> None:
+        """Connect the WebSocket and reconnect whenever it is lost."""
+        attempts = 0
+        while not self._stopped:
+            started = monotonic()
+            attempt_started_at = time()
+            try:
+                # returns once the connection is closed or could not be opened
+                await self._device.websocket_connect(
+                    notify_callback=self._async_handle_update
+                )
+            except Exception:
+                _LOGGER.exception("Unexpected error in the WebSocket connection")
+            connected = self.connected_since is not None
+            if not connected and (
+                (last_message := self._device.timestamp_last_websocket_msg) is not None
+                and last_message >= attempt_started_at
+            ):
+                # the machine only sent keep alives
+                connected = True
+                self.connect_count += 1
+            if connected:
+                self.connected_since = None
+                self._async_update_listeners()
+            if self._stopped:
+                return
+            if (
+                connected
+                and monotonic() - started >= STABLE_CONNECTION_TIME.total_seconds()
+            ):
+                attempts = 0
+            delay = min(RECONNECT_DELAY * 2**attempts, MAX_RECONNECT_DELAY)
+            attempts += 1
+            _LOGGER.debug("WebSocket disconnected, reconnecting in %s", delay)
+            await asyncio.sleep(delay.total_seconds() * random.uniform(0.8, 1.2))
+
+    @callback
+    def _async_handle_update(self) -> None:
+        """Count an update pushed by the machine and pass it on."""
+        if self.connected_since is None:
+            # the first update of a connection
+            self.connect_count += 1
+            self.connected_since = dt_util.utcnow()
+            self._async_update_listeners()
+        now = monotonic()
+        self._update_times.append(now)
+        self._trim_update_times(now)
+        self._update_callback()
+
+    @callback
+    def _async_update_listeners(self) -> None:
+        """Inform the listeners about a change of the connection."""
+        for update_callback in list(self._listeners):
+            update_callback()
+
+    def _trim_update_times(self, now: float) -> None:
+        """Drop updates that are outside the measuring window."""
+        while (
+            self._update_times
+            and now - self._update_times[0] > UPDATE_RATE_WINDOW.total_seconds()
+        ):
+            self._update_times.popleft()
@@ -1,6 +1,7 @@
 """Lamarzocco session fixtures."""
 
-from collections.abc import Generator
+import asyncio
+from collections.abc import Callable, Generator
 import json
 from unittest.mock import AsyncMock, MagicMock, patch
 
@@ -146,7 +147,7 @@ def mock_lamarzocco(device_fixture: MachineModel) -> Generator[MagicMock]:
 
     with (
         patch(
-            "homeassistant.components.lamarzocco.LaMarzoccoMachine",
+            "pylamarzocco.devices.machine.LaMarzoccoMachine",
             autospec=True,
         ) as lamarzocco_mock,
     ):
@@ -160,6 +161,15 @@ def mock_lamarzocco(device_fixture: MachineModel) -> Generator[MagicMock]:
         lamarzocco.statistics = dummy_machine.statistics
         lamarzocco.firmware = dummy_machine.firmware
         lamarzocco.steam_level = SteamLevel.LEVEL_1
+        lamarzocco.timestamp_last_websocket_msg = None
+
+        async def websocket_connect(
+            notify_callback: Callable[[], None] | None = None,
+        ) -> None:
+            """Stay connected, like the real WebSocket does until it is closed."""
+            await asyncio.Event().wait()
+
+        lamarzocco.websocket_connect.side_effect = websocket_connect
 
         lamarzocco.firmware[FirmwareType.GATEWAY].latest_version = "v3.5-rc3"
         lamarzocco.firmware[FirmwareType.MACHINE].latest_version = "1.55"
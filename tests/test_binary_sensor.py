@@ -84,6 +84,15 @@ async def test_sensor_going_unavailable(
     async_fire_time_changed(hass)
     await hass.async_block_till_done()
 
+    # the last data is kept for a while
+    state = hass.states.get(brewing_active_sensor)
+    assert state
+    assert state.state != STATE_UNAVAILABLE
+
+    freezer.tick(timedelta(minutes=30))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+
     state = hass.states.get(brewing_active_sensor)
     assert state
     assert state.state == STATE_UNAVAILABLE
@@ -0,0 +1,146 @@
+"""Tests for the La Marzocco Bluetooth session."""
+
+from collections.abc import Generator
+from datetime import timedelta
+import inspect
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from bleak import BleakError
+from bleak.backends.device import BLEDevice
+from pylamarzocco.clients.bluetooth import LaMarzoccoBluetoothClient
+from pylamarzocco.const import AUTH_CHARACTERISTIC, SETTINGS_CHARACTERISTIC
+from pylamarzocco.exceptions import BluetoothConnectionFailed
+import pytest
+
+from homeassistant.components.lamarzocco.bluetooth_session import (
+    LaMarzoccoBluetoothSession,
+)
+from homeassistant.components.lamarzocco.transport import LaMarzoccoTransportRouter
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from tests.common import async_fire_time_changed
+
+
+@pytest.fixture
+def mock_bleak_client(mock_ble_device: BLEDevice) -> Generator[MagicMock]:
+    """Return a mocked connection to the machine."""
+    client = MagicMock()
+    client.is_connected = True
+    client.write_gatt_char = AsyncMock()
+
+    async def disconnect() -> None:
+        client.is_connected = False
+
+    client.disconnect = AsyncMock(side_effect=disconnect)
+    with (
+        patch(
+            "homeassistant.components.lamarzocco.bluetooth_session.bluetooth.async_ble_device_from_address",
+            return_value=mock_ble_device,
+        ),
+        patch(
+            "homeassistant.components.lamarzocco.bluetooth_session.establish_connection",
+            return_value=client,
+        ) as establish_connection,
+    ):
+        client.establish_connection = establish_connection
+        yield client
+
+
+def _session(hass: HomeAssistant, idle_timeout: float) -> LaMarzoccoBluetoothSession:
+    """Return a session to the machine."""
+    return LaMarzoccoBluetoothSession(
+        hass,
+        LaMarzoccoTransportRouter(),
+        username="username",
+        serial_number="GS012345",
+        token="token",
+        address="00:00:00:00:00:00",
+        idle_timeout=idle_timeout,
+    )
+
+
+async def test_connection_is_reused(
+    hass: HomeAssistant,
+    mock_bleak_client: MagicMock,
+) -> None:
+    """Test commands sent shortly after another share one connection."""
+    session = _session(hass, 30)
+
+    await session.set_power(True)
+    await session.set_steam(True)
+
+    mock_bleak_client.establish_connection.assert_called_once()
+    # authentication and two commands
+    assert mock_bleak_client.write_gatt_char.await_count == 3
+
+    # the clock is not frozen, the session waits for the machine after connecting
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=30))
+    await hass.async_block_till_done()
+    mock_bleak_client.disconnect.assert_awaited_once()
+
+    # the next command connects again
+    mock_bleak_client.is_connected = True
+    await session.set_power(False)
+    assert mock_bleak_client.establish_connection.call_count == 2
+    await session.async_close()
+    assert mock_bleak_client.disconnect.await_count == 2
+
+
+async def test_disconnect_without_idle_timeout(
+    hass: HomeAssistant,
+    mock_bleak_client: MagicMock,
+) -> None:
+    """Test the connection is closed after every command without idle timeout."""
+    session = _session(hass, 0)
+
+    await session.set_power(True)
+
+    mock_bleak_client.disconnect.assert_awaited_once()
+
+
+async def test_failed_write_closes_connection(
+    hass: HomeAssistant,
+    mock_bleak_client: MagicMock,
+) -> None:
+    """Test a failed write closes the connection, so the next command reconnects."""
+    session = _session(hass, 30)
+    mock_bleak_client.write_gatt_char.side_effect = [None, BleakError]
+
+    with pytest.raises(BluetoothConnectionFailed):
+        await session.set_power(True)
+
+    mock_bleak_client.disconnect.assert_awaited_once()
+
+
+async def test_library_writes_through_session(
+    hass: HomeAssistant,
+    mock_bleak_client: MagicMock,
+) -> None:
+    """Test the commands of the library are written over the session.
+
+    The session replaces a private method of the library, this fails if the
+    library stops sending its commands through it.
+    """
+    assert list(
+        inspect.signature(LaMarzoccoBluetoothClient._write_bluetooth_message).parameters
+    ) == ["self", "characteristic", "message"]
+    session = _session(hass, 0)
+    services = mock_bleak_client.services
+    services.get_characteristic.side_effect = lambda uuid: uuid
+
+    with patch(
+        "pylamarzocco.clients.bluetooth.BleakClient",
+        side_effect=AssertionError("library connected on its own"),
+    ):
+        await session.set_power(True)
+
+    auth, command = mock_bleak_client.write_gatt_char.await_args_list
+    assert auth.kwargs["char_specifier"] == AUTH_CHARACTERISTIC
+    assert auth.kwargs["data"] == b"dXNlcm5hbWU6R1MwMTIzNDU=@dG9rZW4="
+    assert command.kwargs["char_specifier"] == SETTINGS_CHARACTERISTIC
+    assert json.loads(command.kwargs["data"].rstrip(b"\x00")) == {
+        "name": "MachineChangeMode",
+        "parameter": {"mode": "BrewingMode"},
+    }
@@ -1,26 +1,32 @@
 """Tests for La Marzocco calendar."""
 
+from dataclasses import replace
 from datetime import datetime, timedelta
+from typing import Any
 from unittest.mock import MagicMock
 
 from freezegun.api import FrozenDateTimeFactory
+from pylamarzocco.const import WeekDay
 import pytest
 from syrupy import SnapshotAssertion
 
 from homeassistant.components.calendar import (
+    DATA_COMPONENT,
     DOMAIN as CALENDAR_DOMAIN,
     EVENT_END_DATETIME,
     EVENT_START_DATETIME,
     SERVICE_GET_EVENTS,
 )
-from homeassistant.const import ATTR_ENTITY_ID
+from homeassistant.const import ATTR_ENTITY_ID, STATE_UNAVAILABLE
 from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import ServiceValidationError
 from homeassistant.helpers import entity_registry as er
 from homeassistant.util import dt as dt_util
 
 from . import WAKE_UP_SLEEP_ENTRY_IDS, async_init_integration
 
-from tests.common import MockConfigEntry
+from tests.common import MockConfigEntry, async_fire_time_changed
+from tests.typing import WebSocketGenerator
 
 
 async def test_calendar_events(
@@ -152,3 +158,297 @@ async def test_no_calendar_events_global_disable(
         return_response=True,
     )
     assert events == snapshot
+
+
+async def test_calendar_follows_schedule_changes(
+    hass: HomeAssistant,
+    mock_lamarzocco: MagicMock,
+    mock_config_entry: MockConfigEntry,
+) -> None:
+    """Test the events follow changes of the schedule."""
+    wake_up_sleep_entry_id = WAKE_UP_SLEEP_ENTRY_IDS[1]
+    entity_id = f"calendar.{mock_lamarzocco.serial_number}_auto_on_off_schedule_{wake_up_sleep_entry_id}".lower()
+    start_date = datetime(2024, 2, 11, 6, 0, tzinfo=dt_util.get_default_time_zone())
+
+    await async_init_integration(hass, mock_config_entry)
+
+    async def get_events() -> list[dict[str, str]]:
+        response = await hass.services.async_call(
+            CALENDAR_DOMAIN,
+            SERVICE_GET_EVENTS,
+            {
+                ATTR_ENTITY_ID: entity_id,
+                EVENT_START_DATETIME: start_date,
+                EVENT_END_DATETIME: start_date + timedelta(days=14),
+            },
+            blocking=True,
+            return_response=True,
+        )
+        return response[entity_id]["events"]
+
+    events = await get_events()
+    assert [event["start"] for event in events] == [
+        "2024-02-11T07:00:00-08:00",
+        "2024-02-18T07:00:00-08:00",
+    ]
+
+    wake_up_sleep_entry = mock_lamarzocco.config.wake_up_sleep_entries[
+        wake_up_sleep_entry_id
+    ]
+    wake_up_sleep_entry.time_on = "6:30"
+    wake_up_sleep_entry.days.append(WeekDay.SATURDAY)
+
+    events = await get_events()
+    assert [event["start"] for event in events] == [
+        "2024-02-11T06:30:00-08:00",
+        "2024-02-17T06:30:00-08:00",
+        "2024-02-18T06:30:00-08:00",
+        "2024-02-24T06:30:00-08:00",
+    ]
+
+
+async def test_fleet_calendar(
+    hass: HomeAssistant,
+    mock_lamarzocco: MagicMock,
+    mock_config_entry: MockConfigEntry,
+) -> None:
+    """Test the calendar of all machines flags overlapping schedules."""
+    entity_id = (
+        "calendar.la_marzocco_account_username_auto_on_off_schedule_of_all_machines"
+    )
+    start_date = datetime(2024, 2, 11, 7, 15, tzinfo=dt_util.get_default_time_zone())
+
+    await async_init_integration(hass, mock_config_entry)
+
+    async def get_events() -> list[dict[str, str]]:
+        response = await hass.services.async_call(
+            CALENDAR_DOMAIN,
+            SERVICE_GET_EVENTS,
+            {
+                ATTR_ENTITY_ID: entity_id,
+                EVENT_START_DATETIME: start_date,
+                EVENT_END_DATETIME: start_date + timedelta(hours=15),
+            },
+            blocking=True,
+            return_response=True,
+        )
+        return response[entity_id]["events"]
+
+    events = await get_events()
+    assert [(event["start"], event["end"]) for event in events] == [
+        ("2024-02-11T07:00:00-08:00", "2024-02-11T07:30:00-08:00"),
+        ("2024-02-11T22:00:00-08:00", "2024-02-12T00:00:00-08:00"),
+    ]
+    assert all("Conflicts" not in event["description"] for event in events)
+
+    # let the Sunday schedule run into the daily one
+    wake_up_sleep_entry = mock_lamarzocco.config.wake_up_sleep_entries[
+        WAKE_UP_SLEEP_ENTRY_IDS[1]
+    ]
+    wake_up_sleep_entry.time_on = "21:00"
+    wake_up_sleep_entry.time_off = "22:30"
+    mock_config_entry.runtime_data.config_coordinator.async_update_listeners()
+
+    events = await get_events()
+    assert [event["start"] for event in events] == [
+        "2024-02-11T21:00:00-08:00",
+        "2024-02-11T22:00:00-08:00",
+    ]
+    assert events[0]["description"].endswith(
+        f"Conflicts with auto on/off schedule {WAKE_UP_SLEEP_ENTRY_IDS[0]} of the machine"
+    )
+    assert events[1]["description"].endswith(
+        f"Conflicts with auto on/off schedule {WAKE_UP_SLEEP_ENTRY_IDS[1]} of the machine"
+    )
+
+
+async def test_fleet_index_follows_schedule_changes(
+    hass: HomeAssistant,
+    mock_lamarzocco: MagicMock,
+    mock_config_entry: MockConfigEntry,
+) -> None:
+    """Test the index of all machines is only checked on updates of a machine."""
+    await async_init_integration(hass, mock_config_entry)
+    coordinator = mock_config_entry.runtime_data.config_coordinator
+    fleet_schedule = coordinator.account.fleet_schedule
+    index = fleet_schedule.index
+
+    coordinator.async_update_listeners()
+    assert fleet_schedule.index is index
+
+    # the schedules are compared when the machine is updated, not on every use
+    mock_lamarzocco.config.wake_up_sleep_entries[
+        WAKE_UP_SLEEP_ENTRY_IDS[1]
+    ].time_on = "6:30"
+    assert fleet_schedule.index is index
+    coordinator.async_update_listeners()
+    assert fleet_schedule.index is not index
+
+
+async def test_schedules_added_later(
+    hass: HomeAssistant,
+    mock_lamarzocco: MagicMock,
+    mock_config_entry: MockConfigEntry,
+    freezer: FrozenDateTimeFactory,
+) -> None:
+    """Test the calendar of a schedule appearing later is added."""
+    wake_up_sleep_entries = mock_lamarzocco.config.wake_up_sleep_entries
+    mock_lamarzocco.config.wake_up_sleep_entries = {}
+
+    await async_init_integration(hass, mock_config_entry)
+
+    # only the calendar of all machines
+    assert hass.states.async_entity_ids(CALENDAR_DOMAIN) == [
+        "calendar.la_marzocco_account_username_auto_on_off_schedule_of_all_machines"
+    ]
+
+    mock_lamarzocco.config.wake_up_sleep_entries = wake_up_sleep_entries
+    freezer.tick(timedelta(minutes=10))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+
+    assert len(hass.states.async_entity_ids(CALENDAR_DOMAIN)) == (
+        len(wake_up_sleep_entries) + 1
+    )
+    for wake_up_sleep_entry_id in wake_up_sleep_entries:
+        assert hass.states.get(
+            f"calendar.{mock_lamarzocco.serial_number}_auto_on_off_schedule_{wake_up_sleep_entry_id.lower()}"
+        )
+
+
+async def test_schedule_deleted(
+    hass: HomeAssistant,
+    mock_lamarzocco: MagicMock,
+    mock_config_entry: MockConfigEntry,
+    freezer: FrozenDateTimeFactory,
+) -> None:
+    """Test the calendar of a deleted schedule becomes unavailable."""
+    wake_up_sleep_entry_id = WAKE_UP_SLEEP_ENTRY_IDS[1]
+    entity_id = f"calendar.{mock_lamarzocco.serial_number}_auto_on_off_schedule_{wake_up_sleep_entry_id}".lower()
+
+    await async_init_integration(hass, mock_config_entry)
+    assert hass.states.get(entity_id).state != STATE_UNAVAILABLE
+
+    del mock_lamarzocco.config.wake_up_sleep_entries[wake_up_sleep_entry_id]
+    freezer.tick(timedelta(minutes=10))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+
+    assert hass.states.get(entity_id).state == STATE_UNAVAILABLE
+    other_entity_id = f"calendar.{mock_lamarzocco.serial_number}_auto_on_off_schedule_{WAKE_UP_SLEEP_ENTRY_IDS[0]}".lower()
+    assert hass.states.get(other_entity_id).state != STATE_UNAVAILABLE
+
+    calendar = hass.data[DATA_COMPONENT].get_entity(entity_id)
+    assert calendar.event is None
+    assert (
+        await calendar.async_get_events(
+            hass, dt_util.now(), dt_util.now() + timedelta(days=14)
+        )
+        == []
+    )
+
+
+async def test_calendar_change_schedule(
+    hass: HomeAssistant,
+    mock_lamarzocco: MagicMock,
+    mock_config_entry: MockConfigEntry,
+    hass_ws_client: WebSocketGenerator,
+) -> None:
+    """Test changing and deleting the events changes the schedule."""
+    wake_up_sleep_entry_id = WAKE_UP_SLEEP_ENTRY_IDS[1]
+    entity_id = f"calendar.{mock_lamarzocco.serial_number}_auto_on_off_schedule_{wake_up_sleep_entry_id.lower()}"
+    wake_up_sleep_entry = mock_lamarzocco.config.wake_up_sleep_entries[
+        wake_up_sleep_entry_id
+    ]
+
+    await async_init_integration(hass, mock_config_entry)
+    client = await hass_ws_client(hass)
+
+    async def send(message: dict[str, Any]) -> dict[str, Any]:
+        await client.send_json_auto_id({"entity_id": entity_id, **message})
+        return await client.receive_json()
+
+    result = await send(
+        {
+            "type": "calendar/event/update",
+            "uid": wake_up_sleep_entry_id,
+            "event": {
+                "summary": "Machine on",
+                "dtstart": "2024-02-12T06:30:00-08:00",
+                "dtend": "2024-02-13T00:00:00-08:00",
+                "rrule": "FREQ=WEEKLY;BYDAY=MO,WE",
+            },
+        }
+    )
+    assert result["success"]
+    mock_lamarzocco.set_wake_up_sleep.assert_called_once_with(
+        replace(
+            wake_up_sleep_entry,
+            days=[WeekDay.MONDAY, WeekDay.WEDNESDAY],
+            time_on="06:30",
+            time_off="24:00",
+        )
+    )
+
+    # the events of a schedule can only be changed together
+    result = await send(
+        {
+            "type": "calendar/event/delete",
+            "uid": wake_up_sleep_entry_id,
+            "recurrence_id": "2024-02-11T07:00:00-08:00",
+        }
+    )
+    assert not result["success"]
+
+    result = await send(
+        {"type": "calendar/event/delete", "uid": wake_up_sleep_entry_id}
+    )
+    assert result["success"]
+    mock_lamarzocco.set_wake_up_sleep.assert_called_with(
+        replace(wake_up_sleep_entry, enabled=False)
+    )
+
+
+async def test_calendar_create_event(
+    hass: HomeAssistant,
+    mock_lamarzocco: MagicMock,
+    mock_config_entry: MockConfigEntry,
+) -> None:
+    """Test creating an event sets a disabled schedule."""
+    wake_up_sleep_entry_id = WAKE_UP_SLEEP_ENTRY_IDS[0]
+    entity_id = f"calendar.{mock_lamarzocco.serial_number}_auto_on_off_schedule_{wake_up_sleep_entry_id.lower()}"
+    wake_up_sleep_entry = mock_lamarzocco.config.wake_up_sleep_entries[
+        wake_up_sleep_entry_id
+    ]
+
+    await async_init_integration(hass, mock_config_entry)
+
+    async def create_event() -> None:
+        await hass.services.async_call(
+            CALENDAR_DOMAIN,
+            "create_event",
+            {
+                ATTR_ENTITY_ID: entity_id,
+                "summary": "Machine on",
+                "start_date_time": "2024-02-13 08:00:00",
+                "end_date_time": "2024-02-13 17:30:00",
+            },
+            blocking=True,
+        )
+
+    with pytest.raises(ServiceValidationError) as exc_info:
+        await create_event()
+    assert exc_info.value.translation_key == "auto_on_off_schedule_in_use"
+
+    wake_up_sleep_entry.enabled = False
+    await create_event()
+
+    mock_lamarzocco.set_wake_up_sleep.assert_called_once_with(
+        replace(
+            wake_up_sleep_entry,
+            enabled=True,
+            days=[WeekDay.TUESDAY],
+            time_on="08:00",
+            time_off="17:30",
+        )
+    )
@@ -0,0 +1,67 @@
+"""Tests for the La Marzocco model capabilities."""
+
+from pylamarzocco.const import MachineModel
+import pytest
+
+from homeassistant.components.lamarzocco import number, select, sensor
+from homeassistant.components.lamarzocco.capabilities import (
+    Capability,
+    machine_capabilities,
+    supported,
+)
+
+
+@pytest.mark.parametrize("model", list(MachineModel))
+def test_every_model_has_capabilities(model: MachineModel) -> None:
+    """Test the capability table covers every machine model."""
+    assert Capability.LOCAL_CONNECTION not in machine_capabilities(model, False)
+    assert Capability.LOCAL_CONNECTION in machine_capabilities(model, True)
+
+
+@pytest.mark.parametrize(
+    ("model", "number_keys", "select_keys", "sensor_keys"),
+    [
+        (
+            MachineModel.GS3_AV,
+            {"coffee_temp", "smart_standby_time", "steam_temp", "tea_water_duration"},
+            {"prebrew_infusion_select", "smart_standby_mode"},
+            {"current_temp_coffee", "current_temp_steam"},
+        ),
+        (
+            MachineModel.GS3_MP,
+            {"coffee_temp", "smart_standby_time", "steam_temp", "tea_water_duration"},
+            {"smart_standby_mode"},
+            {"current_temp_coffee", "current_temp_steam"},
+        ),
+        (
+            MachineModel.LINEA_MICRA,
+            {"coffee_temp", "smart_standby_time"},
+            {"prebrew_infusion_select", "smart_standby_mode", "steam_temp_select"},
+            {"current_temp_coffee", "current_temp_steam"},
+        ),
+        (
+            MachineModel.LINEA_MINI,
+            {"coffee_temp", "smart_standby_time"},
+            {"prebrew_infusion_select", "smart_standby_mode"},
+            {"current_temp_coffee"},
+        ),
+    ],
+)
+def test_supported_entities(
+    model: MachineModel,
+    number_keys: set[str],
+    select_keys: set[str],
+    sensor_keys: set[str],
+) -> None:
+    """Test the entities a model supports."""
+    capabilities = machine_capabilities(model, False)
+
+    assert {
+        description.key for description in supported(number.ENTITIES, capabilities)
+    } == number_keys
+    assert {
+        description.key for description in supported(select.ENTITIES, capabilities)
+    } == select_keys
+    assert {
+        description.key for description in supported(sensor.ENTITIES, capabilities)
+    } == sensor_keys
@@ -0,0 +1,95 @@
+"""Tests for the La Marzocco circuit breaker."""
+
+from http import HTTPStatus
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from aiohttp import ClientConnectionError
+import pytest
+
+from homeassistant.components.lamarzocco.circuit_breaker import (
+    FAILURE_THRESHOLD,
+    CircuitBreakerState,
+    CircuitOpenError,
+    LaMarzoccoCircuitBreaker,
+)
+
+
+@pytest.fixture
+def mock_monotonic():
+    """Return a controllable clock for the circuit breaker."""
+    with patch(
+        "homeassistant.components.lamarzocco.circuit_breaker.monotonic",
+        return_value=1000.0,
+    ) as mock_monotonic:
+        yield mock_monotonic
+
+
+def _handler(status: HTTPStatus = HTTPStatus.OK) -> AsyncMock:
+    """Return a request handler answering with a status."""
+    return AsyncMock(return_value=MagicMock(status=status))
+
+
+async def test_breaker_opens_and_recovers(mock_monotonic) -> None:
+    """Test the breaker opens after failures and closes after a good probe."""
+    breaker = LaMarzoccoCircuitBreaker()
+    listener = MagicMock()
+    breaker.async_add_listener(listener)
+    failing = AsyncMock(side_effect=ClientConnectionError)
+
+    for _ in range(FAILURE_THRESHOLD):
+        with pytest.raises(ClientConnectionError):
+            await breaker(MagicMock(), failing)
+    assert breaker.state is CircuitBreakerState.OPEN
+    assert listener.call_count == 1
+
+    # requests fail fast while the breaker is open
+    with pytest.raises(CircuitOpenError):
+        await breaker(MagicMock(), failing)
+    assert failing.await_count == FAILURE_THRESHOLD
+
+    # a failed probe opens the breaker for longer
+    mock_monotonic.return_value += 40
+    await breaker(MagicMock(), _handler(HTTPStatus.SERVICE_UNAVAILABLE))
+    assert breaker.state is CircuitBreakerState.OPEN
+    assert breaker.retry_in.total_seconds() > 40
+
+    # a good probe closes the breaker
+    mock_monotonic.return_value += 80
+    await breaker(MagicMock(), _handler())
+    assert breaker.state is CircuitBreakerState.CLOSED
+
+
+@pytest.mark.parametrize(
+    "status", [HTTPStatus.BAD_REQUEST, HTTPStatus.UNAUTHORIZED, HTTPStatus.NOT_FOUND]
+)
+async def test_client_errors_are_no_failures(status: HTTPStatus) -> None:
+    """Test responses to bad requests show the API is reachable."""
+    breaker = LaMarzoccoCircuitBreaker()
+    failing = AsyncMock(side_effect=TimeoutError)
+    for _ in range(FAILURE_THRESHOLD - 1):
+        with pytest.raises(TimeoutError):
+            await breaker(MagicMock(), failing)
+
+    await breaker(MagicMock(), _handler(status))
+    await breaker(MagicMock(), _handler(HTTPStatus.TOO_MANY_REQUESTS))
+
+    assert breaker.state is CircuitBreakerState.CLOSED
+
+
+async def test_single_probe(mock_monotonic) -> None:
+    """Test only one request probes the API while half open."""
+    breaker = LaMarzoccoCircuitBreaker()
+    failing = _handler(HTTPStatus.INTERNAL_SERVER_ERROR)
+    for _ in range(FAILURE_THRESHOLD):
+        await breaker(MagicMock(), failing)
+
+    mock_monotonic.return_value += 40
+
+    async def probe(request: MagicMock) -> MagicMock:
+        assert breaker.state is CircuitBreakerState.HALF_OPEN
+        with pytest.raises(CircuitOpenError):
+            await breaker(MagicMock(), _handler())
+        return MagicMock(status=HTTPStatus.OK)
+
+    await breaker(MagicMock(), probe)
+    assert breaker.state is CircuitBreakerState.CLOSED
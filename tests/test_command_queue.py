@@ -0,0 +1,173 @@
+"""Tests for the La Marzocco command queue."""
+
+import asyncio
+from functools import partial
+from unittest.mock import AsyncMock, MagicMock
+
+from pylamarzocco.exceptions import RequestNotSuccessful
+import pytest
+
+from homeassistant.components.lamarzocco.command_queue import LaMarzoccoCommandQueue
+
+
+async def test_commands_are_serialized() -> None:
+    """Test commands are not sent concurrently."""
+    queue = LaMarzoccoCommandQueue()
+    running = 0
+    max_running = 0
+
+    async def command() -> bool:
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0)
+        running -= 1
+        return True
+
+    results = await asyncio.gather(
+        queue.async_submit(None, command),
+        queue.async_submit("coffee_temp", command),
+        queue.async_submit("steam_temp", command),
+    )
+
+    assert results == [True, True, True]
+    assert max_running == 1
+
+
+async def test_pending_commands_are_coalesced() -> None:
+    """Test a waiting command is superseded by a newer one with the same key."""
+    queue = LaMarzoccoCommandQueue()
+    blocker = asyncio.Event()
+    set_temp = AsyncMock(return_value=True)
+
+    async def block() -> None:
+        await blocker.wait()
+
+    tasks = [
+        asyncio.create_task(queue.async_submit(None, block)),
+        asyncio.create_task(queue.async_submit("coffee_temp", lambda: set_temp(93.0))),
+        asyncio.create_task(queue.async_submit("coffee_temp", lambda: set_temp(94.0))),
+        asyncio.create_task(queue.async_submit("coffee_temp", lambda: set_temp(94.5))),
+    ]
+    await asyncio.sleep(0)
+    blocker.set()
+    results = await asyncio.gather(*tasks)
+
+    assert results == [None, True, True, True]
+    set_temp.assert_awaited_once_with(94.5)
+
+
+async def test_errors_reach_all_callers() -> None:
+    """Test superseded callers receive the error of the command sent."""
+    queue = LaMarzoccoCommandQueue()
+    blocker = asyncio.Event()
+    set_temp = AsyncMock(side_effect=RequestNotSuccessful(""))
+
+    async def block() -> None:
+        await blocker.wait()
+
+    first = asyncio.create_task(queue.async_submit(None, block))
+    second = asyncio.create_task(queue.async_submit("coffee_temp", set_temp))
+    third = asyncio.create_task(queue.async_submit("coffee_temp", set_temp))
+    await asyncio.sleep(0)
+    blocker.set()
+    await first
+
+    with pytest.raises(RequestNotSuccessful):
+        await second
+    with pytest.raises(RequestNotSuccessful):
+        await third
+    set_temp.assert_awaited_once()
+
+
+async def test_first_caller_cancelled() -> None:
+    """Test the newer value is still sent if the first caller is cancelled."""
+    queue = LaMarzoccoCommandQueue()
+    blocker = asyncio.Event()
+    set_temp = AsyncMock(return_value=True)
+
+    async def block() -> None:
+        await blocker.wait()
+
+    first = asyncio.create_task(queue.async_submit(None, block))
+    second = asyncio.create_task(
+        queue.async_submit("coffee_temp", lambda: set_temp(93.0))
+    )
+    third = asyncio.create_task(
+        queue.async_submit("coffee_temp", lambda: set_temp(94.0))
+    )
+    await asyncio.sleep(0)
+    second.cancel()
+    await asyncio.sleep(0)
+    blocker.set()
+    await first
+
+    assert await third is True
+    assert second.cancelled()
+    set_temp.assert_awaited_once_with(94.0)
+
+
+async def test_all_callers_cancelled() -> None:
+    """Test a command is dropped if all its callers are cancelled."""
+    queue = LaMarzoccoCommandQueue()
+    blocker = asyncio.Event()
+    set_temp = AsyncMock(return_value=True)
+
+    async def block() -> None:
+        await blocker.wait()
+
+    first = asyncio.create_task(queue.async_submit(None, block))
+    second = asyncio.create_task(queue.async_submit("coffee_temp", set_temp))
+    await asyncio.sleep(0)
+    second.cancel()
+    await asyncio.sleep(0)
+    blocker.set()
+    await first
+
+    # a new command with the same key is not merged into the dropped one
+    assert await queue.async_submit("coffee_temp", set_temp) is True
+    set_temp.assert_awaited_once()
+
+
+async def test_debounced_partials_are_merged() -> None:
+    """Test debounced partials of the same function are sent as one request."""
+    queue = LaMarzoccoCommandQueue()
+    set_prebrew_time = AsyncMock(return_value=True)
+
+    results = await asyncio.gather(
+        queue.async_submit(
+            "prebrew", partial(set_prebrew_time, prebrew_on_time=1.0), debounce=0.01
+        ),
+        queue.async_submit(
+            "prebrew", partial(set_prebrew_time, prebrew_off_time=2.0), debounce=0.01
+        ),
+        queue.async_submit(
+            "prebrew", partial(set_prebrew_time, prebrew_on_time=1.5), debounce=0.01
+        ),
+    )
+
+    assert results == [True, True, True]
+    set_prebrew_time.assert_awaited_once_with(prebrew_on_time=1.5, prebrew_off_time=2.0)
+
+
+async def test_listeners_are_told_about_commands() -> None:
+    """Test listeners are called for sent commands, but not for polls."""
+    queue = LaMarzoccoCommandQueue()
+    listener = MagicMock()
+    remove_listener = queue.async_add_listener(listener)
+
+    await queue.async_submit(None, AsyncMock(return_value=True))
+    assert listener.call_count == 0
+
+    await queue.async_submit("main", AsyncMock(return_value=True))
+    assert listener.call_count == 1
+
+    with pytest.raises(RequestNotSuccessful):
+        await queue.async_submit(
+            "main", AsyncMock(side_effect=RequestNotSuccessful("Boom."))
+        )
+    assert listener.call_count == 1
+
+    remove_listener()
+    await queue.async_submit("main", AsyncMock(return_value=True))
+    assert listener.call_count == 1
@@ -9,7 +9,14 @@ from pylamarzocco.models import LaMarzoccoDeviceInfo
 import pytest
 
 from homeassistant.components.lamarzocco.config_flow import CONF_MACHINE
-from homeassistant.components.lamarzocco.const import CONF_USE_BLUETOOTH, DOMAIN
+from homeassistant.components.lamarzocco.const import (
+    CONF_BLUETOOTH_IDLE_TIMEOUT,
+    CONF_MAX_DATA_AGE,
+    CONF_MAX_FAILED_UPDATES,
+    CONF_USE_BLUETOOTH,
+    CONF_WEBSOCKET_UPDATE_WINDOW,
+    DOMAIN,
+)
 from homeassistant.config_entries import (
     SOURCE_BLUETOOTH,
     SOURCE_DHCP,
@@ -299,7 +306,7 @@ async def test_reconfigure_flow(
             return_value=True,
         ),
         patch(
-            "homeassistant.components.lamarzocco.config_flow.async_discovered_service_info",
+            "homeassistant.components.bluetooth.async_discovered_service_info",
             return_value=[service_info],
         ),
     ):
@@ -590,4 +597,8 @@ async def test_options_flow(
     assert result2["type"] is FlowResultType.CREATE_ENTRY
     assert result2["data"] == {
         CONF_USE_BLUETOOTH: False,
+        CONF_BLUETOOTH_IDLE_TIMEOUT: 30,
+        CONF_WEBSOCKET_UPDATE_WINDOW: 500,
+        CONF_MAX_DATA_AGE: 15,
+        CONF_MAX_FAILED_UPDATES: 3,
     }
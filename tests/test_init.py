@@ -1,24 +1,37 @@
 """Test initialization of lamarzocco."""
 
-from datetime import timedelta
+from datetime import datetime, timedelta
+import subprocess
+import sys
+from time import time
+from typing import Any
 from unittest.mock import AsyncMock, MagicMock, patch
 
 from freezegun.api import FrozenDateTimeFactory
-from pylamarzocco.const import FirmwareType, MachineModel
+from pylamarzocco.const import FirmwareType, MachineModel, WeekDay
 from pylamarzocco.exceptions import AuthFail, RequestNotSuccessful
 import pytest
 from syrupy import SnapshotAssertion
 
+from homeassistant.components.bluetooth import BluetoothChange
+from homeassistant.components.calendar import DOMAIN as CALENDAR_DOMAIN
+from homeassistant.components.lamarzocco.account import ACCOUNTS, POLL_STAGGER
+from homeassistant.components.lamarzocco.cache import SAVE_DELAY
 from homeassistant.components.lamarzocco.config_flow import CONF_MACHINE
 from homeassistant.components.lamarzocco.const import DOMAIN
+from homeassistant.components.lamarzocco.websocket import RECONNECT_DELAY
 from homeassistant.config_entries import SOURCE_REAUTH, ConfigEntryState
 from homeassistant.const import (
     CONF_HOST,
     CONF_MAC,
     CONF_MODEL,
     CONF_NAME,
+    CONF_PASSWORD,
     CONF_TOKEN,
+    CONF_USERNAME,
     EVENT_HOMEASSISTANT_STOP,
+    STATE_UNAVAILABLE,
+    Platform,
 )
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers import (
@@ -26,6 +39,7 @@ from homeassistant.helpers import (
     entity_registry as er,
     issue_registry as ir,
 )
+from homeassistant.util import dt as dt_util
 
 from . import USER_INPUT, async_init_integration, get_bluetooth_service_info
 
@@ -167,12 +181,10 @@ async def test_bluetooth_is_set_from_discovery(
     )
     with (
         patch(
-            "homeassistant.components.lamarzocco.async_discovered_service_info",
+            "homeassistant.components.lamarzocco.bluetooth_index.async_discovered_service_info",
             return_value=[service_info],
         ) as discovery,
-        patch(
-            "homeassistant.components.lamarzocco.LaMarzoccoMachine"
-        ) as mock_machine_class,
+        patch("pylamarzocco.devices.machine.LaMarzoccoMachine") as mock_machine_class,
     ):
         mock_machine = MagicMock()
         mock_machine.get_firmware = AsyncMock()
@@ -187,6 +199,30 @@ async def test_bluetooth_is_set_from_discovery(
     assert mock_config_entry.data[CONF_MAC] == service_info.address
 
 
+async def test_bluetooth_is_set_when_machine_appears(
+    hass: HomeAssistant,
+    mock_config_entry: MockConfigEntry,
+    mock_lamarzocco: MagicMock,
+) -> None:
+    """Check a machine advertising itself after setup is picked up."""
+    with patch(
+        "homeassistant.components.lamarzocco.bluetooth_index.async_register_callback",
+    ) as register_callback:
+        await async_init_integration(hass, mock_config_entry)
+    assert CONF_MAC not in mock_config_entry.data
+
+    service_info = get_bluetooth_service_info(
+        mock_lamarzocco.model, mock_lamarzocco.serial_number
+    )
+    advertisement_callback = register_callback.call_args[0][1]
+    advertisement_callback(service_info, BluetoothChange.ADVERTISEMENT)
+    await hass.async_block_till_done()
+
+    assert mock_config_entry.data[CONF_MAC] == service_info.address
+    assert mock_config_entry.data[CONF_NAME] == service_info.name
+    assert mock_config_entry.state is ConfigEntryState.LOADED
+
+
 async def test_websocket_closed_on_unload(
     hass: HomeAssistant,
     mock_config_entry: MockConfigEntry,
@@ -194,7 +230,7 @@ async def test_websocket_closed_on_unload(
 ) -> None:
     """Test the websocket is closed on unload."""
     with patch(
-        "homeassistant.components.lamarzocco.LaMarzoccoLocalClient",
+        "homeassistant.components.lamarzocco.local_client.LaMarzoccoRoutedLocalClient",
         autospec=True,
     ) as local_client:
         client = local_client.return_value
@@ -209,6 +245,54 @@ async def test_websocket_closed_on_unload(
         client.websocket.close.assert_called_once()
 
 
+async def test_websocket_reconnects(
+    hass: HomeAssistant,
+    mock_config_entry: MockConfigEntry,
+    mock_lamarzocco: MagicMock,
+    freezer: FrozenDateTimeFactory,
+) -> None:
+    """Test the WebSocket is reconnected with a growing delay."""
+    stay_connected = mock_lamarzocco.websocket_connect.side_effect
+
+    async def websocket_connect(**kwargs: Any) -> None:
+        # the first two connections can't be opened
+        if mock_lamarzocco.websocket_connect.call_count > 2:
+            kwargs["notify_callback"]()
+            await stay_connected(**kwargs)
+
+    mock_lamarzocco.websocket_connect.side_effect = websocket_connect
+    with patch(
+        "homeassistant.components.lamarzocco.local_client.LaMarzoccoRoutedLocalClient",
+        autospec=True,
+    ) as local_client:
+        local_client.return_value.websocket = None
+        await async_init_integration(hass, mock_config_entry)
+    supervisor = mock_config_entry.runtime_data.config_coordinator.websocket_supervisor
+    assert supervisor is not None
+    assert mock_lamarzocco.websocket_connect.call_count == 1
+
+    freezer.tick(RECONNECT_DELAY * 1.2)
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+    assert mock_lamarzocco.websocket_connect.call_count == 2
+    # failed attempts are no connections
+    assert supervisor.connect_count == 0
+    assert supervisor.connected_since is None
+
+    # the delay doubles after another failed attempt
+    freezer.tick(RECONNECT_DELAY * 1.2)
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+    assert mock_lamarzocco.websocket_connect.call_count == 2
+
+    freezer.tick(RECONNECT_DELAY * 1.2)
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+    assert mock_lamarzocco.websocket_connect.call_count == 3
+    assert supervisor.connect_count == 1
+    assert supervisor.connected_since is not None
+
+
 @pytest.mark.parametrize(
     ("version", "issue_exists"), [("v3.5-rc6", False), ("v3.3-rc4", True)]
 )
@@ -229,6 +313,86 @@ async def test_gateway_version_issue(
     assert (issue is not None) == issue_exists
 
 
+async def test_setup_only_waits_for_config(
+    hass: HomeAssistant,
+    mock_config_entry: MockConfigEntry,
+    mock_lamarzocco: MagicMock,
+    freezer: FrozenDateTimeFactory,
+) -> None:
+    """Test firmware and statistics are loaded after setup."""
+    mock_lamarzocco.get_firmware.side_effect = RequestNotSuccessful("")
+    mock_lamarzocco.get_statistics.side_effect = RequestNotSuccessful("")
+
+    await async_init_integration(hass, mock_config_entry)
+
+    assert mock_config_entry.state is ConfigEntryState.LOADED
+    serial_number = mock_lamarzocco.serial_number
+    for entity_id in (
+        f"sensor.{serial_number}_total_flushes_made",
+        f"update.{serial_number}_gateway_firmware",
+    ):
+        state = hass.states.get(entity_id)
+        assert state
+        assert state.state == STATE_UNAVAILABLE
+    state = hass.states.get(f"switch.{serial_number}")
+    assert state
+    assert state.state != STATE_UNAVAILABLE
+
+    mock_lamarzocco.get_firmware.side_effect = None
+    mock_lamarzocco.get_statistics.side_effect = None
+    freezer.tick(timedelta(hours=1))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+
+    for entity_id in (
+        f"sensor.{serial_number}_total_flushes_made",
+        f"update.{serial_number}_gateway_firmware",
+    ):
+        state = hass.states.get(entity_id)
+        assert state
+        assert state.state != STATE_UNAVAILABLE
+
+
+async def test_setup_without_firmware(
+    hass: HomeAssistant,
+    mock_config_entry: MockConfigEntry,
+    mock_lamarzocco: MagicMock,
+    device_registry: dr.DeviceRegistry,
+    freezer: FrozenDateTimeFactory,
+) -> None:
+    """Test the machine is set up before its firmware was ever loaded."""
+    firmware = mock_lamarzocco.firmware
+    mock_lamarzocco.firmware = {}
+    mock_lamarzocco.get_firmware.side_effect = RequestNotSuccessful("")
+    firmware[FirmwareType.GATEWAY].current_version = "v3.3-rc4"
+
+    await async_init_integration(hass, mock_config_entry)
+
+    assert mock_config_entry.state is ConfigEntryState.LOADED
+    device = device_registry.async_get_device(
+        identifiers={(DOMAIN, mock_lamarzocco.serial_number)}
+    )
+    assert device
+    assert device.sw_version is None
+    issue_registry = ir.async_get(hass)
+    assert not issue_registry.async_get_issue(DOMAIN, "unsupported_gateway_firmware")
+
+    async def get_firmware() -> None:
+        mock_lamarzocco.firmware = firmware
+
+    mock_lamarzocco.get_firmware.side_effect = get_firmware
+    freezer.tick(timedelta(hours=1))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+
+    device = device_registry.async_get_device(
+        identifiers={(DOMAIN, mock_lamarzocco.serial_number)}
+    )
+    assert device
+    assert device.sw_version == firmware[FirmwareType.MACHINE].current_version
+    assert issue_registry.async_get_issue(DOMAIN, "unsupported_gateway_firmware")
+
+
 async def test_conf_host_removed_for_new_gateway(
     hass: HomeAssistant,
     mock_config_entry: MockConfigEntry,
@@ -315,3 +479,523 @@ async def test_remove_stale_scale(
 
     device = device_registry.async_get_device(identifiers={(DOMAIN, scale_address)})
     assert device is None
+
+
+async def test_platform_set_up_when_needed(
+    hass: HomeAssistant,
+    mock_lamarzocco: MagicMock,
+    mock_config_entry: MockConfigEntry,
+    freezer: FrozenDateTimeFactory,
+) -> None:
+    """Test a platform without entities is only set up once the config needs it."""
+    wake_up_sleep_entries = mock_lamarzocco.config.wake_up_sleep_entries
+    mock_lamarzocco.config.wake_up_sleep_entries = {}
+
+    # the owner of the account always sets up the calendar of all machines
+    with patch(
+        "homeassistant.components.lamarzocco.async_get_account_owner",
+        return_value=None,
+    ):
+        await async_init_integration(hass, mock_config_entry)
+
+    assert Platform.CALENDAR not in mock_config_entry.runtime_data.platforms
+    assert not hass.states.async_entity_ids(CALENDAR_DOMAIN)
+
+    mock_lamarzocco.config.wake_up_sleep_entries = wake_up_sleep_entries
+
+    freezer.tick(timedelta(minutes=10))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+
+    assert Platform.CALENDAR in mock_config_entry.runtime_data.platforms
+    assert len(hass.states.async_entity_ids(CALENDAR_DOMAIN)) == len(
+        wake_up_sleep_entries
+    )
+
+    assert await hass.config_entries.async_unload(mock_config_entry.entry_id)
+    assert mock_config_entry.state is ConfigEntryState.NOT_LOADED
+
+
+async def test_websocket_push_skips_polling(
+    hass: HomeAssistant,
+    mock_config_entry: MockConfigEntry,
+    mock_lamarzocco: MagicMock,
+    freezer: FrozenDateTimeFactory,
+) -> None:
+    """Test the config is not polled while the WebSocket pushes updates."""
+    await async_init_integration(hass, mock_config_entry)
+    assert len(mock_lamarzocco.get_config.mock_calls) == 1
+
+    mock_lamarzocco.websocket_connected = True
+    mock_lamarzocco.timestamp_last_websocket_msg = time()
+
+    freezer.tick(timedelta(seconds=31))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+
+    assert len(mock_lamarzocco.get_config.mock_calls) == 1
+
+    # socket went quiet, fall back to polling
+    freezer.tick(timedelta(minutes=1))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+
+    assert len(mock_lamarzocco.get_config.mock_calls) == 2
+
+
+async def test_polling_slows_down_in_standby(
+    hass: HomeAssistant,
+    mock_config_entry: MockConfigEntry,
+    mock_lamarzocco: MagicMock,
+    freezer: FrozenDateTimeFactory,
+) -> None:
+    """Test the config is polled less often while the machine is in standby."""
+    mock_lamarzocco.config.turned_on = False
+    for wake_up_sleep_entry in mock_lamarzocco.config.wake_up_sleep_entries.values():
+        wake_up_sleep_entry.enabled = False
+
+    await async_init_integration(hass, mock_config_entry)
+    assert len(mock_lamarzocco.get_config.mock_calls) == 1
+
+    freezer.tick(timedelta(minutes=1))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+
+    assert len(mock_lamarzocco.get_config.mock_calls) == 1
+
+    freezer.tick(timedelta(minutes=5))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+
+    assert len(mock_lamarzocco.get_config.mock_calls) == 2
+
+
+async def test_polling_not_slowed_down_overnight(
+    hass: HomeAssistant,
+    mock_config_entry: MockConfigEntry,
+    mock_lamarzocco: MagicMock,
+    freezer: FrozenDateTimeFactory,
+) -> None:
+    """Test an auto on/off schedule running past midnight keeps polling fast."""
+    freezer.move_to(datetime(2024, 2, 13, 2, 0, tzinfo=dt_util.get_default_time_zone()))
+    mock_lamarzocco.config.turned_on = False
+    for wake_up_sleep_entry in mock_lamarzocco.config.wake_up_sleep_entries.values():
+        wake_up_sleep_entry.enabled = False
+    wake_up_sleep_entry.enabled = True
+    wake_up_sleep_entry.days = list(WeekDay)
+    wake_up_sleep_entry.time_on = "22:00"
+    wake_up_sleep_entry.time_off = "06:00"
+
+    await async_init_integration(hass, mock_config_entry)
+    assert len(mock_lamarzocco.get_config.mock_calls) == 1
+
+    freezer.tick(timedelta(minutes=1))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+
+    assert len(mock_lamarzocco.get_config.mock_calls) == 2
+
+
+async def test_polling_speeds_up_when_turned_on(
+    hass: HomeAssistant,
+    mock_config_entry: MockConfigEntry,
+    mock_lamarzocco: MagicMock,
+    freezer: FrozenDateTimeFactory,
+) -> None:
+    """Test the idle interval is left as soon as a push turns the machine on."""
+    mock_lamarzocco.config.turned_on = False
+    for wake_up_sleep_entry in mock_lamarzocco.config.wake_up_sleep_entries.values():
+        wake_up_sleep_entry.enabled = False
+    with patch(
+        "homeassistant.components.lamarzocco.local_client.LaMarzoccoRoutedLocalClient",
+        autospec=True,
+    ) as local_client:
+        local_client.return_value.websocket = None
+        await async_init_integration(hass, mock_config_entry)
+    assert len(mock_lamarzocco.get_config.mock_calls) == 1
+
+    # turned on at the machine, reported by the WebSocket
+    mock_lamarzocco.config.turned_on = True
+    mock_lamarzocco.websocket_connect.call_args.kwargs["notify_callback"]()
+
+    freezer.tick(timedelta(seconds=31))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+
+    assert len(mock_lamarzocco.get_config.mock_calls) == 2
+
+
+async def test_shots_settled_with_loaded_statistics(
+    hass: HomeAssistant,
+    mock_config_entry: MockConfigEntry,
+    mock_lamarzocco: MagicMock,
+    freezer: FrozenDateTimeFactory,
+) -> None:
+    """Test recorded shots are not settled by a failed statistics update."""
+    with patch(
+        "homeassistant.components.lamarzocco.local_client.LaMarzoccoRoutedLocalClient",
+        autospec=True,
+    ) as local_client:
+        local_client.return_value.websocket = None
+        await async_init_integration(hass, mock_config_entry)
+    shot_recorder = mock_config_entry.runtime_data.config_coordinator.shot_recorder
+    assert shot_recorder is not None
+
+    with patch.object(
+        shot_recorder, "async_update_key_counts", return_value=[]
+    ) as update_key_counts:
+        mock_lamarzocco.get_statistics.side_effect = RequestNotSuccessful("")
+        freezer.tick(timedelta(minutes=30))
+        async_fire_time_changed(hass)
+        await hass.async_block_till_done()
+
+        update_key_counts.assert_not_called()
+
+        mock_lamarzocco.get_statistics.side_effect = None
+        freezer.tick(timedelta(minutes=30))
+        async_fire_time_changed(hass)
+        await hass.async_block_till_done()
+
+        update_key_counts.assert_called_once_with(
+            mock_lamarzocco.statistics.drink_stats
+        )
+
+
+async def test_websocket_updates_are_combined(
+    hass: HomeAssistant,
+    mock_config_entry: MockConfigEntry,
+    mock_lamarzocco: MagicMock,
+    freezer: FrozenDateTimeFactory,
+) -> None:
+    """Test WebSocket updates are combined, but brewing changes are passed on."""
+    with patch(
+        "homeassistant.components.lamarzocco.local_client.LaMarzoccoRoutedLocalClient",
+        autospec=True,
+    ) as local_client:
+        local_client.return_value.websocket = None
+        await async_init_integration(hass, mock_config_entry)
+
+    notify = mock_lamarzocco.websocket_connect.call_args.kwargs["notify_callback"]
+    coordinator = mock_config_entry.runtime_data.config_coordinator
+    listener = MagicMock()
+    mock_config_entry.async_on_unload(coordinator.async_add_listener(listener))
+
+    # start of a shot is passed on immediately
+    mock_lamarzocco.config.brew_active = True
+    notify()
+    assert listener.call_count == 1
+
+    # updates during the shot are combined
+    for _ in range(5):
+        notify()
+    assert listener.call_count == 1
+    freezer.tick(timedelta(milliseconds=500))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+    assert listener.call_count == 2
+
+    # end of the shot flushes pending updates
+    notify()
+    mock_lamarzocco.config.brew_active = False
+    notify()
+    assert listener.call_count == 3
+    freezer.tick(timedelta(seconds=1))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+    assert listener.call_count == 3
+
+
+async def test_machines_share_account(
+    hass: HomeAssistant,
+    mock_config_entry: MockConfigEntry,
+    mock_lamarzocco: MagicMock,
+) -> None:
+    """Test machines on the same account share the cloud client and session."""
+    second_entry = MockConfigEntry(
+        title="My other LaMarzocco",
+        domain=DOMAIN,
+        version=2,
+        data=mock_config_entry.data,
+        unique_id="GS054321",
+    )
+    with patch(
+        "homeassistant.components.lamarzocco.account.LaMarzoccoRoutedCloudClient",
+        autospec=True,
+    ) as cloud_client:
+        await async_init_integration(hass, mock_config_entry)
+        await async_init_integration(hass, second_entry)
+
+    cloud_client.assert_called_once()
+    first = mock_config_entry.runtime_data.statistics_coordinator
+    second = second_entry.runtime_data.statistics_coordinator
+    assert first.account is second.account
+    assert second.update_interval - first.update_interval == POLL_STAGGER
+
+    await hass.config_entries.async_unload(mock_config_entry.entry_id)
+    assert hass.data[ACCOUNTS]
+    assert not first.account.session.closed
+    await hass.config_entries.async_unload(second_entry.entry_id)
+    await hass.async_block_till_done()
+    assert not hass.data[ACCOUNTS]
+    assert first.account.session.closed
+
+
+async def test_password_change_keeps_account(
+    hass: HomeAssistant,
+    mock_config_entry: MockConfigEntry,
+    mock_lamarzocco: MagicMock,
+) -> None:
+    """Test the account is kept when the password is changed during a reauth."""
+    second_entry = MockConfigEntry(
+        title="My other LaMarzocco",
+        domain=DOMAIN,
+        version=2,
+        data=mock_config_entry.data,
+        unique_id="GS054321",
+    )
+    with patch(
+        "homeassistant.components.lamarzocco.account.LaMarzoccoRoutedCloudClient",
+        autospec=True,
+    ) as cloud_client:
+        await async_init_integration(hass, mock_config_entry)
+        await async_init_integration(hass, second_entry)
+        account = mock_config_entry.runtime_data.config_coordinator.account
+
+        hass.config_entries.async_update_entry(
+            second_entry, data={**second_entry.data, CONF_PASSWORD: "new"}
+        )
+        await hass.config_entries.async_reload(second_entry.entry_id)
+        await hass.async_block_till_done()
+
+    cloud_client.assert_called_once()
+    cloud_client.return_value.set_password.assert_called_once_with("new")
+    assert second_entry.runtime_data.config_coordinator.account is account
+
+    await hass.config_entries.async_unload(second_entry.entry_id)
+    await hass.async_block_till_done()
+    assert not account.session.closed
+    await hass.config_entries.async_unload(mock_config_entry.entry_id)
+    await hass.async_block_till_done()
+    assert not hass.data[ACCOUNTS]
+    assert account.session.closed
+
+
+async def test_local_client_has_own_session(
+    hass: HomeAssistant,
+    mock_config_entry: MockConfigEntry,
+    mock_lamarzocco: MagicMock,
+) -> None:
+    """Test local requests don't use the session of the cloud requests."""
+    with patch(
+        "homeassistant.components.lamarzocco.local_client.LaMarzoccoRoutedLocalClient",
+        autospec=True,
+    ) as local_client:
+        local_client.return_value.websocket = None
+        await async_init_integration(hass, mock_config_entry)
+
+    account = mock_config_entry.runtime_data.config_coordinator.account
+    assert local_client.call_args.kwargs["client"] is not account.session
+
+
+async def test_account_entities_stay_with_oldest_entry(
+    hass: HomeAssistant,
+    mock_config_entry: MockConfigEntry,
+    mock_lamarzocco: MagicMock,
+    entity_registry: er.EntityRegistry,
+    device_registry: dr.DeviceRegistry,
+) -> None:
+    """Test the entities of the account are added once, by its oldest entry."""
+    entity_id = "sensor.la_marzocco_account_username_api_circuit_breaker"
+    second_entry = MockConfigEntry(
+        title="My other LaMarzocco",
+        domain=DOMAIN,
+        version=2,
+        data=mock_config_entry.data,
+        unique_id="GS054321",
+    )
+    await async_init_integration(hass, mock_config_entry)
+    await async_init_integration(hass, second_entry)
+
+    entry = entity_registry.async_get(entity_id)
+    assert entry
+    assert entry.config_entry_id == mock_config_entry.entry_id
+    device = device_registry.async_get(entry.device_id)
+    assert device
+    assert device.identifiers == {(DOMAIN, USER_INPUT[CONF_USERNAME])}
+
+    # reloading the machines doesn't move the entities
+    await hass.config_entries.async_reload(mock_config_entry.entry_id)
+    await hass.config_entries.async_reload(second_entry.entry_id)
+    await hass.async_block_till_done()
+    entry = entity_registry.async_get(entity_id)
+    assert entry
+    assert entry.config_entry_id == mock_config_entry.entry_id
+    assert not second_entry.runtime_data.owns_account
+
+    # the next entry adds them once the oldest is removed
+    await hass.config_entries.async_remove(mock_config_entry.entry_id)
+    await hass.async_block_till_done()
+    entry = entity_registry.async_get(entity_id)
+    assert entry
+    assert entry.config_entry_id == second_entry.entry_id
+    state = hass.states.get(entity_id)
+    assert state
+    assert state.state == "closed"
+
+
+async def test_fleet_calendar_stays_with_oldest_entry(
+    hass: HomeAssistant,
+    mock_config_entry: MockConfigEntry,
+    mock_lamarzocco: MagicMock,
+    entity_registry: er.EntityRegistry,
+) -> None:
+    """Test the calendar of all machines is not handed over on unload."""
+    entity_id = (
+        "calendar.la_marzocco_account_username_auto_on_off_schedule_of_all_machines"
+    )
+    # the oldest machine has no schedules of its own
+    mock_lamarzocco.config.wake_up_sleep_entries = {}
+    second_entry = MockConfigEntry(
+        title="My other LaMarzocco",
+        domain=DOMAIN,
+        version=2,
+        data=mock_config_entry.data,
+        unique_id="GS054321",
+    )
+    await async_init_integration(hass, mock_config_entry)
+    await async_init_integration(hass, second_entry)
+
+    assert Platform.CALENDAR in mock_config_entry.runtime_data.platforms
+    entry = entity_registry.async_get(entity_id)
+    assert entry
+    assert entry.config_entry_id == mock_config_entry.entry_id
+
+    await hass.config_entries.async_unload(mock_config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    state = hass.states.get(entity_id)
+    assert state
+    assert state.state == STATE_UNAVAILABLE
+    entry = entity_registry.async_get(entity_id)
+    assert entry
+    assert entry.config_entry_id == mock_config_entry.entry_id
+
+
+async def test_state_is_cached(
+    hass: HomeAssistant,
+    mock_config_entry: MockConfigEntry,
+    mock_lamarzocco: MagicMock,
+    hass_storage: dict[str, Any],
+    freezer: FrozenDateTimeFactory,
+) -> None:
+    """Test the last known state is stored, including pushed changes."""
+    await async_init_integration(hass, mock_config_entry)
+
+    # turned off at the machine, reported by the WebSocket
+    mock_lamarzocco.config.turned_on = False
+    mock_config_entry.runtime_data.config_coordinator.async_set_updated_data(None)
+
+    freezer.tick(timedelta(seconds=SAVE_DELAY))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+
+    cached_state = hass_storage[f"{DOMAIN}.{mock_config_entry.entry_id}"]["data"]
+    assert cached_state["config"]["turned_on"] is False
+    assert (
+        cached_state["firmware"][FirmwareType.GATEWAY]["latest_version"] == "v3.5-rc3"
+    )
+    assert cached_state["statistics"]["total_flushes"] == (
+        mock_lamarzocco.statistics.total_flushes
+    )
+
+    await hass.config_entries.async_remove(mock_config_entry.entry_id)
+    await hass.async_block_till_done()
+    assert f"{DOMAIN}.{mock_config_entry.entry_id}" not in hass_storage
+
+
+async def test_setup_from_cache(
+    hass: HomeAssistant,
+    mock_config_entry: MockConfigEntry,
+    mock_lamarzocco: MagicMock,
+    hass_storage: dict[str, Any],
+    freezer: FrozenDateTimeFactory,
+) -> None:
+    """Test the integration starts from the last known state if the cloud is down."""
+    await async_init_integration(hass, mock_config_entry)
+    freezer.tick(timedelta(seconds=SAVE_DELAY))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+    await hass.config_entries.async_unload(mock_config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    config = mock_lamarzocco.config
+    mock_lamarzocco.get_config.reset_mock()
+    mock_lamarzocco.get_config.side_effect = RequestNotSuccessful("")
+    mock_lamarzocco.get_firmware.side_effect = RequestNotSuccessful("")
+    mock_lamarzocco.get_statistics.side_effect = RequestNotSuccessful("")
+    mock_lamarzocco.statistics.total_flushes = 0
+    mock_lamarzocco.firmware = {}
+
+    await hass.config_entries.async_setup(mock_config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    assert mock_config_entry.state is ConfigEntryState.LOADED
+    assert mock_lamarzocco.config is not config
+    assert mock_lamarzocco.config == config
+    assert mock_lamarzocco.statistics.total_flushes == 1740
+    assert mock_lamarzocco.firmware[FirmwareType.MACHINE].latest_version == "1.55"
+    mock_lamarzocco.get_config.assert_called_once()
+
+    # the cached data is kept while the cloud is down
+    state = hass.states.get(f"switch.{mock_lamarzocco.serial_number}")
+    assert state
+    assert state.state != STATE_UNAVAILABLE
+
+
+async def test_old_cache_is_dropped(
+    hass: HomeAssistant,
+    mock_config_entry: MockConfigEntry,
+    mock_lamarzocco: MagicMock,
+    hass_storage: dict[str, Any],
+) -> None:
+    """Test a cache holding the raw config of the API is not restored."""
+    hass_storage[f"{DOMAIN}.{mock_config_entry.entry_id}"] = {
+        "version": 1,
+        "minor_version": 1,
+        "key": f"{DOMAIN}.{mock_config_entry.entry_id}",
+        "data": {"config": {"machineMode": "BrewingMode"}, "saved_at": time()},
+    }
+    mock_lamarzocco.get_config.side_effect = RequestNotSuccessful("")
+
+    await async_init_integration(hass, mock_config_entry)
+
+    assert mock_config_entry.state is ConfigEntryState.SETUP_RETRY
+
+
+def test_transports_imported_when_used() -> None:
+    """Test importing the integration doesn't load the Bluetooth and local API stacks.
+
+    pylamarzocco 1.4 imports all its clients in the __init__ of its package, so
+    the package is loaded without it to see what the integration imports.
+    """
+    code = """
+import importlib.util, sys, types
+spec = importlib.util.find_spec("pylamarzocco")
+package = types.ModuleType("pylamarzocco")
+package.__path__ = list(spec.submodule_search_locations)
+sys.modules["pylamarzocco"] = package
+import homeassistant.components.lamarzocco
+print(" ".join(sorted(sys.modules)))
+"""
+    modules = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, check=True, text=True
+    ).stdout.split()
+
+    assert "homeassistant.components.lamarzocco" in modules
+    for module in (
+        "bleak",
+        "pylamarzocco.clients.bluetooth",
+        "pylamarzocco.clients.local",
+        "pylamarzocco.devices.machine",
+    ):
+        assert module not in modules
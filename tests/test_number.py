@@ -1,8 +1,9 @@
 """Tests for the La Marzocco number entities."""
 
+import asyncio
 from datetime import timedelta
 from typing import Any
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 from freezegun.api import FrozenDateTimeFactory
 from pylamarzocco.const import (
@@ -32,6 +33,13 @@ from . import async_init_integration
 from tests.common import MockConfigEntry, async_fire_time_changed
 
 
+@pytest.fixture(autouse=True)
+def no_debounce():
+    """Send number values without waiting for them to settle."""
+    with patch("homeassistant.components.lamarzocco.number.DEBOUNCE_DELAY", 0):
+        yield
+
+
 @pytest.mark.parametrize(
     ("entity_name", "value", "func_name", "kwargs"),
     [
@@ -359,6 +367,44 @@ async def test_pre_brew_infusion_key_numbers(
         func.assert_called_with(**kwargs)
 
 
+@pytest.mark.parametrize("device_fixture", [MachineModel.GS3_AV])
+@pytest.mark.usefixtures("entity_registry_enabled_by_default")
+async def test_pre_brew_key_numbers_batched(
+    hass: HomeAssistant,
+    mock_lamarzocco: MagicMock,
+    mock_config_entry: MockConfigEntry,
+) -> None:
+    """Test prebrew on and off times of a key are sent in one request."""
+
+    mock_lamarzocco.config.prebrew_mode = PrebrewMode.PREBREW
+    await async_init_integration(hass, mock_config_entry)
+
+    serial_number = mock_lamarzocco.serial_number
+
+    with patch("homeassistant.components.lamarzocco.number.DEBOUNCE_DELAY", 0.01):
+        await asyncio.gather(
+            *(
+                hass.services.async_call(
+                    NUMBER_DOMAIN,
+                    SERVICE_SET_VALUE,
+                    {
+                        ATTR_ENTITY_ID: f"number.{serial_number}_{entity_name}_key_1",
+                        ATTR_VALUE: value,
+                    },
+                    blocking=True,
+                )
+                for entity_name, value in (
+                    ("prebrew_on_time", 2),
+                    ("prebrew_off_time", 3),
+                )
+            )
+        )
+
+    mock_lamarzocco.set_prebrew_time.assert_called_once_with(
+        prebrew_on_time=2.0, prebrew_off_time=3.0, key=PhysicalKey.A
+    )
+
+
 @pytest.mark.parametrize("device_fixture", [MachineModel.GS3_AV])
 async def test_disabled_entites(
     hass: HomeAssistant,
@@ -0,0 +1,130 @@
+"""Tests for the La Marzocco schedule index."""
+
+from datetime import datetime
+
+from pylamarzocco.const import WeekDay
+from pylamarzocco.models import LaMarzoccoWakeUpSleepEntry
+import pytest
+
+from homeassistant.components.lamarzocco.schedule import (
+    ScheduleIndex,
+    ScheduleWindow,
+    WeeklySchedule,
+)
+from homeassistant.util import dt as dt_util
+
+WORKDAYS = [
+    WeekDay.MONDAY,
+    WeekDay.TUESDAY,
+    WeekDay.WEDNESDAY,
+    WeekDay.THURSDAY,
+    WeekDay.FRIDAY,
+]
+
+
+def _windows(
+    serial_number: str,
+    schedule_id: str,
+    days: list[WeekDay],
+    time_on: str,
+    time_off: str,
+) -> list[ScheduleWindow]:
+    """Return the windows of a schedule."""
+    entry = LaMarzoccoWakeUpSleepEntry(
+        enabled=True,
+        days=days,
+        entry_id=schedule_id,
+        steam=True,
+        time_on=time_on,
+        time_off=time_off,
+    )
+    return WeeklySchedule.from_entry(entry).windows(
+        serial_number, f"Machine {serial_number}", schedule_id
+    )
+
+
+@pytest.fixture
+def index() -> ScheduleIndex:
+    """Return the index of the schedules of a few machines."""
+    return ScheduleIndex(
+        [
+            *_windows("GS01", "bar", WORKDAYS, "07:00", "09:00"),
+            *_windows("GS01", "night", [WeekDay.MONDAY], "00:00", "00:30"),
+            *_windows("GS02", "morning", [WeekDay.TUESDAY], "08:30", "10:00"),
+            *_windows("GS02", "late", [WeekDay.TUESDAY], "09:30", "11:00"),
+            *_windows("GS03", "overnight", [WeekDay.SUNDAY], "23:00", "01:00"),
+        ]
+    )
+
+
+def _local(*args: int) -> datetime:
+    """Return a time in the default time zone."""
+    return datetime(*args, tzinfo=dt_util.get_default_time_zone())
+
+
+def test_windows() -> None:
+    """Test schedules are compiled to windows in minutes of the week."""
+    assert [
+        (window.start, window.end)
+        for window in _windows("GS01", "id", [WeekDay.SUNDAY], "23:00", "01:00")
+    ] == [(10020, 10140)]
+    assert _windows("GS01", "id", [WeekDay.SUNDAY], "07:00", "07:00") == []
+
+
+@pytest.mark.parametrize(
+    ("moment", "schedule_ids"),
+    [
+        # Tuesday
+        (_local(2024, 2, 13, 8, 45), {"bar", "morning"}),
+        (_local(2024, 2, 13, 9, 0), {"morning"}),
+        (_local(2024, 2, 13, 9, 45), {"morning", "late"}),
+        # the overnight window of Sunday runs into Monday
+        (_local(2024, 2, 12, 0, 15), {"night", "overnight"}),
+        (_local(2024, 2, 18, 23, 30), {"overnight"}),
+        (_local(2024, 2, 17, 12, 0), set()),
+    ],
+)
+def test_at(index: ScheduleIndex, moment: datetime, schedule_ids: set[str]) -> None:
+    """Test the windows that are on at a point in time."""
+    assert {window.schedule_id for window in index.at(moment)} == schedule_ids
+
+
+def test_intervals(index: ScheduleIndex) -> None:
+    """Test the windows that are on during a range."""
+    intervals = index.intervals(_local(2024, 2, 12, 0, 0), _local(2024, 2, 13, 9, 0))
+
+    assert [(start, end, window.schedule_id) for start, end, window in intervals] == [
+        (_local(2024, 2, 11, 23, 0), _local(2024, 2, 12, 1, 0), "overnight"),
+        (_local(2024, 2, 12, 0, 0), _local(2024, 2, 12, 0, 30), "night"),
+        (_local(2024, 2, 12, 7, 0), _local(2024, 2, 12, 9, 0), "bar"),
+        (_local(2024, 2, 13, 7, 0), _local(2024, 2, 13, 9, 0), "bar"),
+        (_local(2024, 2, 13, 8, 30), _local(2024, 2, 13, 10, 0), "morning"),
+    ]
+
+
+def test_overlaps_and_conflicts(index: ScheduleIndex) -> None:
+    """Test windows of other machines overlap and of the same machine conflict."""
+    overlaps = {
+        window.schedule_id: {other.schedule_id for other in others}
+        for window, others in index.overlaps.items()
+    }
+    conflicts = {
+        window.schedule_id: {other.schedule_id for other in others}
+        for window, others in index.conflicts.items()
+    }
+
+    assert overlaps == {
+        "bar": {"morning"},
+        "morning": {"bar"},
+        "night": {"overnight"},
+        "overnight": {"night"},
+    }
+    assert conflicts == {"morning": {"late"}, "late": {"morning"}}
+
+
+def test_empty_index() -> None:
+    """Test an index without windows."""
+    index = ScheduleIndex([])
+
+    assert index.at(_local(2024, 2, 12, 8, 0)) == []
+    assert index.intervals(_local(2024, 2, 12), _local(2024, 2, 19)) == []
@@ -1,14 +1,17 @@
 """Tests for La Marzocco sensors."""
 
 from datetime import timedelta
+from time import time
 from unittest.mock import MagicMock, patch
 
 from freezegun.api import FrozenDateTimeFactory
-from pylamarzocco.const import MachineModel
+from pylamarzocco.const import BoilerType, MachineModel
+from pylamarzocco.exceptions import RequestNotSuccessful
 from pylamarzocco.models import LaMarzoccoScale
 import pytest
 from syrupy import SnapshotAssertion
 
+from homeassistant.components.lamarzocco.const import CONF_MAX_FAILED_UPDATES
 from homeassistant.const import STATE_UNAVAILABLE, Platform
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers import entity_registry as er
@@ -18,6 +21,7 @@ from . import async_init_integration
 from tests.common import MockConfigEntry, async_fire_time_changed, snapshot_platform
 
 
+@pytest.mark.freeze_time("2024-01-01 12:00:00+00:00")
 @pytest.mark.usefixtures("entity_registry_enabled_by_default")
 async def test_sensors(
     hass: HomeAssistant,
@@ -136,3 +140,133 @@ async def test_battery_on_new_scale_added(
 
     state = hass.states.get("sensor.scale_123a45_battery")
     assert state
+
+
+async def test_unchanged_state_not_written(
+    hass: HomeAssistant,
+    mock_lamarzocco: MagicMock,
+    mock_config_entry: MockConfigEntry,
+    freezer: FrozenDateTimeFactory,
+) -> None:
+    """Test the state is only written when it changed."""
+    await async_init_integration(hass, mock_config_entry)
+    entity_id = f"sensor.{mock_lamarzocco.serial_number}_current_coffee_temperature"
+    state = hass.states.get(entity_id)
+    assert state
+
+    coordinator = mock_config_entry.runtime_data.config_coordinator
+    freezer.tick(timedelta(seconds=1))
+    coordinator.async_set_updated_data(None)
+    await hass.async_block_till_done()
+
+    assert hass.states.get(entity_id).last_reported == state.last_reported
+
+    mock_lamarzocco.config.boilers[BoilerType.COFFEE].current_temperature = 90
+    coordinator.async_set_updated_data(None)
+    await hass.async_block_till_done()
+
+    assert hass.states.get(entity_id).state == "90"
+
+
+@pytest.mark.usefixtures("entity_registry_enabled_by_default")
+async def test_last_update_sensor_stays_available(
+    hass: HomeAssistant,
+    mock_lamarzocco: MagicMock,
+    mock_config_entry: MockConfigEntry,
+    freezer: FrozenDateTimeFactory,
+) -> None:
+    """Test the last update sensor shows the age of outdated data."""
+    await async_init_integration(hass, mock_config_entry)
+    entity_id = f"sensor.{mock_lamarzocco.serial_number}_last_config_update"
+    last_update = hass.states.get(entity_id).state
+
+    mock_lamarzocco.get_config.side_effect = RequestNotSuccessful("")
+    for _ in range(3):
+        freezer.tick(timedelta(minutes=30))
+        async_fire_time_changed(hass)
+        await hass.async_block_till_done()
+
+    assert (
+        hass.states.get(f"sensor.{mock_lamarzocco.serial_number}_shot_timer").state
+        == STATE_UNAVAILABLE
+    )
+    assert hass.states.get(entity_id).state == last_update
+
+
+@pytest.mark.freeze_time("2024-01-01 12:00:00+00:00")
+@pytest.mark.usefixtures("entity_registry_enabled_by_default")
+async def test_last_update_sensor_follows_websocket(
+    hass: HomeAssistant,
+    mock_lamarzocco: MagicMock,
+    mock_config_entry: MockConfigEntry,
+    freezer: FrozenDateTimeFactory,
+) -> None:
+    """Test skipped polls only move the last update to the last WebSocket message."""
+    await async_init_integration(hass, mock_config_entry)
+    entity_id = f"sensor.{mock_lamarzocco.serial_number}_last_config_update"
+
+    mock_lamarzocco.websocket_connected = True
+    mock_lamarzocco.timestamp_last_websocket_msg = time()
+    freezer.tick(timedelta(seconds=31))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+
+    assert len(mock_lamarzocco.get_config.mock_calls) == 1
+    assert hass.states.get(entity_id).state == "2024-01-01T12:00:00+00:00"
+
+    # a keep alive confirms the pushed state
+    mock_lamarzocco.timestamp_last_websocket_msg = time()
+    freezer.tick(timedelta(seconds=31))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+
+    assert hass.states.get(entity_id).state == "2024-01-01T12:00:31+00:00"
+
+
+@pytest.mark.freeze_time("2024-01-01 12:00:00+00:00")
+@pytest.mark.usefixtures("entity_registry_enabled_by_default")
+async def test_last_update_sensor_ignores_pushes(
+    hass: HomeAssistant,
+    mock_lamarzocco: MagicMock,
+    mock_config_entry: MockConfigEntry,
+    freezer: FrozenDateTimeFactory,
+) -> None:
+    """Test updates pushed by the WebSocket leave the last update unchanged."""
+    with patch(
+        "homeassistant.components.lamarzocco.local_client.LaMarzoccoRoutedLocalClient",
+        autospec=True,
+    ) as local_client:
+        local_client.return_value.websocket = None
+        await async_init_integration(hass, mock_config_entry)
+    entity_id = f"sensor.{mock_lamarzocco.serial_number}_last_config_update"
+
+    freezer.tick(timedelta(seconds=10))
+    mock_lamarzocco.config.turned_on = not mock_lamarzocco.config.turned_on
+    mock_lamarzocco.websocket_connect.call_args.kwargs["notify_callback"]()
+    await hass.async_block_till_done()
+
+    assert hass.states.get(entity_id).state == "2024-01-01T12:00:00+00:00"
+
+
+async def test_max_failed_updates(
+    hass: HomeAssistant,
+    mock_lamarzocco: MagicMock,
+    mock_config_entry: MockConfigEntry,
+    freezer: FrozenDateTimeFactory,
+) -> None:
+    """Test the last data is dropped after the configured number of failures."""
+    mock_config_entry.add_to_hass(hass)
+    hass.config_entries.async_update_entry(
+        mock_config_entry, options={CONF_MAX_FAILED_UPDATES: 1}
+    )
+    await hass.config_entries.async_setup(mock_config_entry.entry_id)
+    await hass.async_block_till_done()
+    entity_id = f"switch.{mock_lamarzocco.serial_number}"
+    assert hass.states.get(entity_id).state != STATE_UNAVAILABLE
+
+    mock_lamarzocco.get_config.side_effect = RequestNotSuccessful("")
+    freezer.tick(timedelta(seconds=31))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+
+    assert hass.states.get(entity_id).state == STATE_UNAVAILABLE
@@ -0,0 +1,397 @@
+"""Tests for the La Marzocco services."""
+
+from dataclasses import replace
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from pylamarzocco.const import PhysicalKey, WeekDay
+from pylamarzocco.exceptions import RequestNotSuccessful
+import pytest
+
+from homeassistant.components.lamarzocco.const import DOMAIN
+from homeassistant.components.lamarzocco.services import (
+    SERVICE_GET_SCHEDULED_MACHINES,
+    SERVICE_GET_SHOT_HISTORY,
+    SERVICE_GET_SHOTS,
+    SERVICE_SET_AUTO_ON_OFF_SCHEDULES,
+)
+from homeassistant.components.lamarzocco.shots import Shot
+from homeassistant.const import ATTR_AREA_ID, ATTR_DEVICE_ID, ATTR_ENTITY_ID
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError, ServiceValidationError
+from homeassistant.helpers import area_registry as ar, device_registry as dr
+from homeassistant.util import dt as dt_util
+
+from . import WAKE_UP_SLEEP_ENTRY_IDS, async_init_integration
+
+from tests.common import MockConfigEntry
+
+WORKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday"]
+
+
+async def _async_set_schedules(
+    hass: HomeAssistant, device_id: str, schedules: list[dict[str, object]]
+) -> dict[str, object]:
+    """Call the service setting the auto on/off schedules."""
+    return await hass.services.async_call(
+        DOMAIN,
+        SERVICE_SET_AUTO_ON_OFF_SCHEDULES,
+        {ATTR_DEVICE_ID: device_id, "schedules": schedules},
+        blocking=True,
+        return_response=True,
+    )
+
+
+def _device_id(hass: HomeAssistant, serial_number: str) -> str:
+    """Return the device id of a machine."""
+    device = dr.async_get(hass).async_get_device(identifiers={(DOMAIN, serial_number)})
+    assert device
+    return device.id
+
+
+async def test_set_schedules_unchanged(
+    hass: HomeAssistant,
+    mock_lamarzocco: MagicMock,
+    mock_config_entry: MockConfigEntry,
+) -> None:
+    """Test no requests are sent if the machine already has the schedules."""
+    await async_init_integration(hass, mock_config_entry)
+
+    response = await _async_set_schedules(
+        hass,
+        _device_id(hass, mock_lamarzocco.serial_number),
+        [
+            {"days": ["sunday"], "time_on": "07:00", "time_off": "07:30"},
+            {"days": list(WeekDay), "time_on": "22:00", "time_off": "00:00"},
+        ],
+    )
+
+    assert response == {"changed": {mock_lamarzocco.serial_number: []}}
+    mock_lamarzocco.set_wake_up_sleep.assert_not_called()
+
+
+async def test_set_schedules(
+    hass: HomeAssistant,
+    mock_lamarzocco: MagicMock,
+    mock_config_entry: MockConfigEntry,
+) -> None:
+    """Test only the schedules that differ are sent."""
+    await async_init_integration(hass, mock_config_entry)
+    entries = mock_lamarzocco.config.wake_up_sleep_entries
+
+    response = await _async_set_schedules(
+        hass,
+        _device_id(hass, mock_lamarzocco.serial_number),
+        [
+            {"days": ["sunday"], "time_on": "07:00", "time_off": "07:30"},
+            {"days": WORKDAYS, "time_on": "06:30", "time_off": "18:00"},
+        ],
+    )
+
+    # the Sunday schedule is kept, the daily one is changed
+    assert response == {
+        "changed": {mock_lamarzocco.serial_number: [WAKE_UP_SLEEP_ENTRY_IDS[0]]}
+    }
+    mock_lamarzocco.set_wake_up_sleep.assert_called_once_with(
+        replace(
+            entries[WAKE_UP_SLEEP_ENTRY_IDS[0]],
+            days=[WeekDay(day) for day in WORKDAYS],
+            time_on="06:30",
+            time_off="18:00",
+        )
+    )
+
+    mock_lamarzocco.set_wake_up_sleep.reset_mock()
+    response = await _async_set_schedules(
+        hass, _device_id(hass, mock_lamarzocco.serial_number), []
+    )
+
+    # schedules that are not needed anymore are disabled
+    assert response == {
+        "changed": {mock_lamarzocco.serial_number: WAKE_UP_SLEEP_ENTRY_IDS}
+    }
+    assert mock_lamarzocco.set_wake_up_sleep.call_count == 2
+    assert not any(
+        call.args[0].enabled
+        for call in mock_lamarzocco.set_wake_up_sleep.call_args_list
+    )
+
+
+@pytest.mark.parametrize(
+    ("schedules", "translation_key"),
+    [
+        (
+            [{"days": WORKDAYS, "time_on": "07:00", "time_off": "06:00"}],
+            "invalid_schedule_times",
+        ),
+        (
+            [
+                {"days": ["monday"], "time_on": "07:00", "time_off": "08:00"},
+                {"days": ["tuesday"], "time_on": "07:00", "time_off": "08:00"},
+                {"days": ["wednesday"], "time_on": "07:00", "time_off": "08:00"},
+            ],
+            "too_many_schedules",
+        ),
+    ],
+)
+async def test_set_schedules_invalid(
+    hass: HomeAssistant,
+    mock_lamarzocco: MagicMock,
+    mock_config_entry: MockConfigEntry,
+    schedules: list[dict[str, object]],
+    translation_key: str,
+) -> None:
+    """Test invalid schedules are rejected before anything is sent."""
+    await async_init_integration(hass, mock_config_entry)
+
+    with pytest.raises(ServiceValidationError) as exc_info:
+        await _async_set_schedules(
+            hass, _device_id(hass, mock_lamarzocco.serial_number), schedules
+        )
+    assert exc_info.value.translation_key == translation_key
+    mock_lamarzocco.set_wake_up_sleep.assert_not_called()
+
+
+async def test_set_schedules_invalid_device(
+    hass: HomeAssistant,
+    mock_lamarzocco: MagicMock,
+    mock_config_entry: MockConfigEntry,
+) -> None:
+    """Test a device that is not a machine is rejected."""
+    await async_init_integration(hass, mock_config_entry)
+
+    with pytest.raises(ServiceValidationError) as exc_info:
+        await _async_set_schedules(hass, "not_a_device", [])
+    assert exc_info.value.translation_key == "invalid_machine"
+
+
+async def test_machines_targeted_by_area_and_entity(
+    hass: HomeAssistant,
+    mock_lamarzocco: MagicMock,
+    mock_config_entry: MockConfigEntry,
+) -> None:
+    """Test machines can be targeted by their areas and their entities."""
+    await async_init_integration(hass, mock_config_entry)
+    area = ar.async_get(hass).async_create("Kitchen")
+    dr.async_get(hass).async_update_device(
+        _device_id(hass, mock_lamarzocco.serial_number), area_id=area.id
+    )
+
+    for target in (
+        {ATTR_AREA_ID: area.id},
+        {ATTR_ENTITY_ID: f"switch.{mock_lamarzocco.serial_number}"},
+    ):
+        response = await hass.services.async_call(
+            DOMAIN, SERVICE_GET_SHOTS, target, blocking=True, return_response=True
+        )
+        assert response == {"shots": {mock_lamarzocco.serial_number: []}}
+
+
+@pytest.mark.parametrize(
+    ("target", "translation_key"),
+    [
+        ({ATTR_ENTITY_ID: "sun.sun"}, "invalid_machine_entity"),
+        ({ATTR_AREA_ID: "bedroom"}, "no_machine_targeted"),
+        ({}, "no_machine_targeted"),
+    ],
+)
+async def test_invalid_targets(
+    hass: HomeAssistant,
+    mock_lamarzocco: MagicMock,
+    mock_config_entry: MockConfigEntry,
+    target: dict[str, str],
+    translation_key: str,
+) -> None:
+    """Test targets without a machine are rejected."""
+    await async_init_integration(hass, mock_config_entry)
+
+    with pytest.raises(ServiceValidationError) as exc_info:
+        await hass.services.async_call(
+            DOMAIN, SERVICE_GET_SHOTS, target, blocking=True, return_response=True
+        )
+    assert exc_info.value.translation_key == translation_key
+
+
+async def test_set_schedules_error(
+    hass: HomeAssistant,
+    mock_lamarzocco: MagicMock,
+    mock_config_entry: MockConfigEntry,
+) -> None:
+    """Test a failed request is raised."""
+    await async_init_integration(hass, mock_config_entry)
+    mock_lamarzocco.set_wake_up_sleep.side_effect = RequestNotSuccessful("Boom")
+
+    with pytest.raises(HomeAssistantError) as exc_info:
+        await _async_set_schedules(
+            hass, _device_id(hass, mock_lamarzocco.serial_number), []
+        )
+    assert exc_info.value.translation_key == "auto_on_off_schedule_error"
+
+
+@pytest.mark.parametrize(
+    ("hour", "schedules"),
+    [(7, [WAKE_UP_SLEEP_ENTRY_IDS[1]]), (12, []), (23, [WAKE_UP_SLEEP_ENTRY_IDS[0]])],
+)
+async def test_get_scheduled_machines(
+    hass: HomeAssistant,
+    mock_lamarzocco: MagicMock,
+    mock_config_entry: MockConfigEntry,
+    hour: int,
+    schedules: list[str],
+) -> None:
+    """Test the machines turned on by their schedules at a time are returned."""
+    await async_init_integration(hass, mock_config_entry)
+
+    # a Sunday
+    moment = datetime(2024, 2, 11, hour, 15, tzinfo=dt_util.get_default_time_zone())
+    response = await hass.services.async_call(
+        DOMAIN,
+        SERVICE_GET_SCHEDULED_MACHINES,
+        {ATTR_DEVICE_ID: _device_id(hass, mock_lamarzocco.serial_number), "at": moment},
+        blocking=True,
+        return_response=True,
+    )
+
+    assert response == {
+        "machines": {
+            mock_lamarzocco.serial_number: {
+                "on": bool(schedules),
+                "schedules": schedules,
+            }
+        }
+    }
+
+
+async def test_get_shots(
+    hass: HomeAssistant,
+    mock_lamarzocco: MagicMock,
+    mock_config_entry: MockConfigEntry,
+) -> None:
+    """Test the recorded shots are returned."""
+    await async_init_integration(hass, mock_config_entry)
+
+    response = await hass.services.async_call(
+        DOMAIN,
+        SERVICE_GET_SHOTS,
+        {ATTR_DEVICE_ID: _device_id(hass, mock_lamarzocco.serial_number)},
+        blocking=True,
+        return_response=True,
+    )
+
+    assert response == {"shots": {mock_lamarzocco.serial_number: []}}
+
+
+async def test_get_shots_not_recorded(
+    hass: HomeAssistant,
+    mock_lamarzocco: MagicMock,
+    mock_config_entry_no_local_connection: MockConfigEntry,
+) -> None:
+    """Test shots are not recorded without a local connection."""
+    await async_init_integration(hass, mock_config_entry_no_local_connection)
+
+    with pytest.raises(ServiceValidationError) as exc_info:
+        await hass.services.async_call(
+            DOMAIN,
+            SERVICE_GET_SHOTS,
+            {ATTR_DEVICE_ID: _device_id(hass, mock_lamarzocco.serial_number)},
+            blocking=True,
+            return_response=True,
+        )
+    assert exc_info.value.translation_key == "shots_not_recorded"
+
+
+async def test_get_shot_history(
+    hass: HomeAssistant,
+    mock_lamarzocco: MagicMock,
+    mock_config_entry: MockConfigEntry,
+    tmp_path: Path,
+) -> None:
+    """Test the saved shots are returned page by page."""
+    hass.config.config_dir = str(tmp_path)
+    await async_init_integration(hass, mock_config_entry)
+    start = datetime(2024, 1, 1, tzinfo=UTC)
+    shot_log = mock_config_entry.runtime_data.shot_log
+    assert shot_log
+    await shot_log.async_append(
+        [
+            Shot(
+                start=(start + timedelta(hours=hours)).timestamp(),
+                end=(start + timedelta(hours=hours, seconds=30)).timestamp(),
+                duration=28.0,
+                key=PhysicalKey.A if hours % 2 else PhysicalKey.B,
+                coffee_temperature=93.0,
+                coffee_temperature_min=92.0,
+                coffee_temperature_max=94.0,
+                steam_temperature=None,
+            )
+            for hours in range(10)
+        ]
+    )
+    serial_number = mock_lamarzocco.serial_number
+
+    async def get_shot_history(**data: object) -> dict[str, object]:
+        return await hass.services.async_call(
+            DOMAIN,
+            SERVICE_GET_SHOT_HISTORY,
+            {ATTR_DEVICE_ID: _device_id(hass, serial_number), **data},
+            blocking=True,
+            return_response=True,
+        )
+
+    response = await get_shot_history(
+        start="2024-01-01T02:00:00+00:00", key="a", limit=2
+    )
+    assert [shot["start"] for shot in response["shots"][serial_number]] == [
+        "2024-01-01T03:00:00+00:00",
+        "2024-01-01T05:00:00+00:00",
+    ]
+    assert response["next_start"] == {serial_number: "2024-01-01T07:00:00+00:00"}
+
+    response = await get_shot_history(
+        start=response["next_start"][serial_number], key="a", limit=2
+    )
+    assert [shot["start"] for shot in response["shots"][serial_number]] == [
+        "2024-01-01T07:00:00+00:00",
+        "2024-01-01T09:00:00+00:00",
+    ]
+    assert response["next_start"] == {}
+
+    response = await get_shot_history(end="2024-01-01T01:00:00+00:00")
+    assert response == {
+        "shots": {
+            serial_number: [
+                {
+                    "start": "2024-01-01T00:00:00+00:00",
+                    "end": "2024-01-01T00:00:30+00:00",
+                    "duration": 28.0,
+                    "key": "b",
+                    "coffee_temperature": 93.0,
+                    "coffee_temperature_min": 92.0,
+                    "coffee_temperature_max": 94.0,
+                    "steam_temperature": None,
+                    "coffee_temperature_trace": [],
+                }
+            ]
+        },
+        "next_start": {},
+    }
+
+
+async def test_get_shot_history_not_recorded(
+    hass: HomeAssistant,
+    mock_lamarzocco: MagicMock,
+    mock_config_entry_no_local_connection: MockConfigEntry,
+) -> None:
+    """Test shots are not saved without a local connection."""
+    await async_init_integration(hass, mock_config_entry_no_local_connection)
+
+    with pytest.raises(ServiceValidationError) as exc_info:
+        await hass.services.async_call(
+            DOMAIN,
+            SERVICE_GET_SHOT_HISTORY,
+            {ATTR_DEVICE_ID: _device_id(hass, mock_lamarzocco.serial_number)},
+            blocking=True,
+            return_response=True,
+        )
+    assert exc_info.value.translation_key == "shots_not_recorded"
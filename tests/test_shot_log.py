@@ -0,0 +1,187 @@
+"""Tests for the La Marzocco shot log."""
+
+from dataclasses import replace
+from datetime import UTC, datetime, timedelta
+import math
+from pathlib import Path
+from unittest.mock import patch
+
+from pylamarzocco.const import PhysicalKey
+import pytest
+
+from homeassistant.components.lamarzocco.shot_log import (
+    HEADER,
+    RECORD,
+    RETENTION,
+    LaMarzoccoShotLog,
+    ShotLogFile,
+)
+from homeassistant.components.lamarzocco.shots import Shot
+from homeassistant.core import HomeAssistant
+
+START = datetime(2024, 1, 1, tzinfo=UTC)
+
+
+def _shot(hours: int, key: PhysicalKey | None = None) -> Shot:
+    """Return a shot started some hours after the start."""
+    start = (START + timedelta(hours=hours)).timestamp()
+    return Shot(
+        start=start,
+        end=start + 28.5,
+        duration=27.5,
+        key=key,
+        coffee_temperature=93.5,
+        coffee_temperature_min=91.25,
+        coffee_temperature_max=94.0,
+        steam_temperature=None if key is None else 123.8,
+        coffee_temperature_trace=(93.5, 91.25, 92.0),
+    )
+
+
+def test_append_and_load(tmp_path: Path) -> None:
+    """Test shots are appended and read back."""
+    path = tmp_path / "shots"
+    shots = [_shot(hours, PhysicalKey.B if hours % 2 else None) for hours in range(5)]
+    log = ShotLogFile(path)
+    log.load()
+    log.append(shots[:2])
+    log.append(shots[2:])
+
+    assert path.stat().st_size == HEADER.size + 5 * RECORD.size
+    loaded = ShotLogFile(path)
+    loaded.load()
+    assert len(loaded) == 5
+    assert loaded.read(0, 5) == shots
+    assert loaded.read(loaded.bisect(shots[3].start), 5) == shots[3:]
+
+
+def test_values_out_of_range(tmp_path: Path, caplog: pytest.LogCaptureFixture) -> None:
+    """Test trace temperatures are clamped and shots that don't fit skipped."""
+    path = tmp_path / "shots"
+    clamped = replace(_shot(0), coffee_temperature_trace=(-1.0, 700.0, math.nan))
+    too_hot = replace(_shot(1), coffee_temperature=1e39)
+    log = ShotLogFile(path)
+    log.append([clamped, too_hot, _shot(2)])
+
+    assert "Could not save the shot" in caplog.text
+    loaded = ShotLogFile(path)
+    loaded.load()
+    assert loaded.read(0, len(loaded)) == [
+        replace(clamped, coffee_temperature_trace=(0.0, 655.35, 0.0)),
+        _shot(2),
+    ]
+    assert log.starts == loaded.starts
+
+
+def test_torn_record(tmp_path: Path) -> None:
+    """Test a record written in part is dropped."""
+    path = tmp_path / "shots"
+    ShotLogFile(path).append([_shot(0), _shot(1)])
+    with path.open("ab") as file:
+        file.write(RECORD.pack(*[0] * 25)[:10])
+
+    log = ShotLogFile(path)
+    log.load()
+    log.append([_shot(2)])
+
+    assert log.read(0, len(log)) == [_shot(0), _shot(1), _shot(2)]
+
+
+def test_invalid_file(tmp_path: Path) -> None:
+    """Test a file of another format is moved aside."""
+    path = tmp_path / "shots"
+    path.write_bytes(b"not a shot log")
+
+    log = ShotLogFile(path)
+    log.load()
+
+    assert len(log) == 0
+    assert not path.exists()
+    assert path.with_suffix(".invalid").read_bytes() == b"not a shot log"
+
+
+def test_compact(tmp_path: Path) -> None:
+    """Test the first shots are removed by the compaction."""
+    path = tmp_path / "shots"
+    log = ShotLogFile(path)
+    log.append([_shot(hours) for hours in range(10)])
+
+    log.compact(4)
+
+    assert log.read(0, len(log)) == [_shot(hours) for hours in range(4, 10)]
+    assert log.generation == 1
+    loaded = ShotLogFile(path)
+    loaded.load()
+    assert loaded.starts == log.starts
+
+
+@pytest.fixture
+async def shot_log(hass: HomeAssistant, tmp_path: Path) -> LaMarzoccoShotLog:
+    """Return a loaded shot log with a shot every hour for 50 days."""
+    hass.config.config_dir = str(tmp_path)
+    shot_log = LaMarzoccoShotLog(hass, "entry_id")
+    await shot_log.async_load()
+    await shot_log.async_append(
+        [
+            _shot(hours, PhysicalKey.A if hours % 24 else PhysicalKey.B)
+            for hours in range(1200)
+        ]
+    )
+    return shot_log
+
+
+async def test_iter_shots(shot_log: LaMarzoccoShotLog) -> None:
+    """Test the shots of a range are read in batches."""
+    batches = [
+        batch
+        async for batch in shot_log.async_iter_shots(
+            START + timedelta(hours=10), START + timedelta(hours=610)
+        )
+    ]
+
+    assert [len(batch) for batch in batches] == [256, 256, 88]
+    assert [shot for batch in batches for shot in batch] == [
+        _shot(hours, PhysicalKey.A if hours % 24 else PhysicalKey.B)
+        for hours in range(10, 610)
+    ]
+
+
+async def test_iter_shots_of_key(shot_log: LaMarzoccoShotLog) -> None:
+    """Test only the shots of a key are returned."""
+    shots = [
+        shot
+        async for batch in shot_log.async_iter_shots(key=PhysicalKey.B)
+        for shot in batch
+    ]
+
+    assert shots == [_shot(hours, PhysicalKey.B) for hours in range(0, 1200, 24)]
+
+
+async def test_iter_shots_compacted(shot_log: LaMarzoccoShotLog) -> None:
+    """Test a query continues after the shots were compacted."""
+    shots: list[Shot] = []
+    async for batch in shot_log.async_iter_shots(START + timedelta(hours=500)):
+        shots.extend(batch)
+        await shot_log.async_compact(START + RETENTION + timedelta(hours=400))
+
+    assert [shot.start for shot in shots] == [
+        (START + timedelta(hours=hours)).timestamp() for hours in range(500, 1200)
+    ]
+
+
+async def test_compact_expired(shot_log: LaMarzoccoShotLog) -> None:
+    """Test the log is only compacted once enough shots expired."""
+    with patch.object(ShotLogFile, "compact") as compact:
+        await shot_log.async_compact(START + RETENTION + timedelta(hours=100))
+        compact.assert_not_called()
+
+        await shot_log.async_compact(START + RETENTION + timedelta(hours=200))
+        compact.assert_called_once_with(200)
+
+
+async def test_remove(hass: HomeAssistant, shot_log: LaMarzoccoShotLog) -> None:
+    """Test the file is removed."""
+    await shot_log.async_remove()
+
+    assert not Path(hass.config.path(".storage", "lamarzocco.entry_id.shots")).exists()
+    assert [batch async for batch in shot_log.async_iter_shots()] == []
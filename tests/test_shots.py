@@ -0,0 +1,133 @@
+"""Tests for the La Marzocco shot recorder."""
+
+from unittest.mock import MagicMock
+
+from freezegun.api import FrozenDateTimeFactory
+from pylamarzocco.const import BoilerType, PhysicalKey
+import pytest
+
+from homeassistant.components.lamarzocco.shots import (
+    LaMarzoccoShotRecorder,
+    downsample,
+)
+
+
+@pytest.fixture
+def device() -> MagicMock:
+    """Return a machine that is not brewing."""
+    device = MagicMock()
+    device.config.brew_active = False
+    device.config.brew_active_duration = 0
+    device.config.boilers = {
+        BoilerType.COFFEE: MagicMock(current_temperature=93.0),
+        BoilerType.STEAM: MagicMock(current_temperature=123.0),
+    }
+    return device
+
+
+def _brew(
+    recorder: LaMarzoccoShotRecorder,
+    device: MagicMock,
+    freezer: FrozenDateTimeFactory,
+    temperatures: list[float],
+    duration: float,
+) -> None:
+    """Brew a shot, one WebSocket update per second and temperature."""
+    device.config.brew_active = True
+    for temperature in temperatures:
+        device.config.boilers[BoilerType.COFFEE].current_temperature = temperature
+        recorder.async_update()
+        freezer.tick(1)
+    device.config.brew_active = False
+    device.config.brew_active_duration = duration
+    recorder.async_update()
+
+
+@pytest.mark.freeze_time("2024-01-01 12:00:00+00:00")
+def test_record_shot(device: MagicMock, freezer: FrozenDateTimeFactory) -> None:
+    """Test a shot is recorded when the brew stops."""
+    recorder = LaMarzoccoShotRecorder(device)
+    update_callback = MagicMock()
+    recorder.async_add_listener(update_callback)
+
+    recorder.async_update()
+    assert recorder.last_shot is None
+
+    _brew(recorder, device, freezer, [93.0, 91.5, 92.0, 94.0], 27.0)
+
+    update_callback.assert_called_once()
+    shot = recorder.last_shot
+    assert shot
+    assert shot.duration == 27.0
+    assert shot.key is None
+    assert shot.coffee_temperature == 93.0
+    assert shot.coffee_temperature_min == 91.5
+    assert shot.coffee_temperature_max == 94.0
+    assert shot.steam_temperature == 123.0
+    assert shot.as_dict() | {"end": None} == {
+        "start": "2024-01-01T12:00:00+00:00",
+        "end": None,
+        "duration": 27.0,
+        "key": None,
+        "coffee_temperature": 93.0,
+        "coffee_temperature_min": 91.5,
+        "coffee_temperature_max": 94.0,
+        "steam_temperature": 123.0,
+        "coffee_temperature_trace": [93.0, 91.5, 92.0, 94.0, 94.0],
+    }
+
+    # without a new duration from the machine the shot is timed
+    _brew(recorder, device, freezer, [93.0, 93.0], 27.0)
+    assert recorder.last_shot.duration == 2.0
+
+
+def test_ring_buffer(device: MagicMock, freezer: FrozenDateTimeFactory) -> None:
+    """Test only the last shots are kept."""
+    recorder = LaMarzoccoShotRecorder(device, size=3)
+
+    for duration in range(1, 6):
+        _brew(recorder, device, freezer, [93.0], duration)
+
+    assert [shot.duration for shot in recorder.shots] == [3, 4, 5]
+
+
+def test_key_from_statistics(device: MagicMock, freezer: FrozenDateTimeFactory) -> None:
+    """Test the key is added when a single key brewed the recorded shots."""
+    recorder = LaMarzoccoShotRecorder(device)
+    counts = {PhysicalKey.A: 10, PhysicalKey.B: 5}
+    recorder.async_update_key_counts(counts)
+
+    _brew(recorder, device, freezer, [93.0], 25)
+    _brew(recorder, device, freezer, [93.0], 26)
+    settled = recorder.async_update_key_counts(counts | {PhysicalKey.B: 7})
+    assert [shot.key for shot in recorder.shots] == [PhysicalKey.B, PhysicalKey.B]
+    assert settled == list(recorder.shots)
+
+    # two keys brewed the shots, so it is not known which brewed which
+    _brew(recorder, device, freezer, [93.0], 27)
+    _brew(recorder, device, freezer, [93.0], 28)
+    recorder.async_update_key_counts({PhysicalKey.A: 11, PhysicalKey.B: 8})
+    assert recorder.shots[-1].key is None
+    assert recorder.shots[-2].key is None
+
+    # the counts were not updated for a recorded shot
+    assert recorder.async_update_key_counts({PhysicalKey.A: 12, PhysicalKey.B: 8}) == []
+    assert recorder.shots[-1].key is None
+
+
+def test_settle(device: MagicMock, freezer: FrozenDateTimeFactory) -> None:
+    """Test shots are settled once."""
+    recorder = LaMarzoccoShotRecorder(device, size=2)
+
+    for duration in range(1, 4):
+        _brew(recorder, device, freezer, [93.0], duration)
+
+    # only the shots still kept are returned
+    assert [shot.duration for shot in recorder.async_settle()] == [2, 3]
+    assert recorder.async_settle() == []
+
+
+def test_downsample() -> None:
+    """Test temperature traces are downsampled to means of equal parts."""
+    assert downsample([93.0, 92.0]) == (93.0, 92.0)
+    assert downsample([93.0, 92.0, 91.0, 91.5, 92.5, 93.5], 3) == (92.5, 91.25, 93.0)
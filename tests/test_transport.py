@@ -0,0 +1,193 @@
+"""Tests for the La Marzocco transport router."""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from pylamarzocco.clients.bluetooth import LaMarzoccoBluetoothClient
+from pylamarzocco.clients.cloud import LaMarzoccoCloudClient
+from pylamarzocco.clients.local import LaMarzoccoLocalClient
+from pylamarzocco.const import BoilerType, MachineModel
+from pylamarzocco.devices.machine import LaMarzoccoMachine
+from pylamarzocco.exceptions import BluetoothConnectionFailed, RequestNotSuccessful
+from pylamarzocco.models import LaMarzoccoBoiler
+import pytest
+
+from homeassistant.components.lamarzocco.bluetooth_session import (
+    LaMarzoccoRoutedBluetoothClient,
+)
+from homeassistant.components.lamarzocco.local_client import (
+    LaMarzoccoRoutedLocalClient,
+)
+from homeassistant.components.lamarzocco.transport import (
+    MIN_COMMANDS,
+    PROBE_INTERVAL,
+    LaMarzoccoRoutedCloudClient,
+    LaMarzoccoTransportRouter,
+)
+
+SERIAL_NUMBER = "GS012345"
+
+
+@pytest.fixture
+def mock_monotonic():
+    """Return a controllable clock for the router."""
+    with patch(
+        "homeassistant.components.lamarzocco.transport.monotonic",
+        return_value=1000.0,
+    ) as mock_monotonic:
+        yield mock_monotonic
+
+
+def _cloud_client() -> LaMarzoccoRoutedCloudClient:
+    """Return a cloud client of an account."""
+    return LaMarzoccoRoutedCloudClient("username", "password", client=MagicMock())
+
+
+def _bluetooth_client(
+    router: LaMarzoccoTransportRouter,
+) -> LaMarzoccoRoutedBluetoothClient:
+    """Return a Bluetooth client of the machine."""
+    return LaMarzoccoRoutedBluetoothClient(
+        router,
+        username="username",
+        serial_number=SERIAL_NUMBER,
+        token="token",
+        address_or_ble_device="00:00:00:00:00:00",
+    )
+
+
+async def test_commands_are_measured(mock_monotonic) -> None:
+    """Test routed commands are timed per machine and other calls are not."""
+    router = LaMarzoccoTransportRouter()
+    cloud_client = _cloud_client()
+    remove_router = cloud_client.async_add_router(SERIAL_NUMBER, router)
+
+    async def set_power(serial_number: str, enabled: bool) -> bool:
+        mock_monotonic.return_value += 0.8
+        return True
+
+    with (
+        patch.object(LaMarzoccoCloudClient, "set_power", side_effect=set_power),
+        patch.object(
+            LaMarzoccoCloudClient, "get_statistics", AsyncMock(return_value=[])
+        ),
+    ):
+        assert await cloud_client.set_power(serial_number=SERIAL_NUMBER, enabled=True)
+        assert await cloud_client.get_statistics(SERIAL_NUMBER) == []
+        # commands to other machines are recorded by their own router
+        assert await cloud_client.set_power(serial_number="GS054321", enabled=True)
+
+        assert router.as_dict()["control"]["cloud"] == {
+            "commands": 1,
+            "success_rate": 1.0,
+            "latency": pytest.approx(0.8),
+        }
+
+        remove_router()
+        assert await cloud_client.set_power(serial_number=SERIAL_NUMBER, enabled=True)
+        assert router.as_dict()["control"]["cloud"]["commands"] == 1
+
+
+async def test_failing_transport_is_skipped(mock_monotonic) -> None:
+    """Test a failing transport is skipped and probed again later."""
+    router = LaMarzoccoTransportRouter()
+    _cloud_client().async_add_router(SERIAL_NUMBER, router)
+    bluetooth = _bluetooth_client(router)
+
+    with patch.object(
+        LaMarzoccoBluetoothClient,
+        "set_power",
+        AsyncMock(side_effect=BluetoothConnectionFailed),
+    ) as set_power:
+        for _ in range(MIN_COMMANDS):
+            with pytest.raises(BluetoothConnectionFailed):
+                await bluetooth.set_power(enabled=True)
+        assert set_power.await_count == MIN_COMMANDS
+
+        # the library falls back to the cloud without trying Bluetooth
+        with pytest.raises(BluetoothConnectionFailed):
+            await bluetooth.set_power(enabled=True)
+        assert set_power.await_count == MIN_COMMANDS
+
+        # Bluetooth is tried again once the probe interval has passed
+        set_power.side_effect = None
+        mock_monotonic.return_value += PROBE_INTERVAL.total_seconds()
+        await bluetooth.set_power(enabled=True)
+        assert set_power.await_count == MIN_COMMANDS + 1
+
+
+async def test_slower_transport_is_skipped(mock_monotonic) -> None:
+    """Test the local API is skipped while the cloud answers faster."""
+    router = LaMarzoccoTransportRouter()
+    cloud_client = _cloud_client()
+    cloud_client.async_add_router(SERIAL_NUMBER, router)
+    local_client = LaMarzoccoRoutedLocalClient(
+        router, host="192.168.1.42", local_bearer="token", client=MagicMock()
+    )
+
+    def slow(seconds: float) -> AsyncMock:
+        async def get_config(*args: str) -> dict:
+            mock_monotonic.return_value += seconds
+            return {}
+
+        return AsyncMock(side_effect=get_config)
+
+    with (
+        patch.object(LaMarzoccoCloudClient, "get_config", slow(0.5)),
+        patch.object(LaMarzoccoLocalClient, "get_config", slow(2.0)) as get_config,
+    ):
+        await local_client.get_config()
+        await cloud_client.get_config(SERIAL_NUMBER)
+
+        with pytest.raises(RequestNotSuccessful):
+            await local_client.get_config()
+        assert get_config.await_count == 1
+
+
+async def test_machine_falls_back_after_skip(mock_monotonic) -> None:
+    """Test the library sends a command over the cloud when Bluetooth is skipped."""
+    router = LaMarzoccoTransportRouter()
+    cloud_client = _cloud_client()
+    cloud_client.async_add_router(SERIAL_NUMBER, router)
+    machine = LaMarzoccoMachine(
+        model=MachineModel.GS3_AV,
+        serial_number=SERIAL_NUMBER,
+        name="GS3",
+        cloud_client=cloud_client,
+        bluetooth_client=_bluetooth_client(router),
+    )
+    machine.config.boilers = {
+        BoilerType.COFFEE: LaMarzoccoBoiler(
+            enabled=False, current_temperature=93.0, target_temperature=93.0
+        )
+    }
+
+    with (
+        patch.object(
+            LaMarzoccoBluetoothClient,
+            "set_power",
+            AsyncMock(side_effect=BluetoothConnectionFailed),
+        ) as bluetooth_set_power,
+        patch.object(
+            LaMarzoccoCloudClient, "set_power", AsyncMock(return_value=True)
+        ) as cloud_set_power,
+    ):
+        for _ in range(MIN_COMMANDS):
+            assert await machine.set_power(True)
+        assert bluetooth_set_power.await_count == MIN_COMMANDS
+        assert cloud_set_power.await_count == MIN_COMMANDS
+
+        machine.config.turned_on = False
+        assert await machine.set_power(True)
+
+    assert bluetooth_set_power.await_count == MIN_COMMANDS
+    assert cloud_set_power.await_count == MIN_COMMANDS + 1
+    cloud_set_power.assert_awaited_with(SERIAL_NUMBER, True)
+    assert machine.config.turned_on
+    assert router.as_dict()["control"] == {
+        "bluetooth": {"commands": MIN_COMMANDS, "success_rate": 0.0, "latency": None},
+        "cloud": {
+            "commands": MIN_COMMANDS + 1,
+            "success_rate": 1.0,
+            "latency": pytest.approx(0.0),
+        },
+    }